@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+
+"""Asyncio access to Challonge and the rankings.
+
+The Challonge client and ranking downloads are blocking, so their calls are
+run in a thread pool. That lets a coroutine start several independent reads
+at once with asyncio.gather instead of waiting on each in turn.
+"""
+
+
+import asyncio
+import functools
+
+import requests.exceptions
+
+import defaults
+import garpr_seeds
+import tracing
+
+
+def run(coroutine):
+    """Runs a coroutine to completion from synchronous code.
+
+    Args:
+      coroutine: The coroutine to run.
+
+    Returns:
+      Whatever the coroutine returned.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        if hasattr(loop, "shutdown_default_executor"):
+            loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Runs a blocking function in a thread without blocking the event loop.
+
+    Args:
+      fn: The function to call.
+      args: The positional arguments to call it with.
+      kwargs: The keyword arguments to call it with.
+
+    Returns:
+      Whatever the function returned.
+    """
+    loop = asyncio.get_event_loop()
+    # Spans started by the function belong to the span that's awaiting it.
+    fn = tracing.wrap_context(functools.partial(fn, *args, **kwargs))
+    return await loop.run_in_executor(None, fn)
+
+
+class _AsyncResource(object):
+    """Makes every method of a client resource, e.g. participants, awaitable."""
+
+    def __init__(self, resource):
+        self._resource = resource
+
+    def __getattr__(self, name):
+        method = getattr(self._resource, name)
+
+        async def call(*args, **kwargs):
+            return await run_blocking(method, *args, **kwargs)
+
+        return call
+
+
+class AsyncChallongeClient(object):
+    """An awaitable version of util_challonge.ChallongeClient.
+
+    e.g. participants = await client.participants.index(tourney_name)
+    """
+
+    def __init__(self, client):
+        """Wraps a client.
+
+        Args:
+          client: The util_challonge.ChallongeClient to send requests with.
+        """
+        self.client = client
+        self.tournaments = _AsyncResource(client.tournaments)
+        self.participants = _AsyncResource(client.participants)
+        self.matches = _AsyncResource(client.matches)
+
+
+async def get_tourney_info(client, name):
+    """Gets info about the tournament with the given name.
+
+    Args:
+      client: The AsyncChallongeClient to use.
+      name: The name of the tournament.
+
+    Returns:
+      The Challonge response about the tournament info if it exists, None
+      if it doesn't.
+    """
+    try:
+        return await client.tournaments.show(name)
+    except requests.exceptions.HTTPError as err:
+        if err.response.status_code != 404:
+            raise err
+        return None
+
+
+async def get_garpr_index(region, cache=None):
+    """Awaitable version of garpr_seeds.get_garpr_index."""
+    return await run_blocking(garpr_seeds.get_garpr_index, region, cache)
+
+
+async def get_braacket_index(league=defaults.DEFAULT_BRAACKET_LEAGUE, cache=None):
+    """Awaitable version of garpr_seeds.get_braacket_index."""
+    return await run_blocking(garpr_seeds.get_braacket_index, league, cache)
+
+
+async def gather_or_raise(*awaitables):
+    """Awaits several things at once, raising the first error once all finish.
+
+    Unlike a plain asyncio.gather, nothing is left running in the background
+    when one of them fails.
+
+    Args:
+      awaitables: The coroutines or futures to wait for.
+
+    Returns:
+      A list of their results, in the same order.
+    """
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+
+"""Benchmarks how the seeding tools scale.
+
+Times ranking lookups, seeding, shuffling, amateur planning and a full
+seed_tournament against a fake Challonge, at sizes from 8 to 10k entrants and
+100 to 100k ranking rows. Each benchmark's fastest and median time and its
+peak memory are recorded, and can be saved as a JSON baseline and compared
+against later.
+
+Examples:
+
+  python benchmarks/run_benchmarks.py --save baseline.json
+  python benchmarks/run_benchmarks.py --compare baseline.json
+  python benchmarks/run_benchmarks.py --quick --filter shuffle
+"""
+
+
+import argparse
+import collections
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from os.path import abspath, dirname
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import bracket_math
+import create_amateur_bracket
+import garpr_seeds
+import garpr_seeds_challonge
+import shuffle_seeds
+
+
+BASELINE_VERSION = 1
+
+ENTRANT_SIZES = (8, 64, 512, 4096, 10000)
+RANKING_SIZES = (100, 1000, 10000, 100000)
+# How many participants are looked up in the ranking benchmarks.
+NUM_LOOKUPS = 512
+# How many ranking rows seed_tournament looks participants up in.
+NUM_SEEDING_ROWS = 10000
+
+DEFAULT_REPEAT = 5
+# How much slower a benchmark can get before it counts as a regression.
+DEFAULT_THRESHOLD = 0.25
+
+
+Benchmark = collections.namedtuple("Benchmark", ["name", "sizes", "setup"])
+Benchmark.__doc__ = """A function to time at several sizes.
+
+name: The name of the benchmark.
+sizes: The sizes to run it at.
+setup: A function that takes a size, builds any inputs, and returns a
+       function of no arguments that does the work being timed.
+"""
+
+
+def _get_rankings(num_rows):
+    return [
+        {"name": "Player {0}".format(i), "rank": i, "id": str(i)}
+        for i in range(1, num_rows + 1)
+    ]
+
+
+def _get_names(num_names, num_rows):
+    """Gets names to look up, about a quarter of them unranked."""
+    return [
+        "Player {0}".format(i * 7 % num_rows + 1) if i % 4 else "Newcomer {0}".format(i)
+        for i in range(num_names)
+    ]
+
+
+def _setup_find_ranking_for_name(num_rows):
+    rankings = _get_rankings(num_rows)
+    name = "Player {0}".format(num_rows)
+    return lambda: garpr_seeds._find_ranking_for_name(name, rankings)
+
+
+def _setup_ranking_index(num_rows):
+    rankings = _get_rankings(num_rows)
+    names = _get_names(NUM_LOOKUPS, num_rows)
+    return lambda: garpr_seeds.RankingIndex(rankings).get_ranks(names)
+
+
+def _setup_ranks_to_seeds(num_entrants):
+    ranks = [
+        garpr_seeds.UNKNOWN_RANK if i % 4 == 0 else i * 7 % 100000 + 1
+        for i in range(num_entrants)
+    ]
+    return lambda: garpr_seeds.ranks_to_seeds(ranks)
+
+
+def _setup_get_shuffled_seeds(num_entrants):
+    return lambda: shuffle_seeds.get_shuffled_seeds(num_entrants)
+
+
+def _setup_get_num_amateurs(num_entrants):
+    def run():
+        # Time working it out, not remembering it.
+        bracket_math.get_num_placing_last.cache_clear()
+        bracket_math.get_bucket_sizes.cache_clear()
+        create_amateur_bracket._get_num_amateurs(num_entrants, 2)
+
+    return run
+
+
+class _FakeTournaments(object):
+    def show(self, tourney_name):
+        return {"url": tourney_name, "state": "pending"}
+
+
+class _FakeParticipants(object):
+    def __init__(self, participants):
+        self._participants = participants
+
+    def index(self, tourney_name):
+        return [dict(x) for x in self._participants]
+
+    def update(self, tourney_name, participant_id, seed):
+        return {}
+
+
+class _FakeClient(object):
+    """Answers the requests seed_tournament makes, without a network."""
+
+    def __init__(self, participants):
+        self.tournaments = _FakeTournaments()
+        self.participants = _FakeParticipants(participants)
+        self.matches = None
+
+
+def _setup_seed_tournament(num_entrants):
+    rankings = _get_rankings(NUM_SEEDING_ROWS)
+    names = _get_names(num_entrants, len(rankings))
+    participants = [
+        {"id": i, "display_name": x, "name": x, "seed": i}
+        for i, x in enumerate(names, 1)
+    ]
+    client = _FakeClient(participants)
+    tourney_url = "https://challonge.com/benchmark"
+
+    def run():
+        # Rankings come from memory instead of Braacket.
+        iter_rankings = garpr_seeds._iter_braacket_rankings
+        garpr_seeds._iter_braacket_rankings = lambda *args, **kwargs: iter(rankings)
+        try:
+            sorted_participants, _ = garpr_seeds_challonge.seed_tournament(
+                tourney_url, False, suggest_matches=False, client=client
+            )
+        finally:
+            garpr_seeds._iter_braacket_rankings = iter_rankings
+        garpr_seeds_challonge.update_seeds(
+            tourney_url, sorted_participants, client=client
+        )
+
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("find_ranking_for_name", RANKING_SIZES, _setup_find_ranking_for_name),
+    Benchmark("ranking_index_get_ranks", RANKING_SIZES, _setup_ranking_index),
+    Benchmark("ranks_to_seeds", ENTRANT_SIZES, _setup_ranks_to_seeds),
+    Benchmark("get_shuffled_seeds", ENTRANT_SIZES, _setup_get_shuffled_seeds),
+    Benchmark("get_num_amateurs", ENTRANT_SIZES, _setup_get_num_amateurs),
+    Benchmark("seed_tournament", ENTRANT_SIZES, _setup_seed_tournament),
+]
+
+
+def measure(fn, repeat=DEFAULT_REPEAT):
+    """Times a function and measures its peak memory.
+
+    Memory is measured in a separate run, since tracing it slows things down.
+
+    Args:
+      fn: The function to measure.
+      repeat: How many times to time it.
+
+    Returns:
+      A dictionary with the "min" and "median" seconds it took, and the
+      "peak_bytes" of memory it allocated at once.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "peak_bytes": peak_bytes,
+    }
+
+
+def run_benchmarks(benchmarks=BENCHMARKS, name_filter=None, quick=False,
+                   repeat=DEFAULT_REPEAT):
+    """Runs benchmarks.
+
+    Args:
+      benchmarks: The Benchmarks to run.
+      name_filter: Only run benchmarks whose name contains this, if given.
+      quick: Only run each benchmark at its two smallest sizes.
+      repeat: How many times to time each benchmark at each size.
+
+    Returns:
+      A baseline dictionary, with a result from measure for each
+      "name[size]" under "results".
+    """
+    results = collections.OrderedDict()
+    for benchmark in benchmarks:
+        if name_filter and name_filter not in benchmark.name:
+            continue
+
+        sizes = benchmark.sizes[:2] if quick else benchmark.sizes
+        for size in sizes:
+            key = "{0}[{1}]".format(benchmark.name, size)
+            results[key] = measure(benchmark.setup(size), repeat)
+            print(_format_result(key, results[key]), flush=True)
+
+    return {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compares benchmark results against a baseline.
+
+    Args:
+      baseline: A baseline dictionary from run_benchmarks.
+      current: Another baseline dictionary from run_benchmarks.
+      threshold: How much slower, as a fraction, a benchmark's median time
+                 can get before it counts as a regression. Getting that much
+                 faster counts as an improvement.
+
+    Returns:
+      A list of (name, baseline median, current median, ratio, verdict)
+      tuples for the benchmarks in both, where verdict is "regression",
+      "improvement" or "same".
+    """
+    comparisons = []
+    for key, result in current["results"].items():
+        old_result = baseline["results"].get(key)
+        if old_result is None:
+            continue
+
+        ratio = result["median"] / max(old_result["median"], 1e-12)
+        if ratio > 1 + threshold:
+            verdict = "regression"
+        elif ratio < 1 / (1 + threshold):
+            verdict = "improvement"
+        else:
+            verdict = "same"
+        comparisons.append(
+            (key, old_result["median"], result["median"], ratio, verdict)
+        )
+    return comparisons
+
+
+def _format_result(key, result):
+    return "{0:<36} min {1:>10.6f}s  median {2:>10.6f}s  peak {3:>10.1f} KiB".format(
+        key, result["min"], result["median"], result["peak_bytes"] / 1024
+    )
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Benchmarks how the seeding tools scale.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "--save", default=None, help="the JSON file to save the results to"
+    )
+    argparser.add_argument(
+        "--compare", default=None, help="a JSON file of results to compare against"
+    )
+    argparser.add_argument(
+        "--filter", default=None, help="only run benchmarks with this in their name"
+    )
+    argparser.add_argument(
+        "--quick",
+        action="store_true",
+        help="only run each benchmark at its two smallest sizes",
+    )
+    argparser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="how many times to time each benchmark",
+    )
+    argparser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="how much slower a benchmark can get before it's a regression",
+    )
+    args = argparser.parse_args()
+
+    current = run_benchmarks(name_filter=args.filter, quick=args.quick,
+                             repeat=args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print("Saved results to {0}".format(args.save))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        comparisons = compare(baseline, current, args.threshold)
+        print()
+        print("{0:<36} {1:>11} {2:>11} {3:>7}".format(
+            "Benchmark", "Baseline", "Current", "Ratio"))
+        for key, old_median, new_median, ratio, verdict in comparisons:
+            print("{0:<36} {1:>10.6f}s {2:>10.6f}s {3:>6.2f}x  {4}".format(
+                key, old_median, new_median, ratio, verdict))
+
+        if any(x[4] == "regression" for x in comparisons):
+            sys.exit(1)
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+
+
+"""Lays out brackets the way Challonge does, without using the API.
+
+A Bracket holds every match of a single or double elimination bracket for N
+seeds as NumPy arrays: who plays in each match, where its winner and loser go
+next, which round it's in and which matches are byes. Rounds are numbered like
+Challonge numbers them in matches.index: winner's rounds count up from 1,
+loser's rounds count down from -1, and loser's rounds made up entirely of byes
+are left out.
+
+Example:
+
+  python bracket.py 12
+"""
+
+
+import argparse
+import functools
+
+import numpy as np
+
+
+def get_seed_order(num_seed_slots):
+    """Gets the order seeds are listed in a standard bracket.
+
+    e.g. [1, 8, 4, 5, 2, 7, 3, 6] for 8 seeds, so that the top seeds meet as
+    late as possible.
+
+    Args:
+      num_seed_slots: The size of the bracket, a power of two.
+
+    Returns:
+      A list of the seeds, in bracket order.
+    """
+    order = [1]
+    while len(order) < num_seed_slots:
+        num_seeds = 2 * len(order)
+        order = [y for x in order for y in (x, num_seeds + 1 - x)]
+    return order
+
+
+def _get_drop_in_order(drop_ins, drop_round):
+    """Orders the losers dropping into a loser's round.
+
+    Losers are crossed over, alternately reversed and with their halves
+    swapped, so they don't immediately replay who they just played.
+
+    Args:
+      drop_ins: The slots of the losers of a winner's round, in bracket order.
+      drop_round: Which drop-in it is, 1 for the losers of winner's round 2.
+
+    Returns:
+      The slots, in the order they meet the loser's bracket.
+    """
+    if drop_round % 2:
+        return drop_ins[::-1]
+    half = len(drop_ins) // 2
+    return drop_ins[half:] + drop_ins[:half]
+
+
+def _iter_bits(mask):
+    """Yields the indices of the set bits of an int."""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+class Bracket(object):
+    """The layout of a single or double elimination bracket.
+
+    Slots hold the players: the first num_seed_slots slots hold whoever has
+    each seed (slot seed - 1), and match m writes its winner to slot
+    num_seed_slots + 2m and its loser to slot num_seed_slots + 2m + 1. Matches
+    are numbered in an order they can be played in.
+
+    Attributes:
+      num_participants: The number of participants.
+      double_elimination: Whether the bracket is double-elimination.
+      num_seed_slots: The size of the bracket, a power of two.
+      num_winners_rounds: How many winner's rounds there are.
+      num_losers_rounds: How many loser's rounds there are, not counting ones
+                         Challonge leaves out.
+      seed_order: The seeds in bracket order.
+      seed_positions: The position of each seed in bracket order, indexed by
+                      seed - 1.
+      match_inputs: An (M, 2) array of the slots each match's players come
+                    from.
+      match_rounds: The round of each match. Byes in loser's rounds that
+                    Challonge leaves out are in round 0.
+      is_bye: Whether each match is a bye, i.e. always has an empty side.
+      winner_next_match: The match each match's winner plays next, or -1.
+      loser_next_match: The match each match's loser plays next, or -1 if
+                        they're eliminated.
+      loser_rounds: The round each match's loser plays their next real match
+                    in, or 0 if they're eliminated.
+      elimination_stages: The stage at which each match's loser is
+                          eliminated, or -1 if they drop to the loser's
+                          bracket or there's never a loser. Stages count up
+                          from the loser's round they match (1 for round -1)
+                          and later stages place higher.
+      num_stages: The stage the champion finishes at, one more than any other.
+      has_reset: Whether the last match is a grand final that's replayed if
+                 the player from the loser's bracket wins it.
+    """
+
+    def __init__(self, num_participants, double_elimination=True):
+        """Lays out a bracket.
+
+        Args:
+          num_participants: The number of participants.
+          double_elimination: Whether the bracket is double-elimination.
+        """
+        self.num_participants = num_participants
+        self.double_elimination = double_elimination
+
+        num_seed_slots = 1
+        while num_seed_slots < max(num_participants, 2):
+            num_seed_slots *= 2
+        self.num_seed_slots = num_seed_slots
+        self.num_winners_rounds = num_seed_slots.bit_length() - 1
+
+        seed_order = get_seed_order(num_seed_slots)
+        self.seed_order = np.array(seed_order, dtype=np.int64)
+        self.seed_positions = np.argsort(self.seed_order)
+
+        inputs = []
+        # Losers rounds are numbered without gaps at first, and renumbered
+        # once we know which are all byes.
+        rounds = []
+
+        def add_match(slot_a, slot_b, round_num):
+            match = len(inputs)
+            inputs.append((slot_a, slot_b))
+            rounds.append(round_num)
+            winner = num_seed_slots + 2 * match
+            return winner, winner + 1
+
+        # Winner's bracket.
+        winners = [x - 1 for x in seed_order]
+        losers_by_round = []
+        for round_num in range(1, self.num_winners_rounds + 1):
+            results = [
+                add_match(winners[i], winners[i + 1], round_num)
+                for i in range(0, len(winners), 2)
+            ]
+            winners = [x[0] for x in results]
+            losers_by_round.append([x[1] for x in results])
+
+        # Loser's bracket. Its first round is the losers of winner's round one
+        # playing each other. After that, rounds alternate between the people
+        # left playing each other and them playing the next round's drop-ins.
+        if double_elimination:
+            losers_round = -1
+            survivors = losers_by_round[0]
+            if len(survivors) > 1:
+                survivors = [
+                    add_match(survivors[i], survivors[i + 1], losers_round)[0]
+                    for i in range(0, len(survivors), 2)
+                ]
+                losers_round -= 1
+            for drop_round, drop_ins in enumerate(losers_by_round[1:], 1):
+                if len(survivors) > len(drop_ins):
+                    survivors = [
+                        add_match(survivors[i], survivors[i + 1], losers_round)[0]
+                        for i in range(0, len(survivors), 2)
+                    ]
+                    losers_round -= 1
+                drop_ins = _get_drop_in_order(drop_ins, drop_round)
+                survivors = [
+                    add_match(x, y, losers_round)[0]
+                    for x, y in zip(survivors, drop_ins)
+                ]
+                losers_round -= 1
+
+            # Grand finals.
+            add_match(winners[0], survivors[0], self.num_winners_rounds + 1)
+
+        self.match_inputs = np.array(inputs, dtype=np.int64).reshape(-1, 2)
+        num_matches = len(inputs)
+        self.has_reset = double_elimination
+
+        # Work out which slots can ever hold somebody, as a bitmask of the
+        # seeds that can end up there. Only seeds up to num_participants exist.
+        possible_seeds = [
+            1 << (seed - 1) if seed <= num_participants else 0
+            for seed in range(1, num_seed_slots + 1)
+        ]
+        is_bye = np.zeros(num_matches, dtype=bool)
+        for match, (slot_a, slot_b) in enumerate(inputs):
+            seeds_a = possible_seeds[slot_a]
+            seeds_b = possible_seeds[slot_b]
+            is_bye[match] = not (seeds_a and seeds_b)
+            possible_seeds.append(seeds_a | seeds_b)
+            possible_seeds.append(0 if is_bye[match] else seeds_a | seeds_b)
+        self.is_bye = is_bye
+        self._possible_seeds = possible_seeds
+
+        # Where everybody goes after each match.
+        self.winner_next_match = np.full(num_matches, -1, dtype=np.int64)
+        self.loser_next_match = np.full(num_matches, -1, dtype=np.int64)
+        for match, slots in enumerate(inputs):
+            for slot in slots:
+                if slot >= num_seed_slots:
+                    source, is_loser = divmod(slot - num_seed_slots, 2)
+                    if is_loser:
+                        self.loser_next_match[source] = match
+                    else:
+                        self.winner_next_match[source] = match
+
+        # Renumber the loser's rounds like Challonge, leaving out any that are
+        # all byes.
+        rounds = np.array(rounds, dtype=np.int64)
+        losers_rounds = sorted(set(rounds[rounds < 0]), reverse=True)
+        renumbered = {}
+        for round_num in losers_rounds:
+            if not is_bye[rounds == round_num].all():
+                renumbered[round_num] = -(len(renumbered) + 1)
+        self.num_losers_rounds = len(renumbered)
+        self.match_rounds = np.array(
+            [renumbered.get(x, 0) if x < 0 else x for x in rounds], dtype=np.int64
+        )
+
+        # Stages of elimination. In single elimination, losing in winner's
+        # round r eliminates you at stage r.
+        if double_elimination:
+            self.num_stages = self.num_losers_rounds + 2
+            stages = np.where(self.match_rounds < 0, -self.match_rounds, -1)
+            stages[num_matches - 1] = self.num_stages - 1
+        else:
+            self.num_stages = self.num_winners_rounds + 1
+            stages = self.match_rounds.copy()
+        self.elimination_stages = stages
+
+        # The round each loser plays their next real match in, skipping byes.
+        self.loser_rounds = np.zeros(num_matches, dtype=np.int64)
+        for match in range(num_matches):
+            next_match = self.loser_next_match[match]
+            while next_match >= 0 and is_bye[next_match]:
+                next_match = self.winner_next_match[next_match]
+            if next_match >= 0:
+                self.loser_rounds[match] = self.match_rounds[next_match]
+
+        self._opponents_by_round = {}
+
+    @property
+    def num_matches(self):
+        return len(self.match_inputs)
+
+    def get_matches_in_round(self, round_num):
+        """Gets the matches in a round.
+
+        Args:
+          round_num: The round, numbered like Challonge.
+
+        Returns:
+          An array of the matches, including byes.
+        """
+        return np.flatnonzero(self.match_rounds == round_num)
+
+    def get_possible_seeds(self, match):
+        """Gets the seeds who could play in a match.
+
+        Args:
+          match: The match.
+
+        Returns:
+          A tuple of two sorted lists, the seeds who could be on each side.
+        """
+        return tuple(
+            [x + 1 for x in _iter_bits(self._possible_seeds[slot])]
+            for slot in self.match_inputs[match]
+        )
+
+    def _get_opponents(self, round_num):
+        """Gets who each seed could play in a round, building it if needed.
+
+        Returns:
+          A list with a bitmask of the possible opponents of each seed, indexed
+          by seed - 1.
+        """
+        opponents = self._opponents_by_round.get(round_num)
+        if opponents is not None:
+            return opponents
+
+        opponents = [0] * self.num_seed_slots
+        for match in self.get_matches_in_round(round_num):
+            if self.is_bye[match]:
+                continue
+            seeds_a, seeds_b = (self._possible_seeds[x] for x in self.match_inputs[match])
+            for seed in _iter_bits(seeds_a):
+                opponents[seed] |= seeds_b
+            for seed in _iter_bits(seeds_b):
+                opponents[seed] |= seeds_a
+        self._opponents_by_round[round_num] = opponents
+        return opponents
+
+    def can_meet(self, seed_a, seed_b, round_num):
+        """Checks whether two seeds could play each other in a round.
+
+        Winner's rounds are answered directly from the seeds' positions. Other
+        rounds are answered from a table of possible opponents, built the first
+        time the round is asked about.
+
+        Args:
+          seed_a: One seed.
+          seed_b: The other seed.
+          round_num: The round, numbered like Challonge.
+
+        Returns:
+          True if there's some set of results that has them play each other
+          in that round.
+        """
+        if seed_a == seed_b or max(seed_a, seed_b) > self.num_participants:
+            return False
+        if 0 < round_num <= self.num_winners_rounds:
+            # Seeds meet in the round where their positions first share a half
+            # of the bracket.
+            positions = self.seed_positions[seed_a - 1] ^ self.seed_positions[seed_b - 1]
+            return int(positions).bit_length() == round_num
+        return bool((self._get_opponents(round_num)[seed_a - 1] >> (seed_b - 1)) & 1)
+
+    def get_possible_opponents(self, seed, round_num):
+        """Gets the seeds a seed could play in a round.
+
+        Args:
+          seed: The seed.
+          round_num: The round, numbered like Challonge.
+
+        Returns:
+          A sorted list of seeds.
+        """
+        if seed > self.num_participants:
+            return []
+        if 0 < round_num <= self.num_winners_rounds:
+            # The other half of the block of the bracket that plays down to
+            # one person by this round.
+            block_size = 1 << round_num
+            position = self.seed_positions[seed - 1]
+            start = position // block_size * block_size
+            if position - start < block_size // 2:
+                start += block_size // 2
+            seeds = self.seed_order[start : start + block_size // 2]
+            return sorted(int(x) for x in seeds if x <= self.num_participants)
+        opponents = self._get_opponents(round_num)[seed - 1]
+        return [x + 1 for x in _iter_bits(opponents)]
+
+
+@functools.lru_cache(maxsize=64)
+def get_bracket(num_participants, double_elimination=True):
+    """Gets the layout of a bracket, reusing it if it was already laid out.
+
+    Args:
+      num_participants: The number of participants.
+      double_elimination: Whether the bracket is double-elimination.
+
+    Returns:
+      A Bracket.
+    """
+    return Bracket(num_participants, double_elimination)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Prints the matches of a bracket.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument("num_participants", type=int, help="the number of seeds")
+    argparser.add_argument(
+        "--single_elimination",
+        action="store_true",
+        help="lay out a single-elimination bracket",
+    )
+    args = argparser.parse_args()
+
+    layout = Bracket(args.num_participants, not args.single_elimination)
+    for match in range(layout.num_matches):
+        if layout.is_bye[match]:
+            continue
+        seeds_a, seeds_b = layout.get_possible_seeds(match)
+        print(
+            "Round {0:>3}: {1} vs. {2}".format(
+                layout.match_rounds[match],
+                "/".join(str(x) for x in seeds_a),
+                "/".join(str(x) for x in seeds_b),
+            )
+        )
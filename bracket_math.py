@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+
+"""Arithmetic about the shape of brackets.
+
+How many people play in the first round, how many are knocked out in each
+loser's round, and so on, only depend on the number of participants. The
+functions here work those out in closed form and remember their answers.
+
+Each function also has a NumPy version that works on a whole array of
+participant counts at once, e.g. for analytics across every bracket size up to
+100k. NumPy is only imported when one of those is used.
+"""
+
+
+import collections
+import functools
+
+
+BracketTable = collections.namedtuple(
+    "BracketTable",
+    [
+        "num_participants",
+        "num_in_first_round",
+        "bucket_sizes",
+        "bucket_boundaries",
+        "num_amateurs_by_cutoff",
+    ],
+)
+BracketTable.__doc__ = """Everything about the shape of a double-elimination bracket.
+
+num_participants: The number of participants in the bracket.
+num_in_first_round: How many people play in the first round.
+bucket_sizes: How many people are knocked out in each loser's round, from the
+              first loser's round (last place) on. These are also the groups
+              of seeds that can be shuffled without changing anybody's
+              projected placement.
+bucket_boundaries: The (top seed, bottom seed) of each bucket, in the same
+                   order.
+num_amateurs_by_cutoff: How many people are amateurs when the cutoff is the
+                        first, second, ... loser's round.
+"""
+
+
+def _check_num_participants(num_participants):
+    if num_participants <= 0:
+        raise ValueError("Invalid number of participants for a tourney.")
+
+
+@functools.lru_cache(maxsize=None)
+def get_num_in_first_round(num_participants):
+    """Gets the number of people in the first round of a tourney.
+
+    Args:
+      num_participants: The number of total participants in the tourney.
+
+    Raises:
+      ValueError: If num_participants <= 0.
+
+    Returns:
+      The number of people who will be playing in the tournament's first
+      round.
+    """
+    _check_num_participants(num_participants)
+    if num_participants <= 2:
+        return num_participants
+
+    # If the bracket size is a power of two, everybody gets to play in
+    # the first round.
+    nearest_smaller_power_of_two = 1 << (num_participants.bit_length() - 1)
+    if nearest_smaller_power_of_two == num_participants:
+        return num_participants
+
+    # Otherwise, we have an awkwardly-sized bracket.
+    # For each leftover participant, we match them up with a low seed from a
+    # nice power-of-two-sized bracket, with everyone else getting a bye.
+    num_leftover_participants = num_participants - nearest_smaller_power_of_two
+    return num_leftover_participants * 2
+
+
+@functools.lru_cache(maxsize=None)
+def get_num_placing_last(num_participants, double_elimination=True):
+    """Gets the number of people who place last in a tourney.
+
+    Args:
+      num_participants: The number of participants in the tourney.
+      double_elimination: Whether the tournament is double-elimination.
+
+    Raises:
+      ValueError: If num_participants <= 0.
+
+    Returns:
+      The number of people who will place last in that tourney.
+    """
+    _check_num_participants(num_participants)
+    if num_participants == 1:
+        return 1
+
+    # <= 4 is a bit of a weird case, so we handle it specially.
+    if num_participants <= 4:
+        return 1 if double_elimination else 2
+
+    num_in_first_round = get_num_in_first_round(num_participants)
+    num_losing_in_first_round = num_in_first_round // 2
+    if not double_elimination:
+        return num_losing_in_first_round
+
+    # We just knocked a bunch of people into loser's. The second winner's round
+    # is always power-of-two-sized, where half the people will get knocked into
+    # round two of losers. These two groups of people are combined to form the
+    # initial loser's bracket. Half the people who fall into the first round of
+    # the loser's bracket will place last.
+    num_in_second_winners_round = num_participants - num_losing_in_first_round
+    num_losing_in_second_winners_round = num_in_second_winners_round // 2
+    num_in_first_losers_round = get_num_in_first_round(
+        num_losing_in_first_round + num_losing_in_second_winners_round
+    )
+    return num_in_first_losers_round // 2
+
+
+@functools.lru_cache(maxsize=4096)
+def get_bucket_sizes(num_participants):
+    """Gets how many people are knocked out in each loser's round.
+
+    Once the people placing last are eliminated, the rest of the bracket
+    places like a bracket without them, so the answer for the smaller bracket
+    is reused.
+
+    Args:
+      num_participants: The number of participants in the tourney.
+
+    Returns:
+      A tuple with the number of people knocked out in each loser's round,
+      from last place to first place. It's empty if there are no
+      participants.
+    """
+    if num_participants <= 0:
+        return ()
+
+    bucket_size = get_num_placing_last(num_participants)
+    return (bucket_size,) + get_bucket_sizes(num_participants - bucket_size)
+
+
+@functools.lru_cache(maxsize=4096)
+def get_bracket_table(num_participants):
+    """Gets everything about the shape of a double-elimination bracket.
+
+    Args:
+      num_participants: The number of participants in the tourney.
+
+    Raises:
+      ValueError: If num_participants <= 0.
+
+    Returns:
+      A BracketTable.
+    """
+    bucket_sizes = get_bucket_sizes(num_participants)
+
+    bucket_boundaries = []
+    num_amateurs_by_cutoff = []
+    num_eliminated = 0
+    for bucket_size in bucket_sizes:
+        bottom_seed = num_participants - num_eliminated
+        num_eliminated += bucket_size
+        bucket_boundaries.append((bottom_seed - bucket_size + 1, bottom_seed))
+        num_amateurs_by_cutoff.append(num_eliminated)
+
+    return BracketTable(
+        num_participants,
+        get_num_in_first_round(num_participants),
+        bucket_sizes,
+        tuple(bucket_boundaries),
+        tuple(num_amateurs_by_cutoff),
+    )
+
+
+def get_num_amateurs(num_participants, cutoff):
+    """Gets how many participants will be considered amateurs.
+
+    Args:
+      num_participants: The number of participants in the tournament.
+      cutoff: The loser's round after which people are no longer qualified for
+              amateur's bracket.
+
+    Returns:
+      The number of participants knocked out in the first `cutoff` loser's
+      rounds.
+    """
+    return sum(get_bucket_sizes(num_participants)[:cutoff])
+
+
+def _to_array(num_participants):
+    """Converts participant counts to a NumPy array, checking they're valid.
+
+    Returns:
+      A tuple of (the numpy module, the array of counts).
+    """
+    import numpy as np
+
+    num_participants = np.asarray(num_participants, dtype=np.int64)
+    if np.any(num_participants <= 0):
+        raise ValueError("Invalid number of participants for a tourney.")
+    return np, num_participants
+
+
+def _get_num_in_first_round_array(np, num_participants):
+    # Counts of 0 are allowed here, and have nobody in the first round.
+    n = num_participants
+    powers = np.left_shift(1, np.floor(np.log2(np.maximum(n, 1))).astype(np.int64))
+    # Correct for any floating point error in log2.
+    powers = np.where(powers > n, powers >> 1, powers)
+    powers = np.where(2 * powers <= n, 2 * powers, powers)
+    return np.where((n <= 2) | (powers == n), n, 2 * (n - powers))
+
+
+def _get_num_placing_last_array(np, num_participants, double_elimination):
+    n = num_participants
+    num_losing_in_first_round = _get_num_in_first_round_array(np, n) // 2
+    if double_elimination:
+        num_losing_in_second_winners_round = (n - num_losing_in_first_round) // 2
+        num_placing_last = (
+            _get_num_in_first_round_array(
+                np, num_losing_in_first_round + num_losing_in_second_winners_round
+            )
+            // 2
+        )
+        small = 1
+    else:
+        num_placing_last = num_losing_in_first_round
+        small = 2
+    return np.where(n == 1, 1, np.where(n <= 4, small, num_placing_last))
+
+
+def get_num_in_first_round_array(num_participants):
+    """Vectorized version of get_num_in_first_round.
+
+    Args:
+      num_participants: An array-like of participant counts.
+
+    Raises:
+      ValueError: If any count is <= 0.
+
+    Returns:
+      A NumPy array with the first-round size for each count.
+    """
+    np, num_participants = _to_array(num_participants)
+    return _get_num_in_first_round_array(np, num_participants)
+
+
+def get_num_placing_last_array(num_participants, double_elimination=True):
+    """Vectorized version of get_num_placing_last.
+
+    Args:
+      num_participants: An array-like of participant counts.
+      double_elimination: Whether the tournaments are double-elimination.
+
+    Raises:
+      ValueError: If any count is <= 0.
+
+    Returns:
+      A NumPy array with the number placing last for each count.
+    """
+    np, num_participants = _to_array(num_participants)
+    return _get_num_placing_last_array(np, num_participants, double_elimination)
+
+
+def get_bucket_sizes_array(num_participants):
+    """Vectorized version of get_bucket_sizes.
+
+    Only one pass per loser's round is made, across every count at once.
+
+    Args:
+      num_participants: An array-like of participant counts.
+
+    Raises:
+      ValueError: If any count is <= 0.
+
+    Returns:
+      A NumPy array with an extra last axis holding each count's bucket sizes,
+      from last place to first place. Counts with fewer loser's rounds than
+      the longest are padded with zeros.
+    """
+    np, remaining = _to_array(num_participants)
+    remaining = remaining.copy()
+
+    columns = []
+    while np.any(remaining > 0):
+        bucket_sizes = np.where(
+            remaining > 0,
+            _get_num_placing_last_array(np, np.maximum(remaining, 1), True),
+            0,
+        )
+        columns.append(bucket_sizes)
+        remaining -= bucket_sizes
+
+    if not columns:
+        return np.zeros(remaining.shape + (0,), dtype=np.int64)
+    return np.stack(columns, axis=-1)
+
+
+def get_num_amateurs_array(num_participants, cutoff):
+    """Vectorized version of get_num_amateurs.
+
+    Args:
+      num_participants: An array-like of participant counts.
+      cutoff: The loser's round after which people are no longer qualified for
+              amateur's bracket.
+
+    Raises:
+      ValueError: If any count is <= 0.
+
+    Returns:
+      A NumPy array with the number of amateurs for each count.
+    """
+    return get_bucket_sizes_array(num_participants)[..., :cutoff].sum(axis=-1)
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+
+"""Simulates brackets to see what seedings do to the results.
+
+Plays out a bracket many times, with each match won at random according to
+the players' strengths, and reports how players placed, how often upsets
+happened and how many rematches there were. This lets us measure what
+shuffling seeds or the amateur cutoff actually change.
+
+Runs are simulated in chunks, with every run of a chunk played at once as
+NumPy arrays: a row per run, holding who's in each slot of the bracket. Chunks
+are spread across a process pool.
+
+Example:
+
+  python bracket_simulator.py 32 --runs 1000000 --shuffle
+"""
+
+
+import argparse
+import concurrent.futures
+import math
+import os
+
+import numpy as np
+
+import bracket
+import shuffle_seeds
+
+
+DEFAULT_NUM_RUNS = 100000
+DEFAULT_CHUNK_SIZE = 50000
+
+# The rating difference at which the stronger player wins 10 out of 11 games,
+# the same scale as Elo.
+_RATING_SCALE = 400.0
+# How much rating a player loses each time their rank doubles.
+_RATING_PER_RANK_DOUBLING = 200.0
+
+
+def get_ratings_from_ranks(ranks):
+    """Gets a rating for each player from their rank.
+
+    Ratings are on an Elo-like scale, with each doubling of rank worth the
+    same amount. Unranked players are rated just below the lowest ranked one.
+
+    Args:
+      ranks: A list of ranks, with None for unranked players.
+
+    Returns:
+      A NumPy array of ratings.
+    """
+    unranked = max((x for x in ranks if x is not None), default=0) + 1
+    ranks = np.array([unranked if x is None else x for x in ranks], dtype=float)
+    return -_RATING_PER_RANK_DOUBLING * np.log2(np.maximum(ranks, 1))
+
+
+def _get_win_probabilities(ratings):
+    """Gets the chance of each player beating each other player.
+
+    Returns:
+      An (N, N) array where [i, j] is the chance of player i beating j.
+    """
+    ratings = np.asarray(ratings, dtype=float)
+    differences = ratings[np.newaxis, :] - ratings[:, np.newaxis]
+    return 1.0 / (1.0 + 10.0 ** (differences / _RATING_SCALE))
+
+
+class SimulationResult(object):
+    """Totals over simulated runs of a bracket.
+
+    Players are numbered by their index in the ratings the simulation was
+    given.
+    """
+
+    def __init__(self, num_players, num_stages):
+        self.num_runs = 0
+        # [i, p] is how many times player i placed p.
+        self.placement_counts = np.zeros((num_players, num_players + 1), np.int64)
+        # [i, s] is how many times player i was eliminated at stage s.
+        self.stage_counts = np.zeros((num_players, num_stages + 1), np.int64)
+        self.num_matches = 0
+        self.num_upsets = 0
+        self.num_rematches = 0
+
+    def merge(self, other):
+        """Adds the totals of another result for the same bracket to this one."""
+        self.num_runs += other.num_runs
+        self.placement_counts += other.placement_counts
+        self.stage_counts += other.stage_counts
+        self.num_matches += other.num_matches
+        self.num_upsets += other.num_upsets
+        self.num_rematches += other.num_rematches
+        return self
+
+    def get_placement_distribution(self):
+        """Gets how often each player placed where.
+
+        Returns:
+          An (N, N + 1) array where [i, p] is the fraction of runs in which
+          player i placed p. Placements are like 1st, 2nd, 3rd, 4th, 5th, 5th,
+          7th, so some are never reached.
+        """
+        return self.placement_counts / max(self.num_runs, 1)
+
+    def get_expected_placements(self):
+        """Gets each player's average placement."""
+        placements = np.arange(self.placement_counts.shape[1])
+        return self.get_placement_distribution() @ placements
+
+    def get_upset_rate(self):
+        """Gets the fraction of matches won by the lower rated player."""
+        return self.num_upsets / max(self.num_matches, 1)
+
+    def get_expected_rematches(self):
+        """Gets the average number of pairs of players meeting twice in a run.
+
+        Grand finals resets don't count.
+        """
+        return self.num_rematches / max(self.num_runs, 1)
+
+    def get_amateur_rates(self, cutoff):
+        """Gets how often each player would qualify for the amateur bracket.
+
+        Args:
+          cutoff: The loser's round after which people are no longer qualified
+                  for amateur's bracket.
+
+        Returns:
+          An array with the fraction of runs in which each player was
+          eliminated by the end of that loser's round.
+        """
+        return self.stage_counts[:, 1 : cutoff + 1].sum(axis=1) / max(self.num_runs, 1)
+
+
+def _simulate_chunk(layout, ratings, num_runs, seed_sequence, shuffle):
+    """Simulates runs of a bracket, all at once.
+
+    Args:
+      layout: The bracket.Bracket to play.
+      ratings: The players' ratings. Player i has seed i + 1, unless shuffled.
+      num_runs: How many runs to simulate.
+      seed_sequence: The numpy.random.SeedSequence to draw randomness from.
+      shuffle: Whether to shuffle the seeds for each run, like
+               shuffle_seeds.get_shuffled_seeds.
+
+    Returns:
+      A SimulationResult.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    ratings = np.asarray(ratings, dtype=float)
+    num_players = len(ratings)
+    num_matches = layout.num_matches
+    win_probabilities = _get_win_probabilities(ratings)
+    result = SimulationResult(num_players, layout.num_stages)
+    result.num_runs = num_runs
+    rows = np.arange(num_runs)
+
+    # Who's in each slot of the bracket, a row per run.
+    dtype = np.int16 if num_players < np.iinfo(np.int16).max else np.int32
+    slots = np.full(
+        (num_runs, layout.num_seed_slots + 2 * num_matches), -1, dtype=dtype
+    )
+    if shuffle:
+        seeds = shuffle_seeds.get_shuffled_seeds_batch(num_players, num_runs, rng)
+    else:
+        seeds = np.broadcast_to(np.arange(1, num_players + 1), (num_runs, num_players))
+    np.put_along_axis(
+        slots, seeds - 1, np.broadcast_to(np.arange(num_players, dtype=dtype), seeds.shape), axis=1
+    )
+
+    # The stage each player was eliminated at, and who played whom.
+    stages = np.full((num_runs, num_players), layout.num_stages, dtype=np.int64)
+    pairings = np.empty((num_runs, num_matches), dtype=np.int64)
+
+    def play(a, b, played=True):
+        # Only runs where both players showed up, and the match was played at
+        # all, count towards the totals.
+        both = (a >= 0) & (b >= 0) & played
+        chance = win_probabilities[np.maximum(a, 0), np.maximum(b, 0)]
+        a_wins = (b < 0) | ((a >= 0) & (rng.random(num_runs) < chance))
+        winner = np.where(a_wins, a, b)
+        loser = np.where(a_wins, b, a)
+        result.num_matches += int(both.sum())
+        result.num_upsets += int(
+            (both & (ratings[winner] < ratings[np.maximum(loser, 0)])).sum()
+        )
+        return both, winner, loser
+
+    for match, (slot_a, slot_b) in enumerate(layout.match_inputs):
+        a = slots[:, slot_a]
+        b = slots[:, slot_b]
+        both, winner, loser = play(a, b)
+
+        if layout.has_reset and match == num_matches - 1:
+            # The player from the loser's bracket has to win twice, so the
+            # reset is only played in runs where they won the first set.
+            reset = both & (winner == b)
+            _, reset_winner, reset_loser = play(b, a, reset)
+            winner = np.where(reset, reset_winner, winner)
+            loser = np.where(reset, reset_loser, loser)
+
+        output = layout.num_seed_slots + 2 * match
+        slots[:, output] = winner
+        slots[:, output + 1] = loser
+        pairings[:, match] = np.where(
+            both,
+            np.minimum(a, b).astype(np.int64) * num_players + np.maximum(a, b),
+            -1 - match,
+        )
+
+        stage = layout.elimination_stages[match]
+        if stage >= 0:
+            eliminated = loser >= 0
+            stages[rows[eliminated], loser[eliminated]] = stage
+
+    # Everybody eliminated at the same stage gets the same placement: one more
+    # than the number of people who went further.
+    num_stages = layout.num_stages + 1
+    per_stage = np.bincount(
+        (rows[:, np.newaxis] * num_stages + stages).ravel(),
+        minlength=num_runs * num_stages,
+    ).reshape(num_runs, num_stages)
+    num_further = np.cumsum(per_stage[:, ::-1], axis=1)[:, ::-1] - per_stage
+    placements = 1 + np.take_along_axis(num_further, stages, axis=1)
+
+    players = np.arange(num_players)[np.newaxis, :]
+    result.placement_counts += np.bincount(
+        (players * (num_players + 1) + placements).ravel(),
+        minlength=num_players * (num_players + 1),
+    ).reshape(num_players, num_players + 1)
+    result.stage_counts += np.bincount(
+        (players * num_stages + stages).ravel(), minlength=num_players * num_stages
+    ).reshape(num_players, num_stages)
+
+    # A rematch is the same pair meeting again, outside of a grand finals
+    # reset.
+    pairings.sort(axis=1)
+    repeated = (pairings[:, 1:] == pairings[:, :-1]) & (pairings[:, 1:] >= 0)
+    result.num_rematches += int(repeated.sum())
+    return result
+
+
+def simulate(
+    ratings,
+    num_runs=DEFAULT_NUM_RUNS,
+    double_elimination=True,
+    shuffle=False,
+    seed=None,
+    num_workers=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """Simulates a bracket many times.
+
+    Args:
+      ratings: Each player's rating, e.g. from get_ratings_from_ranks, in seed
+               order.
+      num_runs: How many times to play out the bracket.
+      double_elimination: Whether the bracket is double-elimination.
+      shuffle: Whether to shuffle the seeds for each run, like
+               shuffle_seeds.get_shuffled_seeds.
+      seed: An int to make the simulation reproducible, or None.
+      num_workers: How many processes to simulate in. By default, one per CPU.
+                   With 1, everything runs in this process.
+      chunk_size: How many runs each process simulates at once.
+
+    Returns:
+      A SimulationResult.
+    """
+    layout = bracket.get_bracket(len(ratings), double_elimination)
+    num_chunks = max(1, math.ceil(num_runs / chunk_size))
+    chunk_sizes = [
+        num_runs // num_chunks + (i < num_runs % num_chunks) for i in range(num_chunks)
+    ]
+    seed_sequences = np.random.SeedSequence(seed).spawn(num_chunks)
+    chunks = [
+        (layout, ratings, x, y, shuffle) for x, y in zip(chunk_sizes, seed_sequences)
+    ]
+
+    result = SimulationResult(len(ratings), layout.num_stages)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = min(num_workers, num_chunks)
+    if num_workers <= 1:
+        for chunk in chunks:
+            result.merge(_simulate_chunk(*chunk))
+        return result
+
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as pool:
+        for chunk_result in pool.map(_simulate_chunk, *zip(*chunks)):
+            result.merge(chunk_result)
+    return result
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Simulates a bracket to see how seeding affects results.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument(
+        "num_participants",
+        type=int,
+        help="the number of participants, ranked 1 to N in seed order",
+    )
+    argparser.add_argument(
+        "--runs", type=int, default=DEFAULT_NUM_RUNS, help="how many runs to simulate"
+    )
+    argparser.add_argument(
+        "--single_elimination",
+        action="store_true",
+        help="simulate a single-elimination bracket",
+    )
+    argparser.add_argument(
+        "--shuffle", action="store_true", help="shuffle the seeds for every run"
+    )
+    argparser.add_argument(
+        "--losers_round_cutoff",
+        type=int,
+        default=2,
+        help="the loser's round to report amateur bracket rates for",
+    )
+    argparser.add_argument(
+        "--workers", type=int, default=None, help="how many processes to use"
+    )
+    argparser.add_argument(
+        "--seed", type=int, default=None, help="seed for random number generation"
+    )
+    args = argparser.parse_args()
+
+    ratings = get_ratings_from_ranks(range(1, args.num_participants + 1))
+    result = simulate(
+        ratings,
+        num_runs=args.runs,
+        double_elimination=not args.single_elimination,
+        shuffle=args.shuffle,
+        seed=args.seed,
+        num_workers=args.workers,
+    )
+
+    expected_placements = result.get_expected_placements()
+    win_rates = result.get_placement_distribution()[:, 1]
+    amateur_rates = result.get_amateur_rates(args.losers_round_cutoff)
+    print("Seed  Avg. placement  Wins  Amateur")
+    for i in range(args.num_participants):
+        print(
+            "{0:>4}  {1:>14.2f}  {2:>4.0%}  {3:>7.0%}".format(
+                i + 1, expected_placements[i], win_rates[i], amateur_rates[i]
+            )
+        )
+    print("Upset rate: {0:.1%}".format(result.get_upset_rate()))
+    print("Rematches per bracket: {0:.2f}".format(result.get_expected_rematches()))
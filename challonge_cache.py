@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+
+"""Briefly remembers what Challonge said about a tournament.
+
+TOs tend to submit the same tournament over and over during an event, e.g.
+retrying the amateur bracket until loser's round finishes. Reads of a
+tournament, its participants and its matches are kept for a few seconds so
+those retries don't send the same requests again. Anything anybody writes to
+a tournament drops what we remembered about it.
+"""
+
+
+import collections
+import copy
+import threading
+import time
+
+import defaults
+
+
+class ChallongeCache(object):
+    """A short-lived, thread-safe cache of Challonge reads.
+
+    Entries are scoped by the credentials they were read with and the
+    tournament they're about, so one user never sees another user's reads.
+    """
+
+    def __init__(self, ttl=defaults.DEFAULT_CHALLONGE_CACHE_TTL, max_entries=1000):
+        """Creates an empty cache.
+
+        Args:
+          ttl: How many seconds reads are remembered for.
+          max_entries: The most reads to remember at once. The oldest are
+                       forgotten first.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_invalidations = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(scope, tournament, path, params):
+        return (scope, tournament, path, tuple(sorted(params.items())))
+
+    def get(self, scope, tournament, path, params):
+        """Looks up a read.
+
+        Args:
+          scope: Identifies the credentials the read is made with.
+          tournament: The name of the tournament the read is about.
+          path: The path of the endpoint.
+          params: The params of the read.
+
+        Returns:
+          A tuple of (whether the read was found, a copy of its value).
+        """
+        key = self._get_key(scope, tournament, path, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.num_misses += 1
+                return False, None
+            self.num_hits += 1
+        return True, copy.deepcopy(entry[1])
+
+    def put(self, scope, tournament, path, params, value):
+        """Remembers a read. Arguments are the same as get's, plus its value."""
+        key = self._get_key(scope, tournament, path, params)
+        entry = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tournament):
+        """Forgets every read about a tournament, whoever made it.
+
+        Co-organizers read the same tournament with their own credentials, so
+        a write by any of them makes all of their reads stale.
+
+        Args:
+          tournament: The name of the tournament.
+        """
+        with self._lock:
+            self.num_invalidations += 1
+            stale_keys = [x for x in self._entries if x[1] == tournament]
+            for key in stale_keys:
+                del self._entries[key]
+
+    def get_stats(self):
+        """Gets counters about how well the cache is doing.
+
+        Returns:
+          A dictionary with the number of "hits", "misses" and
+          "invalidations", and the number of reads currently remembered,
+          "size".
+        """
+        with self._lock:
+            return {
+                "hits": self.num_hits,
+                "misses": self.num_misses,
+                "invalidations": self.num_invalidations,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+
+"""Runs any of the tools as a subcommand, e.g.
+
+  python challonge_tools.py seed mtvmelee72 --shuffle
+  python challonge_tools.py shuffle 64
+
+Only the module a subcommand needs is imported, once the subcommand is known,
+so --help and quick computations like `shuffle 64` don't pay for importing
+requests or NumPy.
+"""
+
+
+import argparse
+import importlib
+import sys
+
+
+# The subcommands, the modules whose main() they run, and what they do.
+SUBCOMMANDS = (
+    ("seed", "garpr_seeds_challonge",
+     "seed a Challonge tournament from the rankings"),
+    ("shuffle", "shuffle_seeds_challonge",
+     "shuffle players offline, or a tournament's seeds like reshuffle"),
+    ("reshuffle", "shuffle_seeds_challonge",
+     "shuffle a Challonge tournament's seeds"),
+    ("amateur", "create_amateur_bracket",
+     "create an amateur bracket for a Challonge tournament"),
+    ("next", "create_next_tournament",
+     "create the next tournament in a numbered series"),
+    ("rankings", "garpr_seeds",
+     "seed comma-separated names from the gaR PR rankings"),
+)
+
+# Shuffles participants without Challonge.
+_OFFLINE_SHUFFLE_MODULE = "shuffle_seeds"
+
+
+def _is_offline_shuffle(args):
+    """Whether shuffle's arguments are participants rather than a tournament.
+
+    The first argument that isn't a flag decides, e.g. "64" or "gaR, Bryan".
+    """
+    positional = next((x for x in args if not x.startswith("-")), None)
+    return positional is None or positional.isdigit() or "," in positional
+
+
+def get_module_name(command, args):
+    """Gets the name of the module that runs a subcommand.
+
+    Args:
+      command: The subcommand, e.g. "seed".
+      args: The subcommand's arguments.
+
+    Returns:
+      The module's name.
+    """
+    if command == "shuffle" and _is_offline_shuffle(args):
+        return _OFFLINE_SHUFFLE_MODULE
+    return dict((x[0], x[1]) for x in SUBCOMMANDS)[command]
+
+
+def main(argv=None):
+    """Runs a subcommand.
+
+    Args:
+      argv: The command line arguments, without the program name. Defaults to
+            sys.argv[1:].
+    """
+    argparser = argparse.ArgumentParser(
+        description="Tools for running tournaments on Challonge.",
+        epilog="commands:\n"
+        + "\n".join("  {0:<10} {1}".format(x[0], x[2]) for x in SUBCOMMANDS)
+        + "\n\nRun a command with --help to see its flags. `shuffle --help` shows"
+        "\nthe offline flags, and `reshuffle --help` the tournament's.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    argparser.add_argument(
+        "command",
+        choices=[x[0] for x in SUBCOMMANDS],
+        metavar="command",
+        help="the tool to run",
+    )
+    argparser.add_argument(
+        "args", nargs=argparse.REMAINDER, help="the tool's arguments and flags"
+    )
+    args = argparser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    module = importlib.import_module(get_module_name(args.command, args.args))
+    module.main(args.args, prog="{0} {1}".format(argparser.prog, args.command))
+
+
+if __name__ == "__main__":
+    main()
@@ -38,19 +38,19 @@ for an example config file with instructions.
 
 # Global python & package imports.
 import argparse
-import challonge
 import random
 import sys
 
 # Local imports.
+import async_challonge
+import bracket_math
 import defaults
-import puns
+import metrics
+import profiling
+import tracing
 import util
 import util_challonge
 
-# Local from imports.
-from shuffle_seeds import get_num_participants_placing_last
-
 
 # Participant param names for requests.
 _PARAMS_CHALLONGE_USERNAME = "challonge_username"
@@ -62,6 +62,9 @@ _MATCH_STATE_COMPLETE = "complete"
 _MATCH_STATE_OPEN = "open"
 _MATCH_STATE_PENDING = "pending"
 
+# The most participants registered by a single bulk add request.
+_BULK_ADD_CHUNK_SIZE = 100
+
 # Credentials keys.
 _CREDENTIALS_USER = "user"
 _CREDENTIALS_API_KEY = "api_key"
@@ -92,7 +95,7 @@ def _get_params_to_create_participant(
     seed: The seed to give the participant.
 
   Returns:
-    A dictionary that can be passed as params to challonge.participant.create
+    A dictionary that can be passed as params to client.participants.create
     to add the participant into a tourney.
   """
     params = {}
@@ -135,87 +138,159 @@ def _get_num_amateurs(num_participants, cutoff):
   Returns:
     The number of participants who will be classified as amateurs.
   """
-    # Keep eliminating a loser's round worth of people until we've reached our
-    # cutoff round. The number of eliminated people at that point is the number
-    # of amateurs.
-    num_amateurs = 0
-    for _ in range(cutoff):
-        num_eliminated = get_num_participants_placing_last(num_participants)
+    # Each loser's round eliminates a bucket worth of people, so the amateurs
+    # are everybody in the buckets up to our cutoff round.
+    return bracket_math.get_num_amateurs(num_participants, cutoff)
+
+
+def _needs_individual_registration(participant_params):
+    """Whether a participant can't be registered through a bulk add.
+
+  Bulk adds only take names, so anyone who needs anything more, like a
+  Challonge account invite, has to be registered on their own.
+
+  Args:
+    participant_params: The params created by _get_params_to_create_participant.
+
+  Returns:
+    True if the participant has to be registered individually.
+  """
+    return bool(participant_params.get(_PARAMS_CHALLONGE_USERNAME))
+
 
-        num_amateurs += num_eliminated
-        num_participants -= num_eliminated
+def _register_participants(tourney_name, all_participant_params, client=None,
+                           progress=None):
+    """Registers participants in a new tourney, keeping their seed order.
 
-    return num_amateurs
+  Consecutive participants are registered together with bulk adds, and new
+  participants are always appended to the end of the tourney, so everyone
+  ends up with the seed they were given.
 
-def get_amateur_participants(tourney_name, amateur_deciding_matches):
+  Args:
+    tourney_name: The name of the tourney to register the participants in.
+      The tourney should have no participants yet.
+    all_participant_params: A list of params created by
+      _get_params_to_create_participant, sorted by seed.
+    client: The util_challonge.ChallongeClient to use, or None for the
+      default client.
+    progress: An optional function called with (number of participants
+      registered, total number of participants) as they're registered.
+  """
+    client = client or util_challonge.get_client()
+    num_participants = len(all_participant_params)
+    pending_names = []
+    num_registered = [0]
+
+    def report_registered(num_new):
+        num_registered[0] += num_new
+        if progress:
+            progress(num_registered[0], num_participants)
+
+    def bulk_add_pending():
+        for i in range(0, len(pending_names), _BULK_ADD_CHUNK_SIZE):
+            chunk = pending_names[i:i + _BULK_ADD_CHUNK_SIZE]
+            client.participants.bulk_add(tourney_name, chunk)
+            report_registered(len(chunk))
+        del pending_names[:]
+
+    for participant_params in all_participant_params:
+        if _needs_individual_registration(participant_params):
+            bulk_add_pending()
+            client.participants.create(tourney_name, **participant_params)
+            report_registered(1)
+        else:
+            pending_names.append(participant_params[_PARAMS_NAME])
+
+    bulk_add_pending()
+
+
+def get_amateur_participants(tourney_name, amateur_deciding_matches,
+                             participants=None, client=None):
     """
     Get a the players eligible for the amateur bracket.
 
+    All the participants are fetched with a single request, so this costs the
+    same no matter how big the bracket is.
+
     @params tourney_name: name of the tourney.
     @params amateur_deciding_matches: matches that feed into the amateur
         bracket.
+    @params participants: the tourney's participants, if they've already been
+        fetched.
+    @params client: the util_challonge.ChallongeClient to use, or None for the
+        default client.
     @returns: list of players.
-    @raises MainTournamentNotFarEnoughAlong: iff main bracket still has matches
-        that need to be completed.
+    @raises AmateurBracketRequiredMatchesIncompleteError: iff main bracket
+        still has matches that need to be completed.
 
     """
+    # We can't create an amateur bracket if any of the loser's matches'
+    # state is 'pending'.
+    num_pending_matches = sum(
+        1 for x in amateur_deciding_matches
+            if x[_PARAMS_STATE] not in (_MATCH_STATE_COMPLETE, _MATCH_STATE_OPEN)
+    )
+    if num_pending_matches:
+        raise AmateurBracketRequiredMatchesIncompleteError(
+            "Some loser's bracket matches don't have two players in them "
+            "yet. Cannot create amateur bracket.", num_pending_matches)
+
+    if participants is None:
+        client = client or util_challonge.get_client()
+        participants = client.participants.index(tourney_name)
+    participants_by_id = {x["id"]: x for x in participants}
+
     amateur_infos = []
     for match in amateur_deciding_matches:
         if match[_PARAMS_STATE] == _MATCH_STATE_COMPLETE:
-            id = match["loser_id"]
-            player = challonge.participants.show(tourney_name, id)
-        elif match[_PARAMS_STATE] == _MATCH_STATE_OPEN:
+            player = dict(participants_by_id[match["loser_id"]])
+        else:
             # If the match isn't complete, create a frankenplayer by
             # combining the two players' tags and averaging their seed.
-            id1 = match["player1_id"]
-            id2 = match["player2_id"]
-            player1 = challonge.participants.show(tourney_name, id1)
-            player2 = challonge.participants.show(tourney_name, id2)
+            player1 = participants_by_id[match["player1_id"]]
+            player2 = participants_by_id[match["player2_id"]]
 
-            player = player1
+            player = dict(player1)
             player[_PARAMS_SEED] = (player1[_PARAMS_SEED] +
                                     player2[_PARAMS_SEED]) // 2
             player['display_name'] = '{} / {}'.format(player1['display_name'],
                                                       player2['display_name'])
             player[_PARAMS_CHALLONGE_USERNAME] = None
-        else:
-            # We can't create an amateur bracket if any of the loser's matches'
-            # state is 'pending'.
-            num_pending_matches = sum(
-                1 for x in amateur_deciding_matches
-                    if x[_PARAMS_STATE] == _MATCH_STATE_PENDING
-            )
-            err = MainTournamentNotFarEnoughAlong(
-                "Some loser's bracket matches don't have two players in them "
-                "yet. Cannot create amateur bracket.")
-            err.matches_remaining = num_pending_matches
-            raise err
 
         amateur_infos.append(player)
     return amateur_infos
 
 
-def create_amateur_bracket(tourney_url, single_elimination,
-                           losers_round_cutoff, randomize_seeds,
-                           associate_challonge_accounts=False,
-                           incomplete=False, interactive=False):
+async def async_create_amateur_bracket(tourney_url, single_elimination,
+                                       losers_round_cutoff, randomize_seeds,
+                                       associate_challonge_accounts=False,
+                                       incomplete=False, interactive=False,
+                                       client=None, progress=None):
     """
-    Create the amateur bracket.
-
-    Most of the params are the same as their argparse counterpart.
+    Asyncio version of create_amateur_bracket.
 
-    @param interactive: If this is being run on the command line and can take
-        user input.
+    Everything we need to read from Challonge is fetched at the same time.
 
-    @returns: URL of the generated amateur bracket.
+    @params: same as create_amateur_bracket.
+    @returns: same as create_amateur_bracket.
 
     """
     # Create the info for our amateur's bracket.
+    sync_client = client or util_challonge.get_client()
+    client = async_challonge.AsyncChallongeClient(sync_client)
     tourney_name = util_challonge.extract_tourney_name(tourney_url)
-    tourney_info = challonge.tournaments.show(tourney_name)
+    amateur_tourney_name = tourney_name + "_amateur"
+    with tracing.span("fetch", tourney=tourney_name) as span:
+        (tourney_info, existing_amateur_tournament, matches,
+         participants) = await async_challonge.gather_or_raise(
+            client.tournaments.show(tourney_name),
+            async_challonge.get_tourney_info(client, amateur_tourney_name),
+            client.matches.index(tourney_name),
+            client.participants.index(tourney_name),
+        )
+        span.set(num_participants=len(participants), num_matches=len(matches))
     tourney_title = tourney_info["name"]
     amateur_tourney_title = tourney_title + " Amateur's Bracket"
-    amateur_tourney_name = tourney_name + "_amateur"
     amateur_tourney_url = util_challonge.tourney_name_to_url(amateur_tourney_name)
     if single_elimination:
         amateur_tourney_type = "single elimination"
@@ -223,7 +298,6 @@ def create_amateur_bracket(tourney_url, single_elimination,
         amateur_tourney_type = "double elimination"
 
     # Make sure the tournament doesn't already exist.
-    existing_amateur_tournament = util_challonge.get_tourney_info(amateur_tourney_name)
     if existing_amateur_tournament:
         raise AmateurBracketAlreadyExistsError(
             "Amateur tournament already exists at {}."
@@ -231,13 +305,17 @@ def create_amateur_bracket(tourney_url, single_elimination,
 
     # Get all decided loser's matches until the cutoff.
     cutoff = losers_round_cutoff
-    matches = challonge.matches.index(tourney_name)
-    amateur_deciding_matches = _get_losers_matches_determining_amateurs(matches, cutoff)
-    num_completed_deciding_matches = sum(
-        1 for x in amateur_deciding_matches
-            if x[_PARAMS_STATE] == _MATCH_STATE_COMPLETE
-    )
-    num_amateurs = _get_num_amateurs(tourney_info["participants_count"], cutoff)
+    with tracing.span("plan_amateurs", losers_round_cutoff=cutoff) as span:
+        amateur_deciding_matches = _get_losers_matches_determining_amateurs(
+            matches, cutoff)
+        num_completed_deciding_matches = sum(
+            1 for x in amateur_deciding_matches
+                if x[_PARAMS_STATE] == _MATCH_STATE_COMPLETE
+        )
+        num_amateurs = _get_num_amateurs(tourney_info["participants_count"],
+                                         cutoff)
+        span.set(num_amateurs=num_amateurs,
+                 num_completed_matches=num_completed_deciding_matches)
 
     # If they're not all complete, we don't have enough info to create the
     # amateur bracket.
@@ -265,25 +343,28 @@ def create_amateur_bracket(tourney_url, single_elimination,
         elif not incomplete:
             raise err
 
-    # Gather up all the amateurs.
-    amateur_infos = get_amateur_participants(tourney_name,
-                                             amateur_deciding_matches)
+    with tracing.span("get_amateur_participants") as span:
+        # Gather up all the amateurs.
+        amateur_infos = get_amateur_participants(tourney_name,
+                                                 amateur_deciding_matches,
+                                                 participants)
 
-    # Sort them based on seeding.
-    if randomize_seeds:
-        seed_fn = lambda x: random.random()
-    else:
-        seed_fn = lambda x: x[_PARAMS_SEED]
-    amateur_infos = sorted(amateur_infos, key=seed_fn)
-
-    all_amateur_params = [
-        _get_params_to_create_participant(
-            amateur_info,
-            associate_challonge_account=associate_challonge_accounts,
-            seed=seed
-        )
-        for seed, amateur_info in enumerate(amateur_infos, 1)
-    ]
+        # Sort them based on seeding.
+        if randomize_seeds:
+            seed_fn = lambda x: random.random()
+        else:
+            seed_fn = lambda x: x[_PARAMS_SEED]
+        amateur_infos = sorted(amateur_infos, key=seed_fn)
+
+        all_amateur_params = [
+            _get_params_to_create_participant(
+                amateur_info,
+                associate_challonge_account=associate_challonge_accounts,
+                seed=seed
+            )
+            for seed, amateur_info in enumerate(amateur_infos, 1)
+        ]
+        span.set(num_amateurs=len(all_amateur_params))
 
     if interactive:
         # Confirm with the user that this is all okay.
@@ -318,6 +399,7 @@ def create_amateur_bracket(tourney_url, single_elimination,
         print()
         if not util.prompt_yes_no("Is it okay to create this amateur's bracket?"):
             print("Aw man. Alright, I'm not creating this amateur's bracket.")
+            import puns
             print(random.choice(puns.AMATEUR_PUNS))
             print(
                 "( Feel free to report bugs and request features at "
@@ -327,12 +409,17 @@ def create_amateur_bracket(tourney_url, single_elimination,
 
     # We've got confirmation. Go ahead and create the amateur bracket.
     tourney, subdomain = util_challonge.tourney_name_to_parts(amateur_tourney_name)
-    challonge.tournaments.create(
-        amateur_tourney_title, tourney, amateur_tourney_type,
-        subdomain=subdomain)
-
-    for amateur_params in all_amateur_params:
-        challonge.participants.create(amateur_tourney_name, **amateur_params)
+    with tracing.span("create_tournament", tourney=amateur_tourney_name):
+        await client.tournaments.create(
+            amateur_tourney_title, tourney, amateur_tourney_type,
+            subdomain=subdomain)
+
+    with tracing.span("register_participants",
+                      num_participants=len(all_amateur_params)):
+        await async_challonge.run_blocking(_register_participants,
+                                           amateur_tourney_name,
+                                           all_amateur_params, sync_client,
+                                           progress)
 
     if interactive:
         print("Created {0} at {1}.".format(amateur_tourney_title, amateur_tourney_url))
@@ -340,9 +427,54 @@ def create_amateur_bracket(tourney_url, single_elimination,
 
     return amateur_tourney_url
 
-if __name__ == "__main__":
-    argparser = argparse.ArgumentParser(description="Create amateur brackets.",
-                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+@metrics.timed_operation("create_amateur_bracket")
+@tracing.traced("create_amateur_bracket")
+def create_amateur_bracket(tourney_url, single_elimination,
+                           losers_round_cutoff, randomize_seeds,
+                           associate_challonge_accounts=False,
+                           incomplete=False, interactive=False, client=None,
+                           progress=None):
+    """
+    Create the amateur bracket.
+
+    Most of the params are the same as their argparse counterpart.
+
+    @param interactive: If this is being run on the command line and can take
+        user input.
+    @param client: The util_challonge.ChallongeClient to use, or None for the
+        default client.
+    @param progress: An optional function called with (number of participants
+        registered, total number of participants) as the amateur bracket is
+        filled in.
+
+    @returns: URL of the generated amateur bracket.
+
+    """
+    return async_challonge.run(async_create_amateur_bracket(
+        tourney_url,
+        single_elimination=single_elimination,
+        losers_round_cutoff=losers_round_cutoff,
+        randomize_seeds=randomize_seeds,
+        associate_challonge_accounts=associate_challonge_accounts,
+        incomplete=incomplete,
+        interactive=interactive,
+        client=client,
+        progress=progress))
+
+def main(argv=None, prog=None):
+    """
+    Run the command line tool.
+
+    @param argv: the command line arguments, without the program name.
+        Defaults to sys.argv[1:].
+    @param prog: the name of the program in usage messages. Defaults to the
+        script's name.
+
+    """
+    argparser = argparse.ArgumentParser(
+        prog=prog, description="Create amateur brackets.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     argparser.add_argument(
         "tourney_name",
         help="the name of the tourney to create an amateur " "bracket for",
@@ -385,7 +517,13 @@ if __name__ == "__main__":
         "This will invite their Challonge account to "
         "the tourney via email, so use responsibly.",
     )
-    args = argparser.parse_args()
+    metrics.add_arguments(argparser)
+    profiling.add_arguments(argparser)
+    tracing.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+    metrics.from_args(args)
+    tracing.from_args(args)
+    profiling.from_args(args)
 
     # We need to initialize our Challonge credentials before we can
     # make any API calls.
@@ -406,3 +544,7 @@ if __name__ == "__main__":
     except (AmateurBracketAlreadyExistsError,
             AmateurBracketRequiredMatchesIncompleteError) as e:
         print(e)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,21 @@
 """
-Reads
+Creates the next tournament in a numbered series, e.g. mtvmelee73 after
+mtvmelee72, copying the latest tournament's settings.
+
+Reads the latest tournament's URL and your Challonge credentials from an .ini
+file, and updates the file with the new tournament's URL.
 """
 import argparse
 import configparser
 import re
 
-import challonge
+import metrics
+import profiling
+import tracing
 import util_challonge
 
-def extract_tourney_num(tourney_id):
-    """Extract the numbers at the end of tournament series."""
-    m = re.search(r'(\d+)$', tourney_id)
-    return int(m.group(1))
-
-# Get config file from args.
-parser = argparse.ArgumentParser()
-parser.add_argument('-i', '--ini', default='create_next.ini',
-                    help='config file to read from')
-args = parser.parse_args()
-
-config = configparser.ConfigParser()
-config.read(args.ini)
-latest_url = config['Settings']['latest_tournament_url']
-user = config['Settings']['user']
-api_key = config['Settings']['api_key']
-tourney_id = util_challonge.extract_tourney_name(latest_url)
-
-challonge.set_credentials(user, api_key)
 # Parameters to copy from previous tournament.
-parameters = challonge.tournaments.show(tourney_id)
-important_keys = {
+IMPORTANT_KEYS = {
     'name', 'tournament_type', 'url', 'subdomain', 'description',
     'open_signup', 'hold_third_place_match', 'pts_for_match_win',
     'pts_for_match_tie', 'pts_for_game_win', 'pts_for_game_tie',
@@ -41,27 +27,101 @@ important_keys = {
     'signup_cap', 'check_in_duration', 'grand_finals_modifier',
 }
 
-parameters = {k:parameters[k] for k in parameters
-              if k in important_keys}
-# Increment the tournament's number.
-number = extract_tourney_num(tourney_id)
-name = re.sub(str(number), str(number+1), parameters['name'])
-url = re.sub(str(number), str(number+1), parameters['url'])
-tourney_id = re.sub(str(number), str(number+1), tourney_id)
-
-del parameters['name']
-del parameters['url']
-
-challonge.tournaments.create(
-    name,
-    url,
-    **parameters
-)
-
-full_url = util_challonge.tourney_name_to_url(tourney_id)
-print('Created tournament {}'.format(full_url))
-
-# Update the .ini file with the new tournament URL.
-config['Settings']['latest_tournament_url'] = full_url
-with open(args.ini, 'w') as f:
-    config.write(f)
+
+def extract_tourney_num(tourney_id):
+    """Extract the numbers at the end of tournament series."""
+    m = re.search(r'(\d+)$', tourney_id)
+    return int(m.group(1))
+
+
+def get_next_tournament_params(tourney_id, parameters):
+    """
+    Work out the next tournament in a series from the latest one.
+
+    @param tourney_id: the name of the latest tournament, e.g. mtvmelee72.
+    @param parameters: the latest tournament, as Challonge returns it.
+
+    @returns: a tuple of the next tournament's name (e.g. mtvmelee73), its
+        title, its URL name, and the rest of the params to create it with.
+    """
+    parameters = {k: parameters[k] for k in parameters
+                  if k in IMPORTANT_KEYS}
+    # Increment the tournament's number.
+    number = extract_tourney_num(tourney_id)
+    name = re.sub(str(number), str(number+1), parameters.pop('name'))
+    url = re.sub(str(number), str(number+1), parameters.pop('url'))
+    tourney_id = re.sub(str(number), str(number+1), tourney_id)
+    return tourney_id, name, url, parameters
+
+
+@metrics.timed_operation('create_next_tournament')
+@tracing.traced('create_next_tournament')
+def create_next_tournament(latest_url, client=None):
+    """
+    Create the next tournament in a series on Challonge.
+
+    @param latest_url: the URL of the latest tournament in the series.
+    @param client: the util_challonge.ChallongeClient to use, or None for the
+        default client.
+
+    @returns: the URL of the new tournament.
+    """
+    client = client or util_challonge.get_client()
+    tourney_id = util_challonge.extract_tourney_name(latest_url)
+
+    with tracing.span('fetch_previous', tourney=tourney_id):
+        parameters = client.tournaments.show(tourney_id)
+
+    tourney_id, name, url, parameters = get_next_tournament_params(
+        tourney_id, parameters)
+
+    with tracing.span('create_tournament', tourney=tourney_id):
+        client.tournaments.create(
+            name,
+            url,
+            **parameters
+        )
+
+    return util_challonge.tourney_name_to_url(tourney_id)
+
+
+def main(argv=None, prog=None):
+    """
+    Run the command line tool.
+
+    @param argv: the command line arguments, without the program name.
+        Defaults to sys.argv[1:].
+    @param prog: the name of the program in usage messages. Defaults to the
+        script's name.
+
+    """
+    # Get config file from args.
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument('-i', '--ini', default='create_next.ini',
+                        help='config file to read from')
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    tracing.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics.from_args(args)
+    tracing.from_args(args)
+    profiling.from_args(args)
+
+    config = configparser.ConfigParser()
+    config.read(args.ini)
+    latest_url = config['Settings']['latest_tournament_url']
+    user = config['Settings']['user']
+    api_key = config['Settings']['api_key']
+
+    util_challonge.set_credentials(user, api_key)
+    full_url = create_next_tournament(latest_url)
+    print('Created tournament {}'.format(full_url))
+
+    # Update the .ini file with the new tournament URL.
+    config['Settings']['latest_tournament_url'] = full_url
+    with open(args.ini, 'w') as f:
+        config.write(f)
+
+
+if __name__ == '__main__':
+    main()
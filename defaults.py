@@ -1,2 +1,26 @@
+import os
+
+
 DEFAULT_CONFIG_FILENAME = "challonge.ini"
 DEFAULT_REGION = "norcal"
+DEFAULT_BRAACKET_LEAGUE = "mtvmelee"
+
+_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "challonge-tools",
+)
+
+# Where downloaded rankings are cached, how many seconds they're used before
+# being revalidated, and how many seconds a download may take before the
+# cached copy is used instead.
+DEFAULT_RANKING_CACHE_DIR = os.path.join(_CACHE_DIR, "rankings")
+DEFAULT_RANKING_CACHE_TTL = 12 * 60 * 60
+DEFAULT_RANKING_FETCH_TIMEOUT = 10
+
+# Where the webapp keeps track of its background jobs, and how many run at
+# once.
+DEFAULT_JOBS_DB = os.path.join(_CACHE_DIR, "jobs.sqlite3")
+DEFAULT_NUM_JOB_WORKERS = 4
+
+# How many seconds the webapp remembers what Challonge said about a tournament.
+DEFAULT_CHALLONGE_CACHE_TTL = 30
@@ -0,0 +1,782 @@
+#!/usr/bin/env python3
+
+
+"""A local stand-in for the Challonge API.
+
+Serves the tournament, participant and match endpoints the tools use from
+memory, so they can be load tested and their requests counted without
+touching the real service. Seeds shift the way Challonge shifts them, and
+starting a tournament lays out its matches with bracket.py.
+
+The server can also slow down or fail requests on purpose, with a fixed
+latency and a chance of answering 429 or 5xx, and can record what the real
+Challonge answers and replay it later.
+
+Examples:
+
+  # Serve a fake Challonge, and point the tools at it.
+  python fake_challonge.py --port 8000 --latency 0.1 --throttle_rate 0.05
+  CHALLONGE_API_URL=http://127.0.0.1:8000/v1 python garpr_seeds_challonge.py ...
+
+  # Record what Challonge says, then answer the same requests offline.
+  python fake_challonge.py --port 8000 --record captured.json
+  python fake_challonge.py --port 8000 --replay captured.json
+"""
+
+
+import argparse
+import base64
+import collections
+import http.server
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+import requests
+
+import bracket
+import util_challonge
+
+
+FAKE = "fake"
+RECORD = "record"
+REPLAY = "replay"
+
+_PATH_PREFIX = "/v1/"
+
+
+class FakeChallongeError(Exception):
+    """A request the fake Challonge rejects, with the status to answer."""
+
+    def __init__(self, status, *errors):
+        super().__init__(*errors)
+        self.status = status
+
+
+def _parse_params(pairs):
+    """Un-nests Challonge's form params, e.g. participant[seed]=1 => seed=1.
+
+    Params nested under a list, like participants[][name], are collected into
+    lists.
+
+    Args:
+      pairs: A list of (key, value) tuples.
+
+    Returns:
+      A dictionary of params.
+    """
+    params = {}
+    for key, value in pairs:
+        if "[" in key:
+            is_list = "[]" in key
+            key = key[key.rindex("[") + 1 : -1]
+            if is_list:
+                params.setdefault(key, []).append(value)
+                continue
+        params[key] = value
+    return params
+
+
+class _Tournament(object):
+    """A tournament with its participants, in seed order, and its matches."""
+
+    def __init__(self, tournament_id, params):
+        self.id = tournament_id
+        self.params = dict(params)
+        self.state = "pending"
+        self.participants = []
+        self.matches = []
+        self.layout = None
+        # While underway, the participant ID in each slot of the layout, or
+        # None if it's empty or not decided yet, and which slots are decided.
+        self.slots = []
+        self.decided = []
+
+    def to_json(self):
+        doc = {
+            "id": self.id,
+            "state": self.state,
+            "participants_count": len(self.participants),
+            "tournament_type": "single elimination",
+            "subdomain": None,
+        }
+        doc.update(self.params)
+        doc["full_challonge_url"] = util_challonge.tourney_name_to_url(
+            _get_tourney_name(doc)
+        )
+        return doc
+
+
+def _get_tourney_name(params):
+    """Gets the name tournaments are requested by, e.g. "sub-url"."""
+    if params.get("subdomain"):
+        return "{0}-{1}".format(params["subdomain"], params["url"])
+    return params["url"]
+
+
+class FakeChallonge(object):
+    """The state of a fake Challonge, and how it answers requests.
+
+    Every method is thread-safe.
+    """
+
+    def __init__(self):
+        self._tournaments = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def _get_tournament(self, tourney_name):
+        tournament = self._tournaments.get(tourney_name)
+        if tournament is None:
+            raise FakeChallongeError(404, "Requested tournament not found")
+        return tournament
+
+    def _get_participant(self, tournament, participant_id):
+        for participant in tournament.participants:
+            if str(participant["id"]) == str(participant_id):
+                return participant
+        raise FakeChallongeError(404, "Requested participant not found")
+
+    @staticmethod
+    def _renumber(tournament):
+        for seed, participant in enumerate(tournament.participants, 1):
+            participant["seed"] = seed
+
+    def create_tournament(self, name, url, tournament_type="single elimination",
+                          **params):
+        """Creates a tournament.
+
+        Args:
+          name: The tournament's title.
+          url: The name at the end of the tournament's URL.
+          tournament_type: e.g. "double elimination".
+          params: Any other params Challonge takes, e.g. subdomain.
+
+        Returns:
+          The tournament, like Challonge returns it.
+        """
+        params.update({"name": name, "url": url, "tournament_type": tournament_type})
+        with self._lock:
+            tourney_name = _get_tourney_name(params)
+            if tourney_name in self._tournaments:
+                raise FakeChallongeError(422, "URL is already taken")
+            tournament = _Tournament(next(self._ids), params)
+            self._tournaments[tourney_name] = tournament
+            return tournament.to_json()
+
+    def add_participant(self, tourney_name, name, seed=None, **params):
+        """Adds a participant, shifting everybody at and after their seed down.
+
+        Args:
+          tourney_name: The name of the tournament.
+          name: The participant's name.
+          seed: Their seed, or None to add them at the end.
+          params: Any other params Challonge takes, e.g. challonge_username.
+
+        Returns:
+          The participant, like Challonge returns it.
+        """
+        with self._lock:
+            tournament = self._get_tournament(tourney_name)
+            if tournament.state != "pending":
+                raise FakeChallongeError(
+                    422, "Participants can't be added once the tournament starts"
+                )
+
+            participant = {
+                "id": next(self._ids),
+                "tournament_id": tournament.id,
+                "name": name,
+                "display_name": params.get("challonge_username") or name,
+                "challonge_username": params.get("challonge_username"),
+                "misc": params.get("misc"),
+            }
+            num_participants = len(tournament.participants)
+            position = num_participants if seed is None else int(seed) - 1
+            position = min(max(position, 0), num_participants)
+            tournament.participants.insert(position, participant)
+            self._renumber(tournament)
+            return dict(participant)
+
+    def update_participant(self, tourney_name, participant_id, **params):
+        """Updates a participant. Changing their seed shifts everybody between
+        their old and new seeds by one, like Challonge does.
+
+        Returns:
+          The participant, like Challonge returns it.
+        """
+        with self._lock:
+            tournament = self._get_tournament(tourney_name)
+            participant = self._get_participant(tournament, participant_id)
+            seed = params.pop("seed", None)
+            if seed is not None:
+                if tournament.state != "pending":
+                    raise FakeChallongeError(
+                        422, "Seeds can't change once the tournament starts"
+                    )
+                tournament.participants.remove(participant)
+                position = min(max(int(seed) - 1, 0), len(tournament.participants))
+                tournament.participants.insert(position, participant)
+                self._renumber(tournament)
+            for key in ("name", "challonge_username", "misc"):
+                if key in params:
+                    participant[key] = params[key]
+            if "name" in params and not participant.get("challonge_username"):
+                participant["display_name"] = params["name"]
+            return dict(participant)
+
+    def start_tournament(self, tourney_name):
+        """Starts a tournament, laying out its matches.
+
+        Matches are numbered by round like Challonge numbers them, and byes
+        aren't listed. A grand finals reset isn't played: whoever wins grand
+        finals wins the tournament.
+
+        Returns:
+          The tournament, like Challonge returns it.
+        """
+        with self._lock:
+            tournament = self._get_tournament(tourney_name)
+            if tournament.state != "pending":
+                raise FakeChallongeError(422, "The tournament has already started")
+            if len(tournament.participants) < 2:
+                raise FakeChallongeError(422, "Not enough participants")
+
+            double_elimination = (
+                tournament.params["tournament_type"] == "double elimination"
+            )
+            layout = bracket.Bracket(len(tournament.participants), double_elimination)
+            tournament.layout = layout
+            tournament.slots = [None] * (layout.num_seed_slots + 2 * layout.num_matches)
+            tournament.decided = [False] * len(tournament.slots)
+            for seed in range(1, layout.num_seed_slots + 1):
+                if seed <= len(tournament.participants):
+                    tournament.slots[seed - 1] = tournament.participants[seed - 1]["id"]
+                tournament.decided[seed - 1] = True
+
+            tournament.matches = []
+            for match in range(layout.num_matches):
+                if layout.is_bye[match]:
+                    tournament.matches.append(None)
+                    continue
+                tournament.matches.append(
+                    {
+                        "id": next(self._ids),
+                        "tournament_id": tournament.id,
+                        "round": int(layout.match_rounds[match]),
+                        "state": "pending",
+                        "player1_id": None,
+                        "player2_id": None,
+                        "winner_id": None,
+                        "loser_id": None,
+                        "scores_csv": "",
+                    }
+                )
+            tournament.state = "underway"
+            self._advance(tournament)
+            return tournament.to_json()
+
+    @staticmethod
+    def _advance(tournament):
+        """Moves players along the bracket after byes and finished matches."""
+        layout = tournament.layout
+        slots = tournament.slots
+        decided = tournament.decided
+        for match, (slot_a, slot_b) in enumerate(layout.match_inputs):
+            output = layout.num_seed_slots + 2 * match
+            if decided[output]:
+                continue
+
+            doc = tournament.matches[match]
+            if doc is None:
+                # A bye: whoever's there goes straight through.
+                if decided[slot_a] and decided[slot_b]:
+                    slots[output] = slots[slot_a] or slots[slot_b]
+                    decided[output] = decided[output + 1] = True
+                continue
+
+            doc["player1_id"] = slots[slot_a] if decided[slot_a] else None
+            doc["player2_id"] = slots[slot_b] if decided[slot_b] else None
+            if doc["state"] == "complete":
+                slots[output] = doc["winner_id"]
+                slots[output + 1] = doc["loser_id"]
+                decided[output] = decided[output + 1] = True
+            elif doc["player1_id"] and doc["player2_id"]:
+                doc["state"] = "open"
+
+        if all(x is None or x["state"] == "complete" for x in tournament.matches):
+            tournament.state = "complete"
+
+    def report_match(self, tourney_name, match_id, winner_id, scores_csv="1-0"):
+        """Reports the result of an open match.
+
+        Returns:
+          The match, like Challonge returns it.
+        """
+        with self._lock:
+            tournament = self._get_tournament(tourney_name)
+            for doc in tournament.matches:
+                if doc is not None and str(doc["id"]) == str(match_id):
+                    break
+            else:
+                raise FakeChallongeError(404, "Requested match not found")
+
+            if doc["state"] != "open":
+                raise FakeChallongeError(422, "The match isn't open")
+            players = (doc["player1_id"], doc["player2_id"])
+            if int(winner_id) not in players:
+                raise FakeChallongeError(422, "The winner isn't in the match")
+
+            doc["winner_id"] = int(winner_id)
+            doc["loser_id"] = players[1] if players[0] == int(winner_id) else players[0]
+            doc["scores_csv"] = scores_csv
+            doc["state"] = "complete"
+            self._advance(tournament)
+            return dict(doc)
+
+    def get_tournament(self, tourney_name):
+        """Gets a tournament, like Challonge returns it."""
+        with self._lock:
+            return self._get_tournament(tourney_name).to_json()
+
+    def get_participants(self, tourney_name):
+        """Gets a tournament's participants, like Challonge returns them."""
+        with self._lock:
+            return [dict(x) for x in self._get_tournament(tourney_name).participants]
+
+    def get_matches(self, tourney_name, state="all"):
+        """Gets a tournament's matches, like Challonge returns them.
+
+        Args:
+          tourney_name: The name of the tournament.
+          state: "all", or only get matches that are "pending", "open" or
+                 "complete".
+        """
+        with self._lock:
+            return [
+                dict(x)
+                for x in self._get_tournament(tourney_name).matches
+                if x is not None and state in ("all", x["state"])
+            ]
+
+    def handle(self, method, path, params):
+        """Answers an API request.
+
+        Args:
+          method: The HTTP method.
+          path: The path of the endpoint, without the version or ".json", e.g.
+                "tournaments/mtvmelee72/participants".
+          params: The un-nested params of the request.
+
+        Raises:
+          FakeChallongeError: If Challonge would reject the request.
+
+        Returns:
+          What Challonge would answer, before being encoded as JSON.
+        """
+        parts = path.strip("/").split("/")
+        if parts[0] != "tournaments":
+            raise FakeChallongeError(404, "Unknown endpoint")
+
+        if len(parts) == 1 and method == "POST":
+            params = dict(params)
+            tournament = self.create_tournament(
+                params.pop("name"),
+                params.pop("url"),
+                params.pop("tournament_type", "single elimination"),
+                **params
+            )
+            return {"tournament": tournament}
+        if len(parts) == 2 and method == "GET":
+            return {"tournament": self.get_tournament(parts[1])}
+        if len(parts) == 3 and parts[2] == "start" and method == "POST":
+            return {"tournament": self.start_tournament(parts[1])}
+
+        if len(parts) >= 3 and parts[2] == "participants":
+            if len(parts) == 3 and method == "GET":
+                return [{"participant": x} for x in self.get_participants(parts[1])]
+            if len(parts) == 3 and method == "POST":
+                params = dict(params)
+                return {
+                    "participant": self.add_participant(
+                        parts[1], params.pop("name"), params.pop("seed", None), **params
+                    )
+                }
+            if len(parts) == 4 and parts[3] == "bulk_add" and method == "POST":
+                names = params.get("name", [])
+                if not isinstance(names, list):
+                    names = [names]
+                return [
+                    {"participant": self.add_participant(parts[1], x)} for x in names
+                ]
+            if len(parts) == 4 and method == "GET":
+                with self._lock:
+                    tournament = self._get_tournament(parts[1])
+                    return {"participant": dict(self._get_participant(tournament, parts[3]))}
+            if len(parts) == 4 and method == "PUT":
+                return {
+                    "participant": self.update_participant(parts[1], parts[3], **params)
+                }
+
+        if len(parts) >= 3 and parts[2] == "matches":
+            if len(parts) == 3 and method == "GET":
+                matches = self.get_matches(parts[1], params.get("state", "all"))
+                return [{"match": x} for x in matches]
+            if len(parts) == 4 and method == "PUT":
+                return {
+                    "match": self.report_match(
+                        parts[1],
+                        parts[3],
+                        params["winner_id"],
+                        params.get("scores_csv", "1-0"),
+                    )
+                }
+
+        raise FakeChallongeError(404, "Unknown endpoint")
+
+
+class _Recording(object):
+    """Responses captured from Challonge, answered in the order they came.
+
+    Once a request's captured responses run out, the last one is repeated.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = list(entries)
+        self._responses = collections.defaultdict(collections.deque)
+        for entry in self.entries:
+            self._responses[self._get_key(entry)].append(entry)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(entry):
+        return (entry["method"], entry["path"], json.dumps(sorted(entry["params"])))
+
+    def add(self, method, path, pairs, status, body):
+        with self._lock:
+            self.entries.append(
+                {
+                    "method": method,
+                    "path": path,
+                    "params": [list(x) for x in pairs],
+                    "status": status,
+                    "body": body,
+                }
+            )
+
+    def get(self, method, path, pairs):
+        key = self._get_key({"method": method, "path": path, "params": pairs})
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                return None
+            entry = responses.popleft() if len(responses) > 1 else responses[0]
+            return entry["status"], entry["body"]
+
+
+class FakeChallongeServer(object):
+    """Serves a FakeChallonge over HTTP on a background thread.
+
+    Attributes:
+      challonge: The FakeChallonge answering requests.
+      request_counts: A collections.Counter of the requests served, by
+                      (method, path) with tournament and participant names
+                      replaced by placeholders, e.g.
+                      ("PUT", "tournaments/:tournament/participants/:id").
+    """
+
+    def __init__(
+        self,
+        challonge=None,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        throttle_rate=0.0,
+        error_rate=0.0,
+        retry_after=0,
+        seed=None,
+        mode=FAKE,
+        recording_path=None,
+        upstream_url=util_challonge.CHALLONGE_API_URL,
+    ):
+        """Creates a server. It starts serving when start is called.
+
+        Args:
+          challonge: The FakeChallonge to serve, or None for an empty one.
+          host: The host to listen on.
+          port: The port to listen on, or 0 for any free port.
+          latency: How many seconds to wait before answering each request.
+          throttle_rate: The chance of answering a request with a 429.
+          error_rate: The chance of answering a request with a 503.
+          retry_after: The Retry-After to send with 429s, in seconds.
+          seed: A seed for which requests fail, or None.
+          mode: FAKE to answer from memory, RECORD to forward requests to
+                upstream_url and capture the answers, or REPLAY to answer
+                from captured answers.
+          recording_path: The JSON file captured answers are replayed from, or
+                          saved to when the server stops.
+          upstream_url: The URL of the real Challonge API, to record from.
+        """
+        self.challonge = challonge or FakeChallonge()
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.mode = mode
+        self.recording_path = recording_path
+        self.upstream_url = upstream_url.rstrip("/")
+        self.request_counts = collections.Counter()
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._failures = collections.deque()
+        self._session = requests.Session() if mode == RECORD else None
+
+        entries = ()
+        if mode == REPLAY:
+            with open(recording_path) as f:
+                entries = json.load(f)
+        self.recording = _Recording(entries)
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self)
+
+            do_POST = do_PUT = do_DELETE = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """The URL to give a util_challonge.ChallongeClient as its base_url."""
+        host, port = self._httpd.server_address[:2]
+        return "http://{0}:{1}/v1".format(host, port)
+
+    @property
+    def num_requests(self):
+        """How many requests have been served."""
+        with self._lock:
+            return sum(self.request_counts.values())
+
+    def start(self):
+        """Starts serving on a background thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving, saving what was recorded if recording."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self.mode == RECORD and self.recording_path:
+            self.save_recording(self.recording_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def get_client(self, user="fake", api_key="fake", **kwargs):
+        """Creates a util_challonge.ChallongeClient that talks to this server.
+
+        Args:
+          user: The username to send.
+          api_key: The API key to send.
+          kwargs: Any other arguments for the ChallongeClient, e.g. backoff.
+        """
+        return util_challonge.ChallongeClient(
+            user, api_key, base_url=self.base_url, **kwargs
+        )
+
+    def fail_next(self, status, num_requests=1):
+        """Makes the next requests fail, regardless of the failure rates.
+
+        Args:
+          status: The status to answer with, e.g. 429 or 502.
+          num_requests: How many requests to fail.
+        """
+        with self._lock:
+            self._failures.extend([status] * num_requests)
+
+    def reset_counts(self):
+        """Forgets how many requests have been served."""
+        with self._lock:
+            self.request_counts.clear()
+
+    def save_recording(self, path):
+        """Saves what was recorded as JSON, for REPLAY mode."""
+        with open(path, "w") as f:
+            json.dump(self.recording.entries, f, indent=2)
+
+    def _get_failure(self):
+        with self._lock:
+            if self._failures:
+                return self._failures.popleft()
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def _handle(self, handler):
+        url = urllib.parse.urlsplit(handler.path)
+        path = url.path
+        if path.startswith(_PATH_PREFIX):
+            path = path[len(_PATH_PREFIX) :]
+        if path.endswith(".json"):
+            path = path[: -len(".json")]
+
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length).decode() if length else ""
+        pairs = urllib.parse.parse_qsl(url.query, keep_blank_values=True)
+        pairs += urllib.parse.parse_qsl(body, keep_blank_values=True)
+
+        with self._lock:
+            endpoint = util_challonge.get_endpoint(path)
+            self.request_counts[(handler.command, endpoint)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        headers = {}
+        failure = self._get_failure()
+        if failure is not None:
+            status, doc = failure, {"errors": ["Injected failure"]}
+            if failure == 429:
+                headers["Retry-After"] = str(self.retry_after)
+        elif self.mode == REPLAY:
+            response = self.recording.get(handler.command, path, pairs)
+            if response is None:
+                status, doc = 501, {"errors": ["Nothing recorded for this request"]}
+            else:
+                status, doc = response
+        elif self.mode == RECORD:
+            status, doc = self._forward(handler, path, pairs)
+            self.recording.add(handler.command, path, pairs, status, doc)
+        else:
+            try:
+                status, doc = 200, self.challonge.handle(
+                    handler.command, path, _parse_params(pairs)
+                )
+            except FakeChallongeError as err:
+                status, doc = err.status, {"errors": list(err.args)}
+            except (KeyError, ValueError) as err:
+                status, doc = 422, {"errors": ["Invalid params: {0}".format(err)]}
+
+        data = json.dumps(doc).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _forward(self, handler, path, pairs):
+        """Sends a request on to the real Challonge.
+
+        Returns:
+          A tuple of (status, parsed JSON body).
+        """
+        auth = handler.headers.get("Authorization", "")
+        user, _, api_key = "", "", ""
+        if auth.startswith("Basic "):
+            user, _, api_key = base64.b64decode(auth[6:]).decode().partition(":")
+
+        url = "{0}/{1}.json".format(self.upstream_url, path)
+        if handler.command in ("POST", "PUT"):
+            data = {"data": pairs}
+        else:
+            data = {"params": pairs}
+        response = self._session.request(
+            handler.command, url, auth=(user, api_key), **data
+        )
+        try:
+            doc = response.json()
+        except ValueError:
+            doc = {"errors": [response.text]}
+        return response.status_code, doc
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Serves a fake Challonge API for testing the tools offline.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument("--host", default="127.0.0.1", help="the host to listen on")
+    argparser.add_argument("--port", type=int, default=8000, help="the port to listen on")
+    argparser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="how many seconds to wait before answering each request",
+    )
+    argparser.add_argument(
+        "--throttle_rate",
+        type=float,
+        default=0.0,
+        help="the chance of answering a request with a 429",
+    )
+    argparser.add_argument(
+        "--error_rate",
+        type=float,
+        default=0.0,
+        help="the chance of answering a request with a 503",
+    )
+    argparser.add_argument(
+        "--retry_after",
+        type=int,
+        default=0,
+        help="the Retry-After to send with 429s, in seconds",
+    )
+    argparser.add_argument(
+        "--seed", type=int, default=None, help="seed for which requests fail"
+    )
+    group = argparser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--record",
+        default=None,
+        help="forward requests to Challonge and save its answers to this file",
+    )
+    group.add_argument(
+        "--replay", default=None, help="answer requests from this recorded file"
+    )
+    args = argparser.parse_args()
+
+    mode = FAKE
+    if args.record:
+        mode = RECORD
+    elif args.replay:
+        mode = REPLAY
+    fake_server = FakeChallongeServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+        mode=mode,
+        recording_path=args.record or args.replay,
+    )
+    print("Serving a fake Challonge at {0}".format(fake_server.base_url))
+    fake_server.start()
+    try:
+        fake_server._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake_server.stop()
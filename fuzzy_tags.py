@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+
+"""Fuzzy matching of player tags.
+
+People don't always type their tag the same way it's spelled in the rankings
+("Mang0" vs "mango", stray spaces, accented letters). These helpers find the
+closest known tag for a name without comparing it against every tag, by only
+scoring tags that share character trigrams with it.
+"""
+
+
+import collections
+import difflib
+import unicodedata
+
+
+# Score at or above which a match is considered safe to use.
+DEFAULT_CONFIDENT_SCORE = 0.85
+# Score below which a match isn't worth suggesting at all.
+DEFAULT_MIN_SCORE = 0.5
+
+# How many of the tags sharing the most trigrams get scored in full.
+_NUM_CANDIDATES = 10
+
+# Characters commonly swapped for letters in tags.
+_LOOKALIKES = str.maketrans(
+    {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"}
+)
+
+
+FuzzyMatch = collections.namedtuple(
+    "FuzzyMatch", ["value", "tag", "score", "is_confident"]
+)
+FuzzyMatch.__doc__ = """The closest known tag to a name.
+
+value: The value the tag was indexed with.
+tag: The matching tag.
+score: How similar the name and tag are, from 0 to 1.
+is_confident: Whether the score is high enough to trust the match.
+"""
+
+
+def normalize_tag(tag):
+    """Normalizes a tag for fuzzy comparison.
+
+    Accents, case, punctuation, spaces and lookalike digits are ignored, e.g.
+    "Mang0", "MANGO" and "mängo" all normalize to "mango".
+
+    Args:
+      tag: A player's tag.
+
+    Returns:
+      The normalized tag.
+    """
+    decomposed = unicodedata.normalize("NFKD", tag)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    stripped = stripped.casefold().translate(_LOOKALIKES)
+    return "".join(c for c in stripped if c.isalnum())
+
+
+def _get_trigrams(normalized_tag):
+    padded = "  {0} ".format(normalized_tag)
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex(object):
+    """An index of tags that can be searched for the closest match to a name."""
+
+    def __init__(self):
+        self._entries = []
+        self._entries_by_trigram = collections.defaultdict(list)
+        self._entries_by_normalized_tag = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, tag, value):
+        """Adds a tag to the index.
+
+        Args:
+          tag: The tag to match names against.
+          value: The value to return when the tag matches, e.g. a ranking.
+        """
+        normalized_tag = normalize_tag(tag)
+        if not normalized_tag or normalized_tag in self._entries_by_normalized_tag:
+            return
+
+        trigrams = _get_trigrams(normalized_tag)
+        entry = (tag, value, normalized_tag, len(trigrams))
+        entry_id = len(self._entries)
+        self._entries.append(entry)
+        self._entries_by_normalized_tag[normalized_tag] = entry
+        for trigram in trigrams:
+            self._entries_by_trigram[trigram].append(entry_id)
+
+    def find(
+        self,
+        name,
+        min_score=DEFAULT_MIN_SCORE,
+        confident_score=DEFAULT_CONFIDENT_SCORE,
+    ):
+        """Finds the tag closest to a name.
+
+        Args:
+          name: The name to look up.
+          min_score: The lowest score a match can have to be returned.
+          confident_score: The score at or above which a match is confident.
+
+        Returns:
+          A FuzzyMatch for the closest tag, or None if no tag is close enough.
+        """
+        normalized_name = normalize_tag(name)
+        if not normalized_name:
+            return None
+
+        exact = self._entries_by_normalized_tag.get(normalized_name)
+        if exact is not None:
+            return FuzzyMatch(exact[1], exact[0], 1.0, True)
+
+        # Only tags sharing trigrams with the name are considered, ranked by
+        # their Dice coefficient. The best few get a more careful comparison.
+        trigrams = _get_trigrams(normalized_name)
+        shared_counts = collections.Counter()
+        for trigram in trigrams:
+            shared_counts.update(self._entries_by_trigram.get(trigram, ()))
+
+        def dice(item):
+            entry_id, shared = item
+            return 2.0 * shared / (len(trigrams) + self._entries[entry_id][3])
+
+        candidates = sorted(shared_counts.items(), key=dice, reverse=True)
+
+        best = None
+        best_score = 0.0
+        for entry_id, _ in candidates[:_NUM_CANDIDATES]:
+            entry = self._entries[entry_id]
+            score = difflib.SequenceMatcher(None, normalized_name, entry[2]).ratio()
+            if score > best_score:
+                best, best_score = entry, score
+
+        if best is None or best_score < min_score:
+            return None
+        return FuzzyMatch(best[1], best[0], best_score, best_score >= confident_score)
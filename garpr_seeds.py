@@ -2,16 +2,38 @@
 
 
 import argparse
-import challonge
+import contextlib
+import csv
+import io
 import itertools
+import json
 import re
-import requests
 
 import defaults
+import fuzzy_tags
+import metrics
+import profiling
+import ranking_cache
+import tracing
 
 
 UNKNOWN_RANK = -1
 
+# Braacket's CSV export of a league's ranking, and how many rows are in a page.
+_BRAACKET_RANKINGS_URL = (
+    "http://braacket.com/league/{league}/ranking?rows={rows}&page={page}&export=csv"
+)
+_BRAACKET_PAGE_SIZE = 200
+
+# Matches names like "Tag (OtherTag)".
+_ALT_TAG_RE = re.compile(r"(.*)\s+\((.*)\)")
+
+LOOKUPS = metrics.counter(
+    "ranking_lookups_total",
+    "Names looked up in rankings, by whether they were found.",
+    ("result",),
+)
+
 
 """Generates seeds for a tournament from gaR PR. http://www.garpr.com
 
@@ -26,37 +48,288 @@ Usage:
 """
 
 
-def _fetch_garpr_rankings(region):
+def _fetch_garpr_rankings(region, cache=None):
     """Fetches the gaR PR rankings from a given region.
 
     Args:
       region: The region of the gaR PR tournament.
+      cache: The RankingCache to fetch through. Defaults to a cache with the
+             default settings.
 
     Returns:
       A list of ranking responses for that region. Basically the same response
       that you would get from querying /rankings using the gaR PR API.
     """
+    cache = cache or ranking_cache.RankingCache()
     rankings_url = "https://www.garpr.com:3001/{0}/rankings".format(region)
-    return requests.get(rankings_url).json()["ranking"]
+    return json.loads(cache.fetch("garpr", region, rankings_url))["ranking"]
+
+
+def _read_braacket_csv(lines):
+    """Parses the rows of a Braacket CSV export.
+
+    Args:
+      lines: The lines of the export, without line endings.
+
+    Yields:
+      The rows of the export, each a list of fields. Blank rows are skipped.
+    """
+    # The line endings are put back so quoted fields can span lines.
+    for row in csv.reader(line + "\n" for line in lines):
+        if row:
+            yield row
+
+
+def _format_csv_row(row):
+    """Formats a row as CSV.
+
+    Returns:
+      The lines of the row, without line endings. Quoted fields can span
+      lines.
+    """
+    text = io.StringIO()
+    csv.writer(text, lineterminator="\n").writerow(row)
+    return text.getvalue()[:-1].split("\n")
+
+
+def _get_braacket_ranking(row):
+    return {"rank": int(row[0]), "name": row[1]}
+
+
+def _download_braacket_rankings(league, cache):
+    """Downloads every page of the Braacket rankings for a given league.
+
+    Pages of the ranking are downloaded one after another until the ranking is
+    exhausted.
+
+    Args:
+      league: The name of the league on Braacket.
+      cache: The RankingCache to download the pages with.
+
+    Yields:
+      The lines of the ranking's CSV rows, without the pages' header rows,
+      from first place to last.
+    """
+    first_ranking = None
+    last_rank = None
+    for page in itertools.count(1):
+        rankings_url = _BRAACKET_RANKINGS_URL.format(
+            league=league, rows=_BRAACKET_PAGE_SIZE, page=page
+        )
+        lines = cache.open_lines("braacket", rankings_url)
+
+        num_rows = 0
+        with contextlib.closing(lines):
+            # Every page starts with a header row.
+            for row in itertools.islice(_read_braacket_csv(lines), 1, None):
+                ranking = _get_braacket_ranking(row)
+
+                # If a page starts over, Braacket ignored the page number and
+                # sent us rankings we've already seen.
+                if num_rows == 0 and first_ranking is not None:
+                    if ranking == first_ranking or ranking["rank"] < last_rank:
+                        return
+
+                num_rows += 1
+                first_ranking = first_ranking or ranking
+                last_rank = ranking["rank"]
+                yield from _format_csv_row(row)
+
+        if num_rows < _BRAACKET_PAGE_SIZE:
+            return
+
+
+def _iter_braacket_rankings(league=defaults.DEFAULT_BRAACKET_LEAGUE, cache=None):
+    """Streams the Braacket rankings for a given league.
+
+    The league's pages are cached together as one snapshot, so a ranking never
+    mixes pages downloaded at different times. New snapshots are only used
+    once every page has downloaded, so if Braacket goes down partway through,
+    the stale snapshot is used instead. Cached rows are parsed as they're read.
+
+    Args:
+      league: The name of the league on Braacket.
+      cache: The RankingCache to fetch through. Defaults to a cache with the
+             default settings.
+
+    Yields:
+      Ranking objects with a "rank" and a "name", from first place to last.
+    """
+    cache = cache or ranking_cache.RankingCache()
+    lines = cache.iter_snapshot_lines(
+        "braacket",
+        league,
+        lambda: _download_braacket_rankings(league, cache),
+        buffer=True,
+    )
+    with contextlib.closing(lines):
+        for row in _read_braacket_csv(lines):
+            yield _get_braacket_ranking(row)
+
+
+def _normalize_name(name):
+    """Normalizes a tag so that trivially different spellings compare equal.
+
+    Args:
+      name: A player's tag.
+
+    Returns:
+      The tag lower-cased with surrounding and repeated whitespace removed.
+    """
+    return " ".join(name.lower().split())
 
 
-def _fetch_braacket_rankings():
-    r = requests.get('http://braacket.com/league/mtvmelee/ranking?rows=200&export=csv')
+def _strip_sponsor(name):
+    """Strips a sponsor prefix like "C9 | Mango" off of a tag.
 
-    rankings = []
+    Args:
+      name: A player's tag.
+
+    Returns:
+      The tag without its sponsor, or the tag unchanged if it has none.
+    """
+    return name.rsplit("|", 1)[-1].strip()
+
+
+def _get_aliases(name):
+    """Gets all the normalized tags a ranking's name can be looked up by.
+
+    Args:
+      name: The name on a ranking, e.g. "C9 | Mango", "Tag / OtherTag" or
+            "Tag (OtherTag)".
+
+    Returns:
+      A list of normalized aliases for that name, starting with the full name.
+    """
+    name = _normalize_name(name)
+    aliases = [name]
 
-    for i, line in enumerate(r.text.splitlines()):
-        if i == 0:
-            continue
-        parts = line.split(',')
-        rankings.append({'rank': int(parts[0]), 'name': parts[1][1:-1]})
+    # GarPR handles multiple tags with either "Tag / OtherTag" or
+    # "Tag (OtherTag)".
+    if "/" in name:
+        tags = name.split(" / ")
+    else:
+        m = _ALT_TAG_RE.search(name)
+        tags = [m.group(1), m.group(2)] if m else [name]
 
-    return rankings
+    for tag in tags:
+        aliases.append(tag)
+        aliases.append(_strip_sponsor(tag))
+
+    return [x for x in aliases if x]
+
+
+class RankingIndex(object):
+    """Looks up rankings by any of a player's tags in constant time.
+
+    Build one of these once per fetched ranking list instead of scanning the
+    whole list for every participant.
+    """
+
+    def __init__(self, rankings=()):
+        """Indexes a list of rankings.
+
+        Args:
+          rankings: An iterable of ranking objects, each with at least a "name"
+                    and a "rank". A ranking's full name always wins over
+                    another ranking's alias, and otherwise if several rankings
+                    share a name or an alias, the first one wins.
+        """
+        # Full names are kept apart from aliases like sponsor-stripped and
+        # alternate tags, so "SPN | Foo" ranked above "Foo" can't shadow them.
+        self._rankings_by_name = {}
+        self._rankings_by_alias = {}
+        self._num_rankings = 0
+        self._fuzzy_index = None
+        for ranking in rankings:
+            self.add(ranking)
+
+    def __len__(self):
+        return self._num_rankings
+
+    def add(self, ranking):
+        """Adds a single ranking object to the index.
+
+        Args:
+          ranking: A ranking object with at least a "name" and a "rank".
+        """
+        self._num_rankings += 1
+        self._fuzzy_index = None
+        aliases = _get_aliases(ranking["name"])
+        if aliases:
+            self._rankings_by_name.setdefault(aliases[0], ranking)
+        for alias in aliases[1:]:
+            self._rankings_by_alias.setdefault(alias, ranking)
+
+    def _get(self, name):
+        ranking = self._rankings_by_name.get(name)
+        if ranking is None:
+            ranking = self._rankings_by_alias.get(name)
+        return ranking
+
+    def find(self, name):
+        """Finds a user's ranking info.
+
+        Args:
+          name: The name of the user whose ranking we want to find. Case,
+                extra whitespace and sponsor prefixes are ignored.
+
+        Returns:
+          The ranking object that corresponds to that user, or None if no
+          ranking already exists.
+        """
+        name = _normalize_name(name)
+        ranking = self._get(name)
+        if ranking is None:
+            ranking = self._get(_strip_sponsor(name))
+        return ranking
+
+    def suggest(self, name, confident_score=fuzzy_tags.DEFAULT_CONFIDENT_SCORE):
+        """Suggests the ranking closest to a name that has no exact match.
+
+        The fuzzy index over every alias is built the first time this is called.
+
+        Args:
+          name: The name of the user to find a ranking for.
+          confident_score: The similarity score, from 0 to 1, at or above
+                           which a suggestion is flagged as confident.
+
+        Returns:
+          A fuzzy_tags.FuzzyMatch whose value is the suggested ranking object,
+          or None if nothing is close enough.
+        """
+        if self._fuzzy_index is None:
+            self._fuzzy_index = fuzzy_tags.TrigramIndex()
+            for full_name, ranking in self._rankings_by_name.items():
+                self._fuzzy_index.add(full_name, ranking)
+            for alias, ranking in self._rankings_by_alias.items():
+                if alias not in self._rankings_by_name:
+                    self._fuzzy_index.add(alias, ranking)
+
+        return self._fuzzy_index.find(name, confident_score=confident_score)
+
+    def get_ranks(self, names):
+        """Gets the ranks for a list of names.
+
+        Args:
+          names: A list of names of the people you want to get ranks for.
+
+        Returns:
+          A list of ranks for those players. UNKNOWN_RANK will be returned as
+          the rank for any player that isn't in the index.
+        """
+        ranks = [_get_rank(self.find(name)) for name in names]
+        num_unknown = ranks.count(UNKNOWN_RANK)
+        LOOKUPS.inc(len(ranks) - num_unknown, result="found")
+        LOOKUPS.inc(num_unknown, result="unknown")
+        return ranks
 
 
 def _find_ranking_for_name(name, rankings):
     """Finds a user's ranking info.
 
+    Prefer building a RankingIndex when looking up more than one name.
+
     Args:
       name: The name of the user whose ranking we want to find.
       rankings: The list of gaR PR ranking objects we wanna look through.
@@ -65,22 +338,7 @@ def _find_ranking_for_name(name, rankings):
       The ranking object that corresponds to that user, or None if no
       ranking already exists.
     """
-    name = name.lower()
-    for ranking in rankings:
-        garpr_name = ranking["name"].lower()
-        # GarPR handles multiple tags with either "Tag / OtherTag" or
-        # "Tag (OtherTag).
-        if "/" in garpr_name:
-            garpr_names = set(garpr_name.split(" / "))
-        elif "(" in garpr_name:
-            m = re.search("(.*)\s+\((.*)\)", garpr_name)
-            garpr_names = {m.group(1), m.group(2)}
-        else:
-            garpr_names = {garpr_name}
-
-        if name in garpr_names:
-            return ranking
-    return None
+    return RankingIndex(rankings).find(name)
 
 
 def _get_rank(ranking):
@@ -113,59 +371,141 @@ def ranks_to_seeds(ranks):
     """
     # Our approach is to sort the ranks since seeds should just be the
     # sorted order of the known ranks. We filter out unknown ranks since they'd
-    # disrupt the order.
-    sorted_known_ranks = [x for x in sorted(ranks) if x != UNKNOWN_RANK]
+    # disrupt the order. Tied ranks share the seed of the first of them.
+    sorted_known_ranks = sorted(x for x in ranks if x != UNKNOWN_RANK)
+    seeds_by_rank = {}
+    for i, rank in enumerate(sorted_known_ranks, 1):
+        seeds_by_rank.setdefault(rank, i)
 
     next_last_place_seed = len(sorted_known_ranks) + 1
     seeds = []
-    for i, rank in enumerate(ranks):
+    for rank in ranks:
         if rank == UNKNOWN_RANK:
             seeds.append(next_last_place_seed)
             next_last_place_seed = next_last_place_seed + 1
         else:
-            seeds.append(sorted_known_ranks.index(rank) + 1)
+            seeds.append(seeds_by_rank[rank])
 
     return seeds
 
 
-def get_garpr_ranks(names, region):
+def ranks_to_seeds_batch(ranks):
+    """Squashes many lists of ranks into seeds at once.
+
+    This is the same as calling ranks_to_seeds on every row, but vectorized so
+    that whole rating exports or simulation batches can be converted in one
+    call.
+
+    e.g. [[4, 6, UNKNOWN_RANK], [3, UNKNOWN_RANK, 3]] => [[1, 2, 3], [1, 3, 1]]
+
+    Args:
+      ranks: A 2-D array-like of ranks, one row per list of players.
+
+    Returns:
+      A 2-D integer numpy array of seeds with the same shape as |ranks|.
+    """
+    import numpy as np
+
+    ranks = np.asarray(ranks, dtype=np.int64)
+    if ranks.ndim != 2:
+        raise ValueError("Expected a 2-D array of ranks.")
+
+    # Unknown ranks sort after everything else, and the stable sort keeps them
+    # in order of appearance.
+    unknown = ranks == UNKNOWN_RANK
+    keys = np.where(unknown, np.iinfo(np.int64).max, ranks)
+    order = np.argsort(keys, axis=1, kind="stable")
+    sorted_keys = np.take_along_axis(keys, order, axis=1)
+
+    # Each known rank gets the seed of the first position its value appears at
+    # in the sorted row, so tied ranks share a seed.
+    positions = np.broadcast_to(np.arange(ranks.shape[1]), ranks.shape)
+    is_first = np.ones(ranks.shape, dtype=bool)
+    is_first[:, 1:] = sorted_keys[:, 1:] != sorted_keys[:, :-1]
+    first_positions = np.maximum.accumulate(np.where(is_first, positions, 0), axis=1)
+    sorted_unknown = np.take_along_axis(unknown, order, axis=1)
+    sorted_seeds = np.where(sorted_unknown, positions, first_positions) + 1
+
+    seeds = np.empty_like(sorted_seeds)
+    np.put_along_axis(seeds, order, sorted_seeds, axis=1)
+    return seeds
+
+
+def get_garpr_index(region, cache=None):
+    """Gets a RankingIndex of the gaR PR rankings for a region.
+
+    Args:
+      region: The gaR PR region that you want to pull rankings from.
+      cache: The RankingCache to fetch the rankings through.
+
+    Returns:
+      A RankingIndex of the region's rankings.
+    """
+    with tracing.span("fetch_rankings", source="garpr", region=region) as span:
+        index = RankingIndex(_fetch_garpr_rankings(region, cache))
+        span.set(ranking_size=len(index))
+    return index
+
+
+def get_braacket_index(league=defaults.DEFAULT_BRAACKET_LEAGUE, cache=None):
+    """Gets a RankingIndex of the Braacket rankings for a league.
+
+    Args:
+      league: The Braacket league that you want to pull rankings from.
+      cache: The RankingCache to fetch the rankings through.
+
+    Returns:
+      A RankingIndex of the league's rankings.
+    """
+    with tracing.span("fetch_rankings", source="braacket", region=league) as span:
+        index = RankingIndex(_iter_braacket_rankings(league, cache))
+        span.set(ranking_size=len(index))
+    return index
+
+
+def get_garpr_ranks(names, region, cache=None):
     """Gets the seeds for names based off of gaR PR rankings.
 
     Args:
       names: A list of names of the people you want to get ranks for. These
              names should correspond to their name on the gaR PR.
       region: The gaR PR region that you want to pull rankings from.
+      cache: The RankingCache to fetch the rankings through.
 
     Returns:
       A list of ranks for those players. UNKNOWN_RANK will be returned as the
       rank for any player that is not currently on the gaR PR.
     """
-    rankings = _fetch_garpr_rankings(region)
-    name_rankings = [_find_ranking_for_name(name, rankings) for name in names]
-    ranks = [_get_rank(ranking) for ranking in name_rankings]
-    return ranks
+    return get_garpr_index(region, cache).get_ranks(names)
 
 
-def get_braacket_ranks(names):
-    """Gets the seeds for names based off of gaR PR rankings.
+def get_braacket_ranks(names, league=defaults.DEFAULT_BRAACKET_LEAGUE, cache=None):
+    """Gets the seeds for names based off of Braacket rankings.
 
     Args:
       names: A list of names of the people you want to get ranks for. These
-             names should correspond to their name on the gaR PR.
-      region: The gaR PR region that you want to pull rankings from.
+             names should correspond to their name on Braacket.
+      league: The Braacket league that you want to pull rankings from.
+      cache: The RankingCache to fetch the rankings through.
 
     Returns:
       A list of ranks for those players. UNKNOWN_RANK will be returned as the
-      rank for any player that is not currently on the gaR PR.
+      rank for any player that is not currently in the rankings.
     """
-    rankings = _fetch_braacket_rankings()
-    name_rankings = [_find_ranking_for_name(name, rankings) for name in names]
-    ranks = [_get_rank(ranking) for ranking in name_rankings]
-    return ranks
+    return get_braacket_index(league, cache).get_ranks(names)
 
 
-if __name__ == "__main__":
+def main(argv=None, prog=None):
+    """Runs the command line tool.
+
+    Args:
+      argv: The command line arguments, without the program name. Defaults to
+            sys.argv[1:].
+      prog: The name of the program in usage messages. Defaults to the script's
+            name.
+    """
     argparser = argparse.ArgumentParser(
+        prog=prog,
         description="Generates seeds for a tournament from gaR PR rankings.",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
@@ -178,9 +518,18 @@ if __name__ == "__main__":
         "URL http://garpr.com/googlemtv/players, the "
         "region is 'googlemtv'",
     )
-    args = argparser.parse_args()
+    ranking_cache.add_arguments(argparser)
+    metrics.add_arguments(argparser)
+    profiling.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+    metrics.from_args(args)
+    profiling.from_args(args)
 
     region = args.region
     names = [x.strip() for x in args.names.split(",")]
-    ranks = get_garpr_ranks(names, region)
+    ranks = get_garpr_ranks(names, region, ranking_cache.from_args(args))
     print(ranks_to_seeds(ranks))
+
+
+if __name__ == "__main__":
+    main()
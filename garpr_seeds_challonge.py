@@ -15,14 +15,22 @@ For example, for www.challonge.com/mtvmlee72:
 
 
 import argparse
-import challonge
+import asyncio
 import sys
 
+import async_challonge
 import defaults
 import garpr_seeds
+import metrics
+import profiling
+import ranking_cache
+import seed_moves
+import seed_penalties
 import shuffle_seeds
+import tracing
 import util
 import util_challonge
+import write_executor
 
 
 class NoSuchTournamentError(Exception):
@@ -47,59 +55,226 @@ def _sort_by_seeds(values, seeds):
     return [x[1] for x in sorted_enumerated_values]
 
 
-# def seed_tournament(tourney_url, region, shuffle):
-def seed_tournament(tourney_url, shuffle):
-    """
-    @params: same as argparse params
+def _get_suggestion(index, name):
+    """Suggests a ranked player for a participant with no exact match.
 
-    @returns: a tuple consisting of:
-        * List of participants sorted by seed, ascending.
-        * List of players whose rank could not be found, along with what
-            rank they were seeded.
+    @returns: None if there's no close match, otherwise a dict of the
+        suggested player's "name" and "rank", the similarity "score" from 0 to
+        1, and whether the match "is_confident".
 
     """
-    # Make sure the tournament exists.
-    tourney_name = util_challonge.extract_tourney_name(tourney_url)
-    if not util_challonge.get_tourney_info(tourney_name):
-        raise NoSuchTournamentError("No tourney exists at {0}."
-                                    .format(tourney_url))
+    match = index.suggest(name)
+    if match is None:
+        return None
 
-    # Get the seeds for the participants.
-    participants = challonge.participants.index(tourney_name)
-    participant_names = [util_challonge.get_participant_name(x) for x in participants]
-    # ranks = garpr_seeds.get_garpr_ranks(participant_names, region)
-    ranks = garpr_seeds.get_braacket_ranks(participant_names)
-    new_seeds = garpr_seeds.ranks_to_seeds(ranks)
+    return {
+        "name": match.value["name"],
+        "rank": match.value["rank"],
+        "score": match.score,
+        "is_confident": match.is_confident,
+    }
+
+
+def _seed_participants(participants, ranking_index, shuffle, suggest_matches,
+                       get_penalties=None):
+    """Works out new seeds for participants from their rankings.
+
+    @returns: same as seed_tournament.
 
-    # Let the user know which participants couldn't be found.
+    """
+    participant_names = [util_challonge.get_participant_name(x) for x in participants]
+    with tracing.span("match_names", num_participants=len(participants),
+                      ranking_size=len(ranking_index)) as span:
+        ranks = ranking_index.get_ranks(participant_names)
+        span.set(num_unknown=ranks.count(garpr_seeds.UNKNOWN_RANK))
+    with tracing.span("compute_seeds", num_participants=len(participants)):
+        new_seeds = garpr_seeds.ranks_to_seeds(ranks)
+
+    # Let the user know which participants couldn't be found, and who they
+    # might have meant.
     players_unknown = []
-    for i, _ in enumerate(participants):
-        if ranks[i] == garpr_seeds.UNKNOWN_RANK:
-            unknown = {"name": participant_names[i], "seed": new_seeds[i]}
-            players_unknown.append(unknown)
+    with tracing.span("suggest_matches", enabled=suggest_matches):
+        for i, _ in enumerate(participants):
+            if ranks[i] == garpr_seeds.UNKNOWN_RANK:
+                unknown = {"name": participant_names[i], "seed": new_seeds[i]}
+                if suggest_matches:
+                    unknown["suggestion"] = _get_suggestion(
+                        ranking_index, participant_names[i]
+                    )
+                players_unknown.append(unknown)
 
     # Sort the participants on Challonge. They need to be sorted
     # before updating their seed, or else the order of the seeds could get
     # disrupted from reordering as seeds are changed.
     sorted_participants = _sort_by_seeds(participants, new_seeds)
 
-    # Shuffle the seeds to vary up the bracket a bit.
+    # Shuffle the seeds to vary up the bracket a bit, avoiding bad first
+    # round matchups if we know of any.
     if shuffle:
-        shuffled_seeds = shuffle_seeds.get_shuffled_seeds(len(participants))
-        sorted_participants = _sort_by_seeds(sorted_participants, shuffled_seeds)
+        with tracing.span("shuffle_seeds", num_participants=len(participants),
+                          optimized=get_penalties is not None):
+            if get_penalties is None:
+                shuffled_seeds = shuffle_seeds.get_shuffled_seeds(
+                    len(participants))
+            else:
+                shuffled_seeds = shuffle_seeds.get_optimized_seeds(get_penalties(
+                    [util_challonge.get_participant_name(x)
+                     for x in sorted_participants]))
+            sorted_participants = _sort_by_seeds(sorted_participants,
+                                                 shuffled_seeds)
 
     return sorted_participants, players_unknown
 
 
-def update_seeds(tourney_url, sorted_participants):
-    """This is a helper function to be called from the webapp."""
+async def async_seed_tournament(tourney_url, shuffle, cache=None,
+                                suggest_matches=True, client=None,
+                                get_penalties=None):
+    """
+    Asyncio version of seed_tournament.
+
+    The tourney, its participants and the rankings are all fetched at the
+    same time, since none of them depend on each other.
+
+    @params: same as seed_tournament.
+    @returns: same as seed_tournament.
+
+    """
     tourney_name = util_challonge.extract_tourney_name(tourney_url)
-    for seed, participant in enumerate(sorted_participants, 1):
-        challonge.participants.update(tourney_name, participant["id"], seed=seed)
+    client = async_challonge.AsyncChallongeClient(
+        client or util_challonge.get_client())
+
+    with tracing.span("fetch", tourney=tourney_name):
+        tourney_info, participants, ranking_index = await asyncio.gather(
+            async_challonge.get_tourney_info(client, tourney_name),
+            client.participants.index(tourney_name),
+            async_challonge.get_braacket_index(cache=cache),
+            return_exceptions=True,
+        )
 
+    # Make sure the tournament exists before complaining about anything else,
+    # since fetching the participants of a missing tourney fails too.
+    if isinstance(tourney_info, Exception):
+        raise tourney_info
+    if not tourney_info:
+        raise NoSuchTournamentError("No tourney exists at {0}."
+                                    .format(tourney_url))
+    for result in (participants, ranking_index):
+        if isinstance(result, Exception):
+            raise result
 
-if __name__ == "__main__":
+    return _seed_participants(participants, ranking_index, shuffle,
+                              suggest_matches, get_penalties)
+
+
+@metrics.timed_operation("seed_tournament")
+@tracing.traced("seed_tournament")
+def seed_tournament(tourney_url, shuffle, cache=None, suggest_matches=True,
+                    client=None, get_penalties=None):
+    """
+    @params: same as argparse params
+    @param cache: The ranking_cache.RankingCache to fetch rankings through.
+    @param suggest_matches: Whether to look for close matches for players whose
+        rank could not be found.
+    @param client: The util_challonge.ChallongeClient to use, or None for the
+        default client.
+    @param get_penalties: An optional function from the participants' names,
+        in seed order, to a penalty matrix for
+        shuffle_seeds.get_optimized_seeds, e.g. from seed_penalties.from_args.
+        When shuffling, it's used to avoid bad first round matchups.
+
+    @returns: a tuple consisting of:
+        * List of participants sorted by seed, ascending.
+        * List of players whose rank could not be found, along with what
+            rank they were seeded and a "suggestion" of who they might be.
+
+    """
+    return async_challonge.run(
+        async_seed_tournament(tourney_url, shuffle, cache=cache,
+                              suggest_matches=suggest_matches, client=client,
+                              get_penalties=get_penalties)
+    )
+
+
+def _get_seed_writes(tourney_name, sorted_participants, client):
+    """Gets the writes needed to put participants in a new seed order.
+
+    Only the participants seed_moves.plan_seed_moves says have to move are
+    updated, and updates that don't affect each other can run concurrently.
+
+    @param sorted_participants: Challonge participants sorted by their new
+        seed. Their "seed" is their current seed.
+
+    @returns: a list of write_executor.Writes.
+
+    """
+    current_order = [
+        x["id"] for x in sorted(sorted_participants, key=lambda x: x["seed"])
+    ]
+    new_order = [x["id"] for x in sorted_participants]
+    return [
+        write_executor.Write(
+            client.participants.update,
+            (tourney_name, move.item),
+            {"seed": move.seed},
+            move.depends_on,
+        )
+        for move in seed_moves.plan_seed_moves(current_order, new_order)
+    ]
+
+
+@metrics.timed_operation("update_seeds")
+@tracing.traced("update_seeds")
+def update_seeds(tourney_url, sorted_participants, client=None, progress=None):
+    """This is a helper function to be called from the webapp.
+
+    @param sorted_participants: Challonge participants sorted by their new
+        seed.
+    @param client: The util_challonge.ChallongeClient to use, or None for the
+        default client.
+    @param progress: An optional function called with (number of seeds
+        updated, total number of seeds to update) as updates finish.
+
+    @raises write_executor.BatchWriteError: if some of the updates failed.
+        The rest of the updates are still made.
+
+    """
+    tourney_name = util_challonge.extract_tourney_name(tourney_url)
+    client = client or util_challonge.get_client()
+    with tracing.span("plan_seed_moves",
+                      num_participants=len(sorted_participants)) as span:
+        writes = _get_seed_writes(tourney_name, sorted_participants, client)
+        span.set(num_writes=len(writes))
+    with tracing.span("write_seeds", num_writes=len(writes)) as span:
+        results = write_executor.WriteExecutor(client=client).run(writes,
+                                                                  progress)
+        span.set(num_failed=sum(1 for x in results if x.error is not None))
+    write_executor.raise_for_failures(results)
+
+
+async def async_update_seeds(tourney_url, sorted_participants, client=None,
+                             progress=None):
+    """Asyncio version of update_seeds.
+
+    The updates are streamed out concurrently by the write executor without
+    blocking the event loop.
+    """
+    await async_challonge.run_blocking(update_seeds, tourney_url,
+                                       sorted_participants, client=client,
+                                       progress=progress)
+
+
+def main(argv=None, prog=None):
+    """
+    Run the command line tool.
+
+    @param argv: the command line arguments, without the program name.
+        Defaults to sys.argv[1:].
+    @param prog: the name of the program in usage messages. Defaults to the
+        script's name.
+
+    """
     argparser = argparse.ArgumentParser(
+        prog=prog,
         description="Seeds a tournament on Challonge from gaR PR rankings.",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
@@ -132,27 +307,55 @@ if __name__ == "__main__":
         action="store_true",
         help="just prints the seeds without changing the tournament",
     )
-    args = argparser.parse_args()
+    ranking_cache.add_arguments(argparser)
+    seed_penalties.add_arguments(argparser)
+    metrics.add_arguments(argparser)
+    profiling.add_arguments(argparser)
+    tracing.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+    metrics.from_args(args)
+    tracing.from_args(args)
+    profiling.from_args(args)
 
     # Read config info.
     initialized = util_challonge.set_challonge_credentials_from_config(args.config_file)
     if not initialized:
         sys.exit(1)
 
-    sorted_participants, unknown_players = seed_tournament(args.tourney_name,
-                                                           args.region,
-                                                           args.shuffle)
+    tourney_name = util_challonge.extract_tourney_name(args.tourney_name)
+    tourney_url = util_challonge.tourney_name_to_url(tourney_name)
+    # Penalties only steer the shuffle, so don't fetch head-to-heads without it.
+    get_penalties = None
+    if args.shuffle:
+        get_penalties = seed_penalties.from_args(args, tourney_name)
+    sorted_participants, unknown_players = seed_tournament(
+        args.tourney_name,
+        args.shuffle,
+        cache=ranking_cache.from_args(args),
+        get_penalties=get_penalties,
+    )
 
     for player in unknown_players:
         print("Could not find gaR PR info for {name}, seeding {seed}"
               .format(**player))
+        suggestion = player.get("suggestion")
+        if suggestion:
+            print("  Did you mean {name} (rank {rank}, {score:.0%} match)?"
+                  .format(**suggestion))
 
     for seed, participant in enumerate(sorted_participants, 1):
         print(
             "{0}. {1}".format(seed, util_challonge.get_participant_name(participant))
         )
-        if not args.print_only:
-            challonge.participants.update(tourney_name, participant["id"], seed=seed)
 
     if not args.print_only:
+        try:
+            update_seeds(tourney_url, sorted_participants)
+        except write_executor.BatchWriteError as err:
+            sys.stderr.write("{0}\n".format(err))
+            sys.exit(1)
         print("Tournament updated; see seeds at {0}/participants.".format(tourney_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+
+"""Runs slow Challonge operations in the background for the webapp.
+
+Seeding a tournament or creating an amateur bracket can take dozens of
+Challonge requests. Rather than tying up a web worker for all of them, the
+webapp submits them here and shows their progress while a pool of worker
+threads runs them.
+
+Jobs' state and progress are kept in a SQLite database so any web worker can
+report on them. The database also decides which jobs run: a tournament's
+unfinished job claims its slot there, so the same request sent to two web
+worker processes is only run once. The functions a job runs (and the
+credentials they use) only ever live in the memory of the process they were
+submitted to, so each process's workers claim that process's queued jobs from
+the database.
+"""
+
+
+import collections
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import defaults
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# How many seconds an unfinished job can go without any progress before it's
+# assumed to have been lost, e.g. to a restart.
+DEFAULT_STALE_AFTER = 10 * 60
+# How many seconds finished jobs are kept around for.
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT,
+    state TEXT NOT NULL,
+    status TEXT,
+    num_done INTEGER NOT NULL DEFAULT 0,
+    num_total INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    settings TEXT,
+    runner TEXT
+)
+"""
+# Only one unfinished job of a kind can exist for each key.
+_UNFINISHED_INDEX = """
+CREATE UNIQUE INDEX IF NOT EXISTS unfinished_jobs ON jobs (kind, key)
+WHERE state IN ('{0}', '{1}')
+""".format(QUEUED, RUNNING)
+# Columns added to the jobs table after it was first created.
+_NEW_COLUMNS = ("settings", "runner")
+
+_STALE_ERROR = "The job stopped responding."
+
+Job = collections.namedtuple(
+    "Job",
+    [
+        "id",
+        "kind",
+        "key",
+        "owner",
+        "state",
+        "status",
+        "num_done",
+        "num_total",
+        "result",
+        "error",
+        "created_at",
+        "updated_at",
+    ],
+)
+Job.__doc__ = """The state of a background job.
+
+id: The job's unique ID.
+kind: What sort of job it is, e.g. "seed".
+key: What the job is for, e.g. the tournament name. Submitting a job while
+     an unfinished job with the same kind, key and settings exists gives back
+     the existing job instead.
+owner: Who submitted the job, e.g. their Challonge username.
+state: One of QUEUED, RUNNING, SUCCEEDED or FAILED.
+status: A description of what the job is currently doing.
+num_done: How many steps of the current status are done.
+num_total: How many steps the current status has, or 0 if unknown.
+result: What the job returned, if it succeeded.
+error: A description of why the job failed, if it did.
+created_at: When the job was submitted.
+updated_at: When the job last made progress.
+"""
+
+
+class JobConflictError(Exception):
+    """An unfinished job for the same thing was submitted with other settings."""
+
+    def __init__(self, message, job_id):
+        self.job_id = job_id
+        super().__init__(message)
+
+
+class JobQueue(object):
+    """A queue of jobs run by a pool of worker threads."""
+
+    def __init__(
+        self,
+        db_path=defaults.DEFAULT_JOBS_DB,
+        num_workers=defaults.DEFAULT_NUM_JOB_WORKERS,
+        stale_after=DEFAULT_STALE_AFTER,
+        max_age=DEFAULT_MAX_AGE,
+    ):
+        """Creates the queue and starts its workers.
+
+        Args:
+          db_path: The path of the SQLite database to keep jobs in.
+          num_workers: How many jobs can run at once.
+          stale_after: How many seconds an unfinished job can go without
+                       progress before it's considered failed.
+          max_age: How many seconds finished jobs are kept for.
+        """
+        self.db_path = db_path
+        self.stale_after = stale_after
+        self.max_age = max_age
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect(exclusive=True) as conn:
+            conn.execute(_SCHEMA)
+            self._migrate(conn)
+            conn.execute(_UNFINISHED_INDEX)
+
+        # Identifies this queue's jobs in the database, since only this queue
+        # has their functions.
+        self._runner = uuid.uuid4().hex
+        # The functions of this queue's jobs that haven't started yet, by ID,
+        # and how many of its jobs are unfinished.
+        self._fns = {}
+        self._num_unfinished = 0
+        self._changed = threading.Condition()
+        # Released once for each job submitted, to wake up a worker.
+        self._submitted = threading.Semaphore(0)
+
+        self._workers = []
+        for _ in range(num_workers):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    @staticmethod
+    def _migrate(conn):
+        """Updates a jobs table created by an older version."""
+        columns = {x[1] for x in conn.execute("PRAGMA table_info(jobs)")}
+        missing = [x for x in _NEW_COLUMNS if x not in columns]
+        for column in missing:
+            conn.execute("ALTER TABLE jobs ADD COLUMN {0} TEXT".format(column))
+        if missing:
+            # Nothing can run the older version's unfinished jobs anymore.
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ? WHERE state IN (?, ?)",
+                (FAILED, _STALE_ERROR, QUEUED, RUNNING),
+            )
+
+    @contextlib.contextmanager
+    def _connect(self, exclusive=False):
+        """Opens a connection that commits when the block succeeds.
+
+        Args:
+          exclusive: Whether to lock the database for writing right away, so
+                     nobody else can write between the block's reads and
+                     writes.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                if exclusive:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    def _update(self, job_id, **columns):
+        columns["updated_at"] = time.time()
+        assignments = ", ".join("{0} = ?".format(x) for x in columns)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET {0} WHERE id = ?".format(assignments),
+                list(columns.values()) + [job_id],
+            )
+
+    def submit(self, kind, key, fn, owner=None, settings=None):
+        """Submits a job, unless an identical one is already unfinished.
+
+        Two jobs with the same kind and key, e.g. reseeding the same
+        tournament, never run at once. If the unfinished one has different
+        settings, the new job is rejected rather than silently dropping them.
+
+        Args:
+          kind: What sort of job it is, e.g. "seed".
+          key: What the job is for, e.g. the tournament name.
+          fn: The function to run. It's called with a progress function,
+              which takes a status and optionally the number of steps done
+              and the total number of steps. Whatever it returns has to be
+              JSON serializable.
+          owner: Who submitted the job.
+          settings: What the job was asked to do, e.g. the submitted form.
+                    Anything that can be compared for equality.
+
+        Raises:
+          JobConflictError: If an unfinished job with the same kind and key has
+            different settings.
+
+        Returns:
+          The ID of the job, or of the unfinished job it was coalesced with.
+        """
+        settings = json.dumps(settings, sort_keys=True)
+        job_id = uuid.uuid4().hex
+        # The function has to be ready before a worker can claim the job.
+        with self._changed:
+            self._fns[job_id] = fn
+
+        now = time.time()
+        existing = None
+        with self._connect(exclusive=True) as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE state IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, now - self.max_age),
+            )
+            # Jobs lost to a restart shouldn't hold on to their slot.
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ? "
+                "WHERE state IN (?, ?) AND updated_at < ?",
+                (FAILED, _STALE_ERROR, QUEUED, RUNNING, now - self.stale_after),
+            )
+            try:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, key, owner, state, status, "
+                    "created_at, updated_at, settings, runner) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, key, owner, QUEUED, "Waiting to start", now,
+                     now, settings, self._runner),
+                )
+            except sqlite3.IntegrityError:
+                existing = conn.execute(
+                    "SELECT id, settings FROM jobs "
+                    "WHERE kind = ? AND key = ? AND state IN (?, ?)",
+                    (kind, key, QUEUED, RUNNING),
+                ).fetchone()
+
+        if existing is not None:
+            with self._changed:
+                del self._fns[job_id]
+            existing_id, existing_settings = existing
+            if existing_settings != settings:
+                raise JobConflictError(
+                    "A job is already running with different settings.",
+                    existing_id,
+                )
+            return existing_id
+
+        with self._changed:
+            self._num_unfinished += 1
+        self._submitted.release()
+        return job_id
+
+    def get(self, job_id):
+        """Gets the state of a job.
+
+        Args:
+          job_id: The ID of the job.
+
+        Returns:
+          A Job, or None if there's no such job.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT {0} FROM jobs WHERE id = ?".format(", ".join(Job._fields)),
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = Job(*row)
+        if job.result is not None:
+            job = job._replace(result=json.loads(job.result))
+        if (
+            job.state in (QUEUED, RUNNING)
+            and time.time() - job.updated_at > self.stale_after
+        ):
+            job = job._replace(state=FAILED, error=_STALE_ERROR)
+        return job
+
+    def _claim(self):
+        """Marks the oldest of this queue's queued jobs as running.
+
+        Returns:
+          The ID of the claimed job, or None if none are queued.
+        """
+        with self._connect(exclusive=True) as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE state = ? AND runner = ? "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, self._runner),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, status = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, "Starting", time.time(), row[0]),
+            )
+        return row[0]
+
+    def _drop_lost_jobs(self):
+        """Forgets jobs that were marked failed before they could start."""
+        with self._changed:
+            job_ids = list(self._fns)
+        with self._connect() as conn:
+            lost_ids = [
+                job_id for job_id in job_ids
+                if conn.execute(
+                    "SELECT state FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone() == (FAILED,)
+            ]
+        with self._changed:
+            for job_id in lost_ids:
+                if self._fns.pop(job_id, None) is not None:
+                    self._num_unfinished -= 1
+            self._changed.notify_all()
+
+    def _run(self, job_id, fn):
+        def progress(status, num_done=0, num_total=0):
+            self._update(job_id, status=status, num_done=num_done, num_total=num_total)
+
+        try:
+            result = fn(progress)
+        except Exception as err:
+            self._update(job_id, state=FAILED, error=str(err) or type(err).__name__)
+        else:
+            self._update(job_id, state=SUCCEEDED, result=json.dumps(result))
+
+    def _work(self):
+        while True:
+            self._submitted.acquire()
+            job_id = self._claim()
+            if job_id is None:
+                # A job went stale before it could start.
+                self._drop_lost_jobs()
+                continue
+
+            with self._changed:
+                fn = self._fns.pop(job_id, None)
+            if fn is None:
+                # It was dropped as lost in the meantime.
+                continue
+            try:
+                self._run(job_id, fn)
+            finally:
+                with self._changed:
+                    self._num_unfinished -= 1
+                    self._changed.notify_all()
+
+    def join(self):
+        """Waits until every job submitted to this queue has finished."""
+        with self._changed:
+            while self._num_unfinished:
+                self._changed.wait()
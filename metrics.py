@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+
+"""Counts and times the requests the tools make.
+
+Modules register counters and histograms here, labelled by things like the
+Challonge endpoint, and update them as they talk to Challonge and the ranking
+sites. The webapp serves them in the Prometheus text format, and the CLIs
+print a summary of them at exit with --stats.
+"""
+
+
+import atexit
+import bisect
+import collections
+import contextlib
+import functools
+import sys
+import threading
+import time
+
+
+# The upper bounds of histogram buckets, in seconds by default.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(k, _escape(v)) for k, v in labels) + "}"
+
+
+class _Metric(object):
+    """A metric with a value for each combination of label values."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                "{0} takes the labels {1}, not {2}.".format(
+                    self.name, list(self.labelnames), sorted(labels)
+                )
+            )
+        return tuple(str(labels[x]) for x in self.labelnames)
+
+    def get_series(self):
+        """Gets the current value of every combination of labels.
+
+        Returns:
+          A list of (labels, value) tuples, where labels is a tuple of
+          (label name, label value) tuples.
+        """
+        with self._lock:
+            return [
+                (tuple(zip(self.labelnames, key)), self._copy(value))
+                for key, value in self._values.items()
+            ]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def reset(self):
+        """Forgets every value."""
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """A count that only goes up, e.g. of requests made."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """Adds to the count for some labels."""
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """Gets the count for some labels."""
+        key = self._get_key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        return [
+            "{0}{1} {2}".format(self.name, _format_labels(labels), value)
+            for labels, value in self.get_series()
+        ]
+
+
+_HistogramValue = collections.namedtuple("_HistogramValue", ["buckets", "count", "sum"])
+
+
+class Histogram(_Metric):
+    """A distribution of observations, e.g. of how long requests took."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    @staticmethod
+    def _copy(value):
+        return _HistogramValue(list(value[0]), value[1], value[2])
+
+    def observe(self, value, **labels):
+        """Records an observation for some labels."""
+        key = self._get_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0, 0.0]
+                self._values[key] = entry
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observes how many seconds a block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get(self, **labels):
+        """Gets the observations for some labels.
+
+        Returns:
+          A tuple of (the number of observations, their sum).
+        """
+        key = self._get_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            return (entry[1], entry[2]) if entry else (0, 0.0)
+
+    def render(self):
+        lines = []
+        for labels, value in self.get_series():
+            cumulative = 0
+            for bound, num in zip(self.buckets, value.buckets):
+                cumulative += num
+                lines.append(
+                    "{0}_bucket{1} {2}".format(
+                        self.name, _format_labels(labels + (("le", bound),)), cumulative
+                    )
+                )
+            lines.append(
+                "{0}_bucket{1} {2}".format(
+                    self.name, _format_labels(labels + (("le", "+Inf"),)), value.count
+                )
+            )
+            lines.append("{0}_sum{1} {2}".format(self.name, _format_labels(labels), value.sum))
+            lines.append(
+                "{0}_count{1} {2}".format(self.name, _format_labels(labels), value.count)
+            )
+        return lines
+
+
+class Registry(object):
+    """A set of metrics that are rendered together."""
+
+    def __init__(self):
+        self._metrics = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, *args, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class):
+                raise ValueError("{0} is already registered as a {1}.".format(
+                    name, metric.type))
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Gets a Counter, registering it if it's new."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Gets a Histogram, registering it if it's new."""
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def get_metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self):
+        """Renders every metric in the Prometheus text format.
+
+        Returns:
+          The metrics as a string.
+        """
+        lines = []
+        for metric in self.get_metrics():
+            lines.append("# HELP {0} {1}".format(metric.name, metric.documentation))
+            lines.append("# TYPE {0} {1}".format(metric.name, metric.type))
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def get_summary(self):
+        """Summarizes every metric that has values, for people to read.
+
+        Returns:
+          A list of lines.
+        """
+        lines = []
+        for metric in self.get_metrics():
+            series = metric.get_series()
+            if not series:
+                continue
+            lines.append("{0}:".format(metric.name))
+            for labels, value in series:
+                label_text = " ".join(str(x[1]) for x in labels) or "(all)"
+                if metric.type == "histogram":
+                    mean = value.sum / value.count if value.count else 0.0
+                    value = "{0} in {1:.2f}s, {2:.1f}ms each".format(
+                        value.count, value.sum, 1000 * mean
+                    )
+                lines.append("  {0:<60} {1}".format(label_text, value))
+        return lines
+
+    def reset(self):
+        """Forgets every metric's values, e.g. between tests."""
+        for metric in self.get_metrics():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    """Gets a Counter from the default registry, registering it if it's new.
+
+    Args:
+      name: The metric's name, e.g. "challonge_requests_total".
+      documentation: What the metric counts.
+      labelnames: The names of the labels its values are split by.
+
+    Returns:
+      The Counter.
+    """
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Gets a Histogram from the default registry, registering it if it's new.
+
+    Args:
+      See counter, plus the upper bounds of its buckets.
+
+    Returns:
+      The Histogram.
+    """
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def render():
+    """Renders the default registry's metrics in the Prometheus text format."""
+    return REGISTRY.render()
+
+
+OPERATION_SECONDS = histogram(
+    "operation_seconds",
+    "How long whole operations took, e.g. seeding a tournament.",
+    ("operation", "result"),
+)
+
+
+def timed_operation(operation):
+    """Decorates a function to record how long each call takes.
+
+    Calls are recorded in OPERATION_SECONDS, with a result of "ok" or the name
+    of the exception they raised.
+
+    Args:
+      operation: The name to record the calls under.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            result = "ok"
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as err:
+                result = type(err).__name__
+                raise
+            finally:
+                OPERATION_SECONDS.observe(
+                    time.perf_counter() - start, operation=operation, result=result
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def print_summary(file=None):
+    """Prints a summary of the default registry's metrics.
+
+    Args:
+      file: Where to print it. Defaults to stderr.
+    """
+    file = file or sys.stderr
+    lines = REGISTRY.get_summary()
+    file.write("Request stats:\n")
+    for line in lines or ["  No requests made."]:
+        file.write(line + "\n")
+
+
+def add_arguments(argparser):
+    """Adds the --stats flag to a CLI.
+
+    Args:
+      argparser: The argparse.ArgumentParser to add the flag to.
+    """
+    argparser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print how many requests were made and how long they took at exit",
+    )
+
+
+def from_args(args):
+    """Sets up what the flags added by add_arguments ask for.
+
+    Args:
+      args: The parsed argparse arguments.
+    """
+    if args.stats:
+        atexit.register(print_summary)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+
+"""Profiles the tools, so reports of slow runs can come with real profiles.
+
+There are two kinds of profiles:
+
+* "cprofile": Deterministic cProfile stats of the thread that started the
+  profiler, saved in the pstats format, e.g. for snakeviz or
+  `python -m pstats`.
+* "sample": Wall-clock samples of every thread's stack, saved as folded stacks
+  ("frame;frame;frame count" lines), e.g. for flamegraph.pl or speedscope.
+  Work the tools hand off to thread pools, like Challonge requests, only shows
+  up in this kind.
+
+Either way, a summary of the top cumulative hot spots is printed when the
+profile is saved.
+"""
+
+
+import atexit
+import collections
+import datetime
+import functools
+import os
+import sys
+import threading
+import time
+
+
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+MODES = (CPROFILE, SAMPLE)
+
+# How many seconds apart stacks are sampled.
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# How many hot spots summaries show.
+DEFAULT_NUM_HOT_SPOTS = 20
+
+
+def _get_frame_name(code):
+    return "{0} ({1}:{2})".format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+    )
+
+
+class _Sampler(object):
+    """Samples the stacks of every thread from a background thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        # The number of times each folded stack was sampled.
+        self.stacks = collections.Counter()
+        self.num_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profiling-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        names = {x.ident: x.name for x in threading.enumerate()}
+        own_ident = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_get_frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, "thread-{0}".format(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.num_samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+
+class Profiler(object):
+    """Profiles the code run between start and stop."""
+
+    def __init__(self, mode=CPROFILE, interval=DEFAULT_SAMPLE_INTERVAL):
+        """Creates a profiler.
+
+        Args:
+          mode: CPROFILE or SAMPLE.
+          interval: How many seconds apart stacks are sampled in SAMPLE mode.
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown profiling mode: {0}".format(mode))
+        self.mode = mode
+        self.interval = interval
+        self.duration = None
+        self._profile = None
+        self._sampler = None
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.mode == CPROFILE:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _Sampler(self.interval)
+            self._sampler.start()
+
+    def stop(self):
+        if self.mode == CPROFILE:
+            self._profile.disable()
+        else:
+            self._sampler.stop()
+        self.duration = time.perf_counter() - self._start
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def save(self, path):
+        """Saves the profile.
+
+        Args:
+          path: Where to save it. cProfile stats are in the pstats format, and
+                samples are folded stacks.
+        """
+        if self.mode == CPROFILE:
+            self._profile.dump_stats(path)
+            return
+
+        with open(path, "w") as f:
+            for stack, count in sorted(self._sampler.stacks.items()):
+                f.write("{0} {1}\n".format(stack, count))
+
+    def get_hot_spots(self, num_hot_spots=DEFAULT_NUM_HOT_SPOTS):
+        """Gets the functions the most time was spent in, including callees.
+
+        Returns:
+          A list of (function, cumulative seconds) tuples, slowest first.
+        """
+        if self.mode == CPROFILE:
+            import pstats
+
+            stats = pstats.Stats(self._profile)
+            hot_spots = [
+                ("{0} ({1}:{2})".format(func[2], os.path.basename(func[0]), func[1]),
+                 value[3])
+                for func, value in stats.stats.items()
+            ]
+        else:
+            cumulative = collections.Counter()
+            for stack, count in self._sampler.stacks.items():
+                # Recursive functions only count once per sample.
+                for frame in set(stack.split(";")[1:]):
+                    cumulative[frame] += count
+            hot_spots = [
+                (frame, count * self.interval) for frame, count in cumulative.items()
+            ]
+        hot_spots.sort(key=lambda x: x[1], reverse=True)
+        return hot_spots[:num_hot_spots]
+
+    def format_summary(self, num_hot_spots=DEFAULT_NUM_HOT_SPOTS):
+        """Summarizes the top cumulative hot spots, for people to read.
+
+        Returns:
+          The summary as a string.
+        """
+        description = self.mode
+        if self.mode == SAMPLE:
+            description += ", {0} samples".format(self._sampler.num_samples)
+        lines = ["Profiled {0:.2f}s ({1}). Top cumulative hot spots:".format(
+            self.duration or 0.0, description)]
+        for name, seconds in self.get_hot_spots(num_hot_spots):
+            lines.append("  {0:>9.3f}s  {1}".format(seconds, name))
+        return "\n".join(lines) + "\n"
+
+
+def get_profile_path(directory, name, mode=CPROFILE):
+    """Gets a new path to save a profile in.
+
+    e.g. "profiles", "seed" => "profiles/seed-20181004-193012-123456.prof"
+
+    Args:
+      directory: The directory to save the profile in.
+      name: What was profiled.
+      mode: The mode of the profile, which picks its extension.
+
+    Returns:
+      The path.
+    """
+    extension = ".prof" if mode == CPROFILE else ".folded"
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(directory, "{0}-{1}{2}".format(name, timestamp, extension))
+
+
+def profiled(fn, path, mode=CPROFILE, log=None):
+    """Wraps a function to profile each call and save it.
+
+    Args:
+      fn: The function to profile.
+      path: Where to save the profile.
+      mode: CPROFILE or SAMPLE.
+      log: A function called with the summary, or None to print it to stderr.
+
+    Returns:
+      A function that calls fn with the same arguments.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profiler = Profiler(mode)
+        try:
+            with profiler:
+                return fn(*args, **kwargs)
+        finally:
+            save_profile(profiler, path, log)
+
+    return wrapper
+
+
+def save_profile(profiler, path, log=None):
+    """Saves a stopped profiler's profile and summarizes it.
+
+    Args:
+      profiler: The Profiler.
+      path: Where to save the profile.
+      log: A function called with the summary, or None to print it to stderr.
+    """
+    profiler.save(path)
+    summary = "Saved the profile to {0}.\n{1}".format(path, profiler.format_summary())
+    if log is None:
+        sys.stderr.write(summary)
+    else:
+        log(summary)
+
+
+def add_arguments(argparser):
+    """Adds the flags that profile a CLI.
+
+    Args:
+      argparser: The argparse.ArgumentParser to add the flags to.
+    """
+    argparser.add_argument(
+        "--profile",
+        default=None,
+        help="profile the run and save the profile to this file",
+    )
+    argparser.add_argument(
+        "--profile_mode",
+        choices=MODES,
+        default=CPROFILE,
+        help="save cProfile stats, or sample every thread's stacks for a "
+        "flame graph",
+    )
+
+
+def from_args(args):
+    """Sets up what the flags added by add_arguments ask for.
+
+    The rest of the run is profiled, and the profile is saved and summarized
+    at exit.
+
+    Args:
+      args: The parsed argparse arguments.
+    """
+    if not args.profile:
+        return
+
+    profiler = Profiler(args.profile_mode)
+    profiler.start()
+
+    def save():
+        profiler.stop()
+        save_profile(profiler, args.profile)
+
+    atexit.register(save)
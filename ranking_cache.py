@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+
+
+"""Keeps a local copy of downloaded rankings.
+
+Ranking sites can be slow or down right when you need to seed a bracket at the
+venue. Rankings are cached on disk per source and region, revalidated with
+ETag/If-Modified-Since once they're older than the TTL, and the stale copy is
+used if the site can't be reached in time.
+"""
+
+
+import json
+import os
+import re
+import sys
+import time
+
+import requests
+
+import defaults
+import metrics
+
+
+REQUESTS = metrics.counter(
+    "ranking_requests_total",
+    "Rankings read, by whether they came from the cache or the ranking site.",
+    ("source", "result"),
+)
+REQUEST_SECONDS = metrics.histogram(
+    "ranking_request_seconds",
+    "How long ranking sites took to answer requests for rankings.",
+    ("source",),
+)
+
+
+class RankingsUnavailableError(Exception):
+    """Rankings couldn't be downloaded and no cached copy exists."""
+
+
+class RankingCache(object):
+    """An on-disk cache of ranking downloads, keyed by source and region."""
+
+    def __init__(
+        self,
+        cache_dir=defaults.DEFAULT_RANKING_CACHE_DIR,
+        ttl=defaults.DEFAULT_RANKING_CACHE_TTL,
+        timeout=defaults.DEFAULT_RANKING_FETCH_TIMEOUT,
+        refresh=False,
+        offline=False,
+    ):
+        """Configures the cache.
+
+        Args:
+          cache_dir: The directory to keep cached rankings in.
+          ttl: How many seconds cached rankings are used before they're
+               revalidated with the ranking site.
+          timeout: The maximum number of seconds to spend downloading rankings
+                   before falling back to the cached copy.
+          refresh: Whether to revalidate cached rankings regardless of the TTL.
+          offline: Whether to only ever use cached rankings.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.timeout = timeout
+        self.refresh = refresh
+        self.offline = offline
+
+    def _get_paths(self, source, region):
+        """Gets the paths of the files a cache entry is stored in.
+
+        Returns:
+          A tuple of (body path, metadata path).
+        """
+        key = re.sub(r"[^\w.-]", "_", "{0}-{1}".format(source, region))
+        base = os.path.join(self.cache_dir, key)
+        return base + ".body", base + ".json"
+
+    def _read_entry(self, source, region):
+        """Reads the metadata of a cache entry.
+
+        Returns:
+          The metadata dictionary, or None if there's no usable entry.
+        """
+        body_path, meta_path = self._get_paths(source, region)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if os.path.exists(body_path) else None
+
+    def _write_file(self, path, text):
+        """Writes a file atomically so concurrent readers never see half of it."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _write_entry(self, source, region, entry):
+        _, meta_path = self._get_paths(source, region)
+        self._write_file(meta_path, json.dumps(entry))
+
+    def _iter_cached_lines(self, source, region):
+        body_path, _ = self._get_paths(source, region)
+        with open(body_path, encoding="utf-8") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+    def _get_cached_lines(self, source, region, entry):
+        """Gets the cached lines if they can be used without downloading.
+
+        Raises:
+          RankingsUnavailableError: If running offline with no cached copy.
+
+        Returns:
+          An iterator over the cached lines, or None if they need to be
+          downloaded again.
+        """
+        if self.offline:
+            if entry is None:
+                REQUESTS.inc(source=source, result="unavailable")
+                raise RankingsUnavailableError(
+                    "No cached {0} rankings for {1}, and running offline.".format(
+                        source, region
+                    )
+                )
+        elif (
+            entry is None
+            or self.refresh
+            or time.time() - entry["fetched_at"] >= self.ttl
+        ):
+            return None
+
+        REQUESTS.inc(source=source, result="cached")
+        return self._iter_cached_lines(source, region)
+
+    def _get(self, source, url, headers=None):
+        """Starts downloading a URL.
+
+        Raises:
+          requests.exceptions.RequestException: If the download failed.
+
+        Returns:
+          The streaming requests.Response, which may be a 304.
+        """
+        with REQUEST_SECONDS.time(source=source):
+            response = requests.get(
+                url, headers=headers, timeout=self.timeout, stream=True
+            )
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def _iter_response_lines(self, response):
+        with response:
+            response.encoding = response.encoding or "utf-8"
+            yield from response.iter_lines(decode_unicode=True)
+
+    def open_lines(self, source, url):
+        """Streams a download without caching it.
+
+        This is for the pages of rankings that are cached as one entry with
+        iter_snapshot_lines.
+
+        Args:
+          source: The name of the ranking site, e.g. "braacket".
+          url: The URL to download.
+
+        Raises:
+          requests.exceptions.RequestException: If the download failed.
+
+        Yields:
+          The lines of the download, without line endings.
+        """
+        yield from self._iter_response_lines(self._get(source, url))
+
+    def _iter_saved_lines(self, source, region, lines, entry):
+        """Yields the lines of a download while saving them to the cache.
+
+        The cache entry is only replaced once the whole download succeeded.
+
+        Args:
+          lines: The lines of the download.
+          entry: The metadata to save with the lines.
+
+        Raises:
+          requests.exceptions.RequestException: If the download failed or
+            took too long.
+        """
+        deadline = time.monotonic() + self.timeout
+        body_path, _ = self._get_paths(source, region)
+        tmp_path = "{0}.{1}.tmp".format(body_path, os.getpid())
+        committed = False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for line in lines:
+                    if time.monotonic() > deadline:
+                        raise requests.exceptions.Timeout(
+                            "Downloading {0} rankings for {1} took longer than "
+                            "{2}s.".format(source, region, self.timeout)
+                        )
+                    f.write(line + "\n")
+                    yield line
+
+            os.replace(tmp_path, body_path)
+            committed = True
+        finally:
+            if not committed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        entry["fetched_at"] = time.time()
+        self._write_entry(source, region, entry)
+
+    def _iter_downloaded_lines(self, source, region, entry, lines, new_entry,
+                               buffer):
+        """Yields the lines of a download, or the cached copy if it fails.
+
+        Lines from the download and the cached copy are never mixed. If the
+        download fails after some of its lines were yielded, the rankings are
+        unavailable.
+
+        Args:
+          entry: The metadata of the cached copy, or None if there is none.
+          lines: The lines of the download.
+          new_entry: The metadata to save with the download.
+          buffer: Whether to read the whole download before yielding any of it,
+                  so a failure can always fall back to the cached copy.
+
+        Raises:
+          RankingsUnavailableError: If the download failed partway through, or
+            failed and there's no cached copy.
+        """
+        num_lines_read = 0
+        try:
+            lines = self._iter_saved_lines(source, region, lines, new_entry)
+            if buffer:
+                lines = list(lines)
+            for line in lines:
+                num_lines_read += 1
+                yield line
+        except requests.exceptions.RequestException as err:
+            if num_lines_read:
+                REQUESTS.inc(source=source, result="unavailable")
+                raise RankingsUnavailableError(
+                    "Downloading {0} rankings for {1} failed after {2} lines "
+                    "were read: {3}".format(source, region, num_lines_read, err)
+                ) from err
+            yield from self._fall_back(source, region, entry, err)
+        else:
+            REQUESTS.inc(source=source, result="downloaded")
+
+    def _fall_back(self, source, region, entry, err):
+        """Yields the cached lines after a failed download.
+
+        Raises:
+          RankingsUnavailableError: If there's no cached copy.
+        """
+        if entry is None:
+            REQUESTS.inc(source=source, result="unavailable")
+            raise RankingsUnavailableError(
+                "Couldn't download {0} rankings for {1}: {2}".format(
+                    source, region, err
+                )
+            ) from err
+
+        REQUESTS.inc(source=source, result="stale")
+        sys.stderr.write(
+            "Couldn't download {0} rankings for {1} ({2}), using the copy "
+            "cached at {3}.\n".format(
+                source, region, err, time.ctime(entry["fetched_at"])
+            )
+        )
+        yield from self._iter_cached_lines(source, region)
+
+    def iter_lines(self, source, region, url, buffer=False):
+        """Streams the rankings for a source and region, downloading if needed.
+
+        Lines are yielded as they're downloaded, so large rankings never have
+        to be held in memory all at once.
+
+        Args:
+          source: The name of the ranking site, e.g. "garpr".
+          region: The region or league the rankings are for.
+          url: The URL to download the rankings from.
+          buffer: Whether to read the whole download before yielding any of it.
+                  Otherwise a download that fails partway through can't fall
+                  back to the cached copy.
+
+        Raises:
+          RankingsUnavailableError: If the rankings couldn't be downloaded and
+            there's no cached copy, or the download failed after some of its
+            lines were yielded.
+
+        Yields:
+          The lines of the rankings download, without line endings.
+        """
+        entry = self._read_entry(source, region)
+        cached_lines = self._get_cached_lines(source, region, entry)
+        if cached_lines is not None:
+            yield from cached_lines
+            return
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self._get(source, url, headers)
+        except requests.exceptions.RequestException as err:
+            yield from self._fall_back(source, region, entry, err)
+            return
+
+        if response.status_code == 304 and entry is not None:
+            # Not modified, so the cached copy is good for another TTL.
+            response.close()
+            REQUESTS.inc(source=source, result="not_modified")
+            entry["fetched_at"] = time.time()
+            self._write_entry(source, region, entry)
+            yield from self._iter_cached_lines(source, region)
+            return
+
+        new_entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        yield from self._iter_downloaded_lines(
+            source, region, entry, self._iter_response_lines(response), new_entry,
+            buffer
+        )
+
+    def iter_snapshot_lines(self, source, region, download, buffer=False):
+        """Streams rankings that take several downloads, caching them as one.
+
+        Rankings split into pages are cached whole, so one run never mixes
+        pages from different snapshots of the rankings. They're downloaded
+        again once the TTL passes, without revalidation.
+
+        Args:
+          source: The name of the ranking site, e.g. "braacket".
+          region: The region or league the rankings are for.
+          download: A generator function that downloads the rankings, e.g.
+                    with open_lines, and yields their lines. It should raise
+                    requests.exceptions.RequestException if a download fails.
+          buffer: Whether to read the whole download before yielding any of it.
+
+        Raises:
+          RankingsUnavailableError: If the rankings couldn't be downloaded and
+            there's no cached copy, or the download failed after some of its
+            lines were yielded.
+
+        Yields:
+          The lines of the rankings, without line endings.
+        """
+        entry = self._read_entry(source, region)
+        cached_lines = self._get_cached_lines(source, region, entry)
+        if cached_lines is not None:
+            yield from cached_lines
+            return
+
+        yield from self._iter_downloaded_lines(
+            source, region, entry, download(), {"url": None}, buffer
+        )
+
+    def fetch(self, source, region, url):
+        """Gets the rankings for a source and region, downloading if needed.
+
+        Args:
+          source: The name of the ranking site, e.g. "garpr".
+          region: The region or league the rankings are for.
+          url: The URL to download the rankings from.
+
+        Raises:
+          RankingsUnavailableError: If the rankings couldn't be downloaded and
+            there's no cached copy.
+
+        Returns:
+          The body of the rankings download, as text.
+        """
+        return "\n".join(self.iter_lines(source, region, url, buffer=True))
+
+
+def add_arguments(argparser):
+    """Adds the flags that configure the ranking cache to a CLI.
+
+    Args:
+      argparser: The argparse.ArgumentParser to add the flags to.
+    """
+    argparser.add_argument(
+        "--refresh_rankings",
+        action="store_true",
+        help="revalidate the cached rankings even if they're still fresh",
+    )
+    argparser.add_argument(
+        "--offline",
+        action="store_true",
+        help="only use cached rankings, never download them",
+    )
+    argparser.add_argument(
+        "--ranking_cache_ttl",
+        type=int,
+        default=defaults.DEFAULT_RANKING_CACHE_TTL,
+        help="how many seconds cached rankings are used before they're "
+        "revalidated",
+    )
+
+
+def from_args(args):
+    """Creates a RankingCache configured from the flags added by add_arguments.
+
+    Args:
+      args: The parsed argparse arguments.
+
+    Returns:
+      A RankingCache.
+    """
+    return RankingCache(
+        ttl=args.ranking_cache_ttl, refresh=args.refresh_rankings, offline=args.offline
+    )
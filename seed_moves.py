@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+
+"""Plans the fewest seed changes needed to reorder a Challonge tournament.
+
+When a participant's seed is changed on Challonge, everybody between their old
+and new seed shifts over by one. So rather than setting everybody's seed, we
+find the longest run of participants that are already in the right order
+relative to each other (the longest increasing subsequence of their new
+positions), leave them alone, and move everybody else into place around them.
+That's the smallest possible number of single-participant moves.
+"""
+
+
+import bisect
+import collections
+
+
+Move = collections.namedtuple("Move", ["item", "seed", "depends_on"])
+Move.__doc__ = """A single seed change.
+
+item: The participant to move.
+seed: The seed to give them, as of when the moves before it have been made.
+depends_on: The indices of earlier moves that have to be made first. Moves
+            that shift disjoint ranges of seeds can be made in any order.
+"""
+
+
+def _get_longest_increasing_subsequence(values):
+    """Finds a longest strictly increasing subsequence in O(n log n).
+
+    Args:
+      values: A list of comparable values.
+
+    Returns:
+      The set of indices of values in the subsequence.
+    """
+    # tails[k] is the index of the smallest value ending an increasing
+    # subsequence of length k + 1.
+    tails = []
+    tail_values = []
+    predecessors = [None] * len(values)
+    for i, value in enumerate(values):
+        k = bisect.bisect_left(tail_values, value)
+        predecessors[i] = tails[k - 1] if k else None
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    indices = set()
+    i = tails[-1] if tails else None
+    while i is not None:
+        indices.add(i)
+        i = predecessors[i]
+    return indices
+
+
+def plan_seed_moves(current_order, new_order):
+    """Plans the fewest seed changes that turn one order into another.
+
+    Args:
+      current_order: The participants, sorted by their current seed.
+      new_order: The same participants, sorted by the seed they should have.
+
+    Raises:
+      ValueError: If the orders don't contain the same participants.
+
+    Returns:
+      A list of Moves that, made in order (or in any order that respects
+      their dependencies), give every participant their new seed.
+    """
+    if collections.Counter(current_order) != collections.Counter(new_order):
+        raise ValueError("Both orders need to contain the same participants.")
+
+    new_positions = {item: i for i, item in enumerate(new_order)}
+    stable_indices = _get_longest_increasing_subsequence(
+        [new_positions[x] for x in current_order]
+    )
+    stable = {current_order[i] for i in stable_indices}
+
+    # Place everybody else right after whoever comes before them in the new
+    # order, going from first to last seed. We simulate the shifting to know
+    # what seed that is at the time of the move.
+    order = list(current_order)
+    last_move_at = [None] * len(order)
+    moves = []
+    for i, item in enumerate(new_order):
+        if item in stable:
+            continue
+
+        old_index = order.index(item)
+        order.pop(old_index)
+        new_index = order.index(new_order[i - 1]) + 1 if i else 0
+        order.insert(new_index, item)
+
+        shifted = range(min(old_index, new_index), max(old_index, new_index) + 1)
+        depends_on = {last_move_at[j] for j in shifted} - {None}
+        for j in shifted:
+            last_move_at[j] = len(moves)
+        moves.append(Move(item, new_index + 1, tuple(sorted(depends_on))))
+
+    return moves
+
+
+def apply_seed_moves(order, moves):
+    """Applies moves to an order the way Challonge would.
+
+    Args:
+      order: The participants, sorted by seed.
+      moves: A list of Moves.
+
+    Returns:
+      The participants sorted by seed after the moves are made.
+    """
+    order = list(order)
+    for move in moves:
+        order.remove(move.item)
+        order.insert(move.seed - 1, move.item)
+    return order
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+
+"""Works out who shouldn't play each other in the first round.
+
+In a weekly series, shuffled seeds still tend to pair the same people up in
+round one. These functions build a penalty matrix for
+shuffle_seeds.get_optimized_seeds from:
+
+* An avoid file, with one group of participants per line who shouldn't play
+  each other early, e.g. a crew or people who carpool from the same region:
+
+    # Comments and blank lines are ignored.
+    Neal, Bryan, Paragon
+    gaR, Eden
+
+* The head-to-heads of recent tournaments in the same series, e.g. mtvmelee71
+  and mtvmelee70 for mtvmelee72.
+
+Participants are matched up by name, ignoring case and extra whitespace.
+"""
+
+
+import re
+
+import requests
+
+import util_challonge
+
+
+# How much each kind of conflict adds to a pair's penalty.
+DEFAULT_GROUP_PENALTY = 1.0
+DEFAULT_RECENT_PENALTY = 1.0
+
+
+def _normalize_name(name):
+    return " ".join(name.lower().split())
+
+
+def read_avoid_file(path):
+    """Reads groups of participants to keep apart from a file.
+
+    Args:
+      path: The path of the file, with one comma-separated group per line.
+
+    Returns:
+      A list of groups, each a list of names.
+    """
+    groups = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                groups.append([x.strip() for x in line.split(",") if x.strip()])
+    return groups
+
+
+def get_previous_tourney_names(tourney_name, num_tourneys):
+    """Gets the names of the tournaments before one in a numbered series.
+
+    e.g. "mtvmelee72", 2 => ["mtvmelee71", "mtvmelee70"]
+
+    Args:
+      tourney_name: The name of a tournament, ending in its number.
+      num_tourneys: How many previous tournaments to get.
+
+    Returns:
+      A list of names, most recent first. It's empty if the name doesn't end
+      in a number.
+    """
+    match = re.search(r"(\d+)$", tourney_name)
+    if match is None:
+        return []
+
+    prefix = tourney_name[: match.start()]
+    number = int(match.group(1))
+    return [
+        "{0}{1}".format(prefix, number - x)
+        for x in range(1, num_tourneys + 1)
+        if number - x >= 0
+    ]
+
+
+def get_head_to_heads(tourney_names, client=None):
+    """Gets who played whom in some tournaments.
+
+    Tournaments that don't exist are skipped.
+
+    Args:
+      tourney_names: The names of the tournaments.
+      client: The util_challonge.ChallongeClient to use, or None for the
+              default client.
+
+    Returns:
+      A list of (name, name) pairs, one for each match played.
+    """
+    client = client or util_challonge.get_client()
+    head_to_heads = []
+    for tourney_name in tourney_names:
+        try:
+            participants = client.participants.index(tourney_name)
+            matches = client.matches.index(tourney_name)
+        except requests.exceptions.HTTPError as err:
+            if err.response.status_code != 404:
+                raise
+            continue
+
+        names_by_id = {
+            x["id"]: util_challonge.get_participant_name(x) for x in participants
+        }
+        for match in matches:
+            player1 = names_by_id.get(match.get("player1_id"))
+            player2 = names_by_id.get(match.get("player2_id"))
+            if player1 and player2:
+                head_to_heads.append((player1, player2))
+    return head_to_heads
+
+
+def get_penalties(
+    names,
+    groups=(),
+    head_to_heads=(),
+    group_penalty=DEFAULT_GROUP_PENALTY,
+    recent_penalty=DEFAULT_RECENT_PENALTY,
+):
+    """Builds a penalty matrix for shuffle_seeds.get_optimized_seeds.
+
+    Args:
+      names: The participants' names, in seed order.
+      groups: Groups of names who shouldn't play each other, e.g. from
+              read_avoid_file.
+      head_to_heads: (name, name) pairs who've played recently, e.g. from
+                     get_head_to_heads. Pairs that played more than once are
+                     penalized for each time.
+      group_penalty: How much being in the same group adds to a penalty.
+      recent_penalty: How much each recent head-to-head adds to a penalty.
+
+    Returns:
+      A symmetric N x N list of lists of penalties, in seed order.
+    """
+    indices = {}
+    for i, name in enumerate(names):
+        indices.setdefault(_normalize_name(name), []).append(i)
+
+    penalties = [[0.0] * len(names) for _ in names]
+
+    def add_penalty(name_a, name_b, penalty):
+        for i in indices.get(_normalize_name(name_a), ()):
+            for j in indices.get(_normalize_name(name_b), ()):
+                if i != j:
+                    penalties[i][j] += penalty
+                    penalties[j][i] += penalty
+
+    for group in groups:
+        for i, name_a in enumerate(group):
+            for name_b in group[i + 1 :]:
+                add_penalty(name_a, name_b, group_penalty)
+    for name_a, name_b in head_to_heads:
+        add_penalty(name_a, name_b, recent_penalty)
+    return penalties
+
+
+def add_arguments(argparser):
+    """Adds the flags that configure first round penalties to a CLI.
+
+    Args:
+      argparser: The argparse.ArgumentParser to add the flags to.
+    """
+    argparser.add_argument(
+        "--avoid_file",
+        default=None,
+        help="a file of comma-separated groups of participants, one per line, "
+        "who shouldn't play each other in the first round",
+    )
+    argparser.add_argument(
+        "--avoid_recent",
+        type=int,
+        default=0,
+        help="avoid first round rematches from this many previous "
+        "tournaments in the series",
+    )
+
+
+def from_args(args, tourney_name, client=None):
+    """Gets a function building penalties from the flags added by add_arguments.
+
+    Recent head-to-heads are fetched up front.
+
+    Args:
+      args: The parsed argparse arguments.
+      tourney_name: The name of the tournament being seeded.
+      client: The util_challonge.ChallongeClient to use, or None for the
+              default client.
+
+    Returns:
+      A function that takes the participants' names in seed order and returns
+      their penalty matrix, or None if no penalties were asked for.
+    """
+    if not args.avoid_file and not args.avoid_recent:
+        return None
+
+    groups = read_avoid_file(args.avoid_file) if args.avoid_file else []
+    head_to_heads = get_head_to_heads(
+        get_previous_tourney_names(tourney_name, args.avoid_recent), client
+    )
+    return lambda names: get_penalties(names, groups, head_to_heads)
@@ -25,47 +25,35 @@ spaces in the participant names are stripped.
 """
 
 import argparse
-import numbers
+import itertools
+import math
 import random
 import sys
+import time
 
+import bracket_math
+import profiling
 import util
 
 
+# How many seconds get_optimized_seeds searches for by default.
+DEFAULT_OPTIMIZE_TIME_BUDGET = 0.5
+
+
 def _get_num_participants_in_first_round(num_participants):
     """Gets the number of people in the first round of a tourney.
 
-    Args:
-      num_participants: The number of total participants in the tourney.
-
-    Returns:
-      The number of people who will be playing in the tournament's first
-      round.
+    See bracket_math.get_num_in_first_round.
     """
-    if num_participants <= 0:
-        raise ValueError("Invalid number of participants for a tourney.")
-    if num_participants <= 2:
-        return num_participants
-
-    # If the bracket size is a power of two, everybody gets to play in
-    # the first round.
-    nearest_smaller_power_of_two = 2 ** (num_participants.bit_length() - 1)
-    if nearest_smaller_power_of_two == num_participants:
-        return num_participants
-
-    # Otherwise, we have an awkwardly-sized bracket.
-    # For each leftover participant, we match them up with a low seed from a
-    # nice power-of-two-sized bracket, with everyone else getting a bye.
-    num_leftover_participants = num_participants - nearest_smaller_power_of_two
-    return num_leftover_participants * 2
-
-
-# TODO: We use this method for non-shuffling related things. Either rename
-# this module or move this method into a separate module.
+    return bracket_math.get_num_in_first_round(num_participants)
+
+
 def get_num_participants_placing_last(num_participants, double_elimination=True):
     """Gets the number of people who place last in a tourney of
     num_participants.
 
+    See bracket_math.get_num_placing_last, which this is kept around for.
+
     Args:
       num_participants: The number of participants in the tourney.
       double_elimination: Whether the tournament is double-elimination.
@@ -76,32 +64,7 @@ def get_num_participants_placing_last(num_participants, double_elimination=True)
     Raises:
       ValueError: if num_participants <= 0.
     """
-    if num_participants == 1:
-        return 1
-
-    # <= 4 is a bit of a weird case, so we handle it specially.
-    # TODO: reason through what's making the bucket size zero for the value 4,
-    # too tired ATM
-    if num_participants <= 4:
-        return 1 if double_elimination else 2
-
-    num_in_first_round = _get_num_participants_in_first_round(num_participants)
-    num_losing_in_first_round = num_in_first_round // 2
-    if not double_elimination:
-        return num_losing_in_first_round
-
-    # We just knocked a bunch of people into loser's. The second winner's round
-    # is always power-of-two-sized, where half the people will get knocked into
-    # round two of losers. These two groups of people are combined to form the
-    # initial loser's bracket. Half the people who fall into the first round of
-    # the loser's bracket will place last.
-    num_in_second_winners_round = num_participants - num_losing_in_first_round
-    num_losing_in_second_winners_round = num_in_second_winners_round // 2
-    num_in_first_losers_round = _get_num_participants_in_first_round(
-        num_losing_in_first_round + num_losing_in_second_winners_round
-    )
-    num_losing_in_first_losers_round = num_in_first_losers_round // 2
-    return num_losing_in_first_losers_round
+    return bracket_math.get_num_placing_last(num_participants, double_elimination)
 
 
 def _get_bucket_sizes(num_participants):
@@ -126,11 +89,7 @@ def _get_bucket_sizes(num_participants):
     # Once those people are eliminated, the next bucket can be determined
     # by solving for a tournament without the eliminated people. This approach
     # can be applied repeatedly to figure out all the buckets.
-    while num_participants > 0:
-        bucket_size = get_num_participants_placing_last(num_participants)
-        yield bucket_size
-
-        num_participants = num_participants - bucket_size
+    yield from bracket_math.get_bucket_sizes(num_participants)
 
 
 def _get_buckets(num_participants):
@@ -174,8 +133,180 @@ def get_shuffled_seeds(num_participants):
     return util.flatten(reversed(shuffled_buckets))
 
 
-if __name__ == "__main__":
+def _get_first_round_opponents(num_participants):
+    """Gets who each seed plays in the first round of a tourney.
+
+    Args:
+      num_participants: The number of participants in the tourney.
+
+    Returns:
+      A list with the 0-based seed each 0-based seed plays in the first round,
+      or None if they have a bye.
+    """
+    # The top seed plays the bottom seed of the smallest power-of-two-sized
+    # bracket that fits everybody, and so on inwards.
+    bracket_size = 1 << max(num_participants - 1, 1).bit_length()
+    opponents = [bracket_size - 1 - x for x in range(num_participants)]
+    return [x if x < num_participants else None for x in opponents]
+
+
+def get_optimized_seeds(penalties, time_budget=DEFAULT_OPTIMIZE_TIME_BUDGET,
+                        rng=None):
+    """Get randomized seedings that avoid bad first round matchups.
+
+    Seeds are only shuffled within the same buckets as get_shuffled_seeds, so
+    projected placements are unaffected. Starting from a random shuffle, seeds
+    in the same bucket are swapped around by simulated annealing to lower the
+    total penalty of the first round's matches.
+
+    Args:
+      penalties: An N x N array-like, where [i][j] is how bad it is for seeds
+                 i + 1 and j + 1 to play each other in the first round, e.g.
+                 how many times they've played recently. It should be
+                 symmetric.
+      time_budget: How many seconds to search for.
+      rng: A random.Random, or a seed to create one from. By default, one with
+           fresh entropy is used.
+
+    Returns:
+      A list of seeds in the same format as get_shuffled_seeds' return value.
+    """
+    if not isinstance(rng, random.Random):
+        rng = random.Random(rng)
+    num_participants = len(penalties)
+    penalties = [[float(x) for x in row] for row in penalties]
+    opponents = _get_first_round_opponents(num_participants)
+
+    # order[x] is the seed placed at (0-based) position x. Only buckets where
+    # a swap can change a first round match are searched.
+    order = []
+    buckets = []
+    for bucket in reversed(list(_get_buckets(num_participants))):
+        positions = [x - 1 for x in bucket]
+        order.extend(rng.sample(positions, len(positions)))
+        if len(positions) > 1 and any(opponents[x] is not None for x in positions):
+            buckets.append(positions)
+
+    def get_cost(x):
+        y = opponents[x]
+        return 0.0 if y is None else penalties[order[x]][order[y]]
+
+    cost = sum(get_cost(x) for x in range(num_participants)) / 2
+    best_cost, best_order = cost, list(order)
+    if not buckets or cost <= 0:
+        return _order_to_seeds(best_order)
+
+    # Swapping seeds is more likely in bigger buckets, since they have more
+    # possible swaps. The temperature cools from about the size of a typical
+    # penalty to nearly zero over the time budget.
+    weights = list(itertools.accumulate(len(x) for x in buckets))
+    positive = [x for row in penalties for x in row if x > 0]
+    start_temperature = sum(positive) / len(positive)
+    end_temperature = start_temperature / 1000
+    start_time = time.perf_counter()
+    temperature = start_temperature
+    num_steps = 0
+    while True:
+        num_steps += 1
+        if num_steps % 256 == 0:
+            elapsed = (time.perf_counter() - start_time) / max(time_budget, 1e-9)
+            if elapsed >= 1:
+                break
+            temperature = start_temperature * (
+                end_temperature / start_temperature) ** elapsed
+
+        bucket = rng.choices(buckets, cum_weights=weights)[0]
+        x, y = rng.sample(bucket, 2)
+        if opponents[x] == y:
+            continue
+
+        old_cost = get_cost(x) + get_cost(y)
+        order[x], order[y] = order[y], order[x]
+        delta = get_cost(x) + get_cost(y) - old_cost
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            cost += delta
+            if cost < best_cost - 1e-9:
+                best_cost, best_order = cost, list(order)
+                if best_cost <= 0:
+                    break
+        else:
+            order[x], order[y] = order[y], order[x]
+
+    return _order_to_seeds(best_order)
+
+
+def _order_to_seeds(order):
+    """Converts the seeds at each position to the position of each seed.
+
+    Returns:
+      A list of seeds in the same format as get_shuffled_seeds' return value.
+    """
+    seeds = [0] * len(order)
+    for position, seed in enumerate(order):
+        seeds[seed] = position + 1
+    return seeds
+
+
+def get_rngs(seed, num_rngs):
+    """Gets independent random number generators for parallel workers.
+
+    Each generator produces its own stream, so workers never share random
+    numbers, and the same seed always gives the same streams.
+
+    Args:
+      seed: An int to derive the streams from, or None for fresh entropy.
+      num_rngs: How many generators to create.
+
+    Returns:
+      A list of numpy.random.Generators.
+    """
+    import numpy as np
+
+    seed_sequence = np.random.SeedSequence(seed)
+    return [np.random.default_rng(x) for x in seed_sequence.spawn(num_rngs)]
+
+
+def get_shuffled_seeds_batch(num_participants, num_seedings, rng=None):
+    """Get many randomized seedings for a tournament at once.
+
+    Each seeding is shuffled within buckets like get_shuffled_seeds, but all
+    of them are made with a single vectorized sort: every seed gets a random
+    key, offset by its bucket so seeds never leave their bucket.
+
+    Args:
+      num_participants: The number of participants in the tournament.
+      num_seedings: How many seedings to make.
+      rng: A numpy.random.Generator, or a seed to create one from. By
+           default, a generator with fresh entropy is used.
+
+    Returns:
+      A num_seedings x num_participants NumPy array. Each row is a seeding in
+      the same format as get_shuffled_seeds' return value.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(rng)
+
+    # Buckets are ordered from last place to first place, so they're reversed
+    # to number them from first place to last.
+    bucket_sizes = list(_get_bucket_sizes(num_participants))[::-1]
+    bucket_ids = np.repeat(np.arange(len(bucket_sizes)), bucket_sizes)
+
+    keys = rng.random((num_seedings, num_participants)) + bucket_ids
+    return np.argsort(keys, axis=1, kind="stable") + 1
+
+
+def main(argv=None, prog=None):
+    """Runs the command line tool.
+
+    Args:
+      argv: The command line arguments, without the program name. Defaults to
+            sys.argv[1:].
+      prog: The name of the program in usage messages. Defaults to the script's
+            name.
+    """
     argparser = argparse.ArgumentParser(
+        prog=prog,
         description="shuffles seeds while preserving project placement",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
@@ -186,19 +317,28 @@ if __name__ == "__main__":
     argparser.add_argument(
         "--seed", type=int, default=None, help="seed for random number generation"
     )
-    args = argparser.parse_args()
+    profiling.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+    profiling.from_args(args)
 
-    if args.seed:
-        random.seed(args.seed)
+    def shuffle(num_participants):
+        # Seeded shuffles come from NumPy's RNG streams so they're reproducible,
+        # but unseeded ones don't need to pay for importing NumPy.
+        if args.seed is None:
+            return get_shuffled_seeds(num_participants)
+        return get_shuffled_seeds_batch(num_participants, 1, args.seed)[0].tolist()
 
     if args.participants.isdigit():
-        num_participants = int(args.participants)
-        print(get_shuffled_seeds(num_participants))
+        print(shuffle(int(args.participants)))
     else:
         participants = [x.strip() for x in args.participants.split(",")]
-        shuffled_seeds = get_shuffled_seeds(len(participants))
+        shuffled_seeds = shuffle(len(participants))
 
         # participants[0] is the first seed, so we subtract 1 from the seed number
         # to get the index of the participant.
         shuffled_participants = [participants[seed - 1] for seed in shuffled_seeds]
         print(shuffled_participants)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,18 +16,32 @@ For example, for www.challonge.com/mtvmlee72:
 
 # Python package imports.
 import argparse
-import challonge
 import sys
 
 # Local imports.
 import defaults
+import garpr_seeds_challonge
+import metrics
+import profiling
+import seed_penalties
 import shuffle_seeds
+import tracing
 import util
 import util_challonge
+import write_executor
 
 
-if __name__ == "__main__":
+def main(argv=None, prog=None):
+    """Runs the command line tool.
+
+    Args:
+      argv: The command line arguments, without the program name. Defaults to
+            sys.argv[1:].
+      prog: The name of the program in usage messages. Defaults to the script's
+            name.
+    """
     argparser = argparse.ArgumentParser(
+        prog=prog,
         description="shuffles seeds in a Challonge bracket, preserving "
         "projected placement",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
@@ -43,36 +57,55 @@ if __name__ == "__main__":
         default=defaults.DEFAULT_CONFIG_FILENAME,
         help="the config file to read your Challonge " "credentials from",
     )
-    args = argparser.parse_args()
+    seed_penalties.add_arguments(argparser)
+    metrics.add_arguments(argparser)
+    profiling.add_arguments(argparser)
+    tracing.add_arguments(argparser)
+    args = argparser.parse_args(argv)
+    metrics.from_args(args)
+    tracing.from_args(args)
+    profiling.from_args(args)
 
     initialized = util_challonge.set_challonge_credentials_from_config(args.config_file)
     if not initialized:
         sys.exit(1)
 
     tourney_name = util_challonge.extract_tourney_name(args.tourney_name)
-    tourney_url = "http://challonge.com/{0}".format(tourney_name)
-    tourney_info = challonge.tournaments.show(tourney_name)
+    tourney_url = util_challonge.tourney_name_to_url(tourney_name)
+    client = util_challonge.get_client()
+    tourney_info = client.tournaments.show(tourney_name)
     if tourney_info["state"] != "pending":
         sys.stderr.write(
             "Can only run {0} on tournaments that haven't "
-            "started.\n".format(sys.argv[0])
+            "started.\n".format(argparser.prog)
         )
         sys.exit(1)
 
     # The participants need to be sorted by seed so their index in the
     # list matches up with the shuffled seeds list.
     participant_infos = sorted(
-        challonge.participants.index(tourney_name), key=lambda x: x["seed"]
+        client.participants.index(tourney_name), key=lambda x: x["seed"]
     )
     num_participants = len(participant_infos)
-    new_seeds = shuffle_seeds.get_shuffled_seeds(num_participants)
-
-    for i, new_seed in enumerate(new_seeds):
-        participant_info = participant_infos[i]
-        if participant_info["seed"] == new_seed:
-            continue
+    get_penalties = seed_penalties.from_args(args, tourney_name, client)
+    if get_penalties is None:
+        new_seeds = shuffle_seeds.get_shuffled_seeds(num_participants)
+    else:
+        names = [util_challonge.get_participant_name(x) for x in participant_infos]
+        new_seeds = shuffle_seeds.get_optimized_seeds(get_penalties(names))
+
+    sorted_participants = garpr_seeds_challonge._sort_by_seeds(
+        participant_infos, new_seeds
+    )
 
-        participant_id = participant_info["id"]
-        challonge.participants.update(tourney_name, participant_id, seed=new_seed)
+    try:
+        garpr_seeds_challonge.update_seeds(tourney_url, sorted_participants)
+    except write_executor.BatchWriteError as err:
+        sys.stderr.write("{0}\n".format(err))
+        sys.exit(1)
 
     print("Seeds shuffled: {0}/participants".format(tourney_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ seed=1500
 @test "$shuffle_seeds shuffles a number of participants" {
   run $shuffle_seeds 9 --seed=$seed
   assert_success
-  assert_line "[1, 2, 3, 4, 6, 5, 7, 8, 9]"
+  assert_line "[1, 2, 3, 4, 5, 6, 8, 7, 9]"
 }
 
 @test "$shuffle_seeds returns empty list for zero participants" {
@@ -21,7 +21,7 @@ seed=1500
 @test "$shuffle_seeds shuffles a list of participant names" {
   run $shuffle_seeds "Neal, Bryan, Paragon, gaR, Admiral Lightning Bolt, Eden" --seed=$seed
   assert_success
-  assert_line "['Neal', 'Bryan', 'Paragon', 'gaR', 'Eden', 'Admiral Lightning Bolt']"
+  assert_line "['Neal', 'Bryan', 'Paragon', 'gaR', 'Admiral Lightning Bolt', 'Eden']"
 }
 
 @test "$shuffle_seeds fails when given no arguments" {
@@ -0,0 +1,51 @@
+from os.path import dirname, abspath
+import pytest
+import sys
+import threading
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import async_challonge
+
+
+class FakeParticipants(object):
+    def __init__(self, barrier):
+        self.barrier = barrier
+
+    def index(self, tourney_name):
+        # Only returns once both calls are in flight at the same time.
+        self.barrier.wait(timeout=5)
+        return [tourney_name]
+
+
+def test_blocking_calls_run_concurrently():
+    """Awaiting two client calls at once sends both requests together."""
+    resource = async_challonge._AsyncResource(FakeParticipants(threading.Barrier(2)))
+
+    results = async_challonge.run(
+        async_challonge.gather_or_raise(resource.index("a"), resource.index("b"))
+    )
+
+    assert results == [["a"], ["b"]]
+
+
+def test_gather_or_raise_waits_for_everything_before_raising():
+    finished = []
+
+    def fail():
+        raise ValueError("nope")
+
+    def succeed():
+        finished.append(True)
+
+    with pytest.raises(ValueError):
+        async_challonge.run(
+            async_challonge.gather_or_raise(
+                async_challonge.run_blocking(fail),
+                async_challonge.run_blocking(succeed),
+            )
+        )
+
+    assert finished == [True]
@@ -0,0 +1,109 @@
+from os.path import dirname, abspath
+import pytest
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import bracket
+import bracket_math
+
+
+def test_get_seed_order():
+    assert bracket.get_seed_order(8) == [1, 8, 4, 5, 2, 7, 3, 6]
+
+
+@pytest.mark.parametrize('num_participants', [2, 3, 5, 8, 12, 17, 33, 100])
+def test_losers_rounds_match_bracket_buckets(num_participants):
+    """Each loser's round knocks out a bucket, like bracket_math predicts."""
+    layout = bracket.Bracket(num_participants)
+    real = ~layout.is_bye
+
+    num_knocked_out = tuple(
+        int((real & (layout.match_rounds == -x)).sum())
+        for x in range(1, layout.num_losers_rounds + 1))
+    # The grand finals knock out second place, and first place is left.
+    assert num_knocked_out + (1, 1) == \
+        bracket_math.get_bucket_sizes(num_participants)
+
+
+def test_byes():
+    layout = bracket.Bracket(5)
+
+    first_round = layout.get_matches_in_round(1)
+    assert len(first_round) == 4
+    assert [layout.get_possible_seeds(x) for x in first_round
+            if not layout.is_bye[x]] == [([4], [5])]
+
+
+def test_single_elimination():
+    layout = bracket.Bracket(8, double_elimination=False)
+
+    assert layout.num_matches == 7
+    assert layout.num_losers_rounds == 0
+    assert not layout.has_reset
+    assert list(layout.elimination_stages) == [1, 1, 1, 1, 2, 2, 3]
+    assert (layout.loser_next_match == -1).all()
+
+
+def test_loser_rounds():
+    layout = bracket.Bracket(8)
+
+    winners_rounds = layout.match_rounds[layout.match_rounds > 0]
+    assert list(winners_rounds) == [1, 1, 1, 1, 2, 2, 3, 4]
+    assert list(layout.loser_rounds[:7]) == [-1, -1, -1, -1, -2, -2, -4]
+    # Losing in grand finals or the loser's bracket eliminates you.
+    assert (layout.loser_rounds[7:] == 0).all()
+
+
+def test_loser_rounds_skip_byes():
+    layout = bracket.Bracket(12)
+
+    # Every loser of winner's round one gets a bye in the first loser's round,
+    # so their first real match is in loser's round one with the drop-ins.
+    real_first_round = [x for x in layout.get_matches_in_round(1)
+                        if not layout.is_bye[x]]
+    assert [layout.loser_rounds[x] for x in real_first_round] == [-1] * 4
+
+
+def test_drop_ins_cross_over():
+    layout = bracket.Bracket(8)
+
+    # The losers of the top half's second round meet survivors from the
+    # bottom half, so nobody replays someone from their own quarter yet.
+    for match in layout.get_matches_in_round(-2):
+        survivors, drop_ins = layout.get_possible_seeds(match)
+        assert set(survivors).isdisjoint(drop_ins)
+    assert not layout.can_meet(1, 8, -2)
+
+
+def test_can_meet_in_winners_rounds():
+    layout = bracket.Bracket(16)
+
+    assert layout.can_meet(1, 16, 1)
+    assert not layout.can_meet(1, 16, 2)
+    assert layout.can_meet(1, 8, 2)
+    assert layout.can_meet(1, 4, 3)
+    assert layout.can_meet(1, 2, 4)
+    assert not layout.can_meet(1, 1, 1)
+    assert layout.get_possible_opponents(1, 3) == [4, 5, 12, 13]
+
+
+def test_can_meet_matches_possible_seeds():
+    """The shortcut for winner's rounds agrees with the general tables."""
+    layout = bracket.Bracket(13)
+
+    for round_num in range(1, layout.num_winners_rounds + 1):
+        opponents = layout._get_opponents(round_num)
+        for seed_a in range(1, 14):
+            for seed_b in range(1, 14):
+                assert layout.can_meet(seed_a, seed_b, round_num) == \
+                    bool((opponents[seed_a - 1] >> (seed_b - 1)) & 1)
+            assert layout.get_possible_opponents(seed_a, round_num) == \
+                [x + 1 for x in range(13) if (opponents[seed_a - 1] >> x) & 1]
+
+
+def test_get_bracket_is_cached():
+    assert bracket.get_bracket(24) is bracket.get_bracket(24)
+    assert bracket.get_bracket(24, False) is not bracket.get_bracket(24)
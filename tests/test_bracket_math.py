@@ -0,0 +1,66 @@
+from os.path import dirname, abspath
+import numpy as np
+import pytest
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import bracket_math
+
+
+@pytest.mark.parametrize('num_participants, expected', [
+    (1, 1), (2, 2), (3, 2), (4, 4), (5, 2), (8, 8), (9, 2), (12, 8), (16, 16),
+])
+def test_num_in_first_round(num_participants, expected):
+    assert bracket_math.get_num_in_first_round(num_participants) == expected
+
+
+def test_bracket_table():
+    table = bracket_math.get_bracket_table(9)
+
+    assert table.num_in_first_round == 2
+    assert table.bucket_sizes == (1, 2, 2, 1, 1, 1, 1)
+    assert table.bucket_boundaries[:3] == ((9, 9), (7, 8), (5, 6))
+    assert table.num_amateurs_by_cutoff[:3] == (1, 3, 5)
+    assert table.num_amateurs_by_cutoff[-1] == 9
+
+
+def test_amateurs_never_outnumber_participants():
+    assert bracket_math.get_num_amateurs(2, 5) == 2
+
+
+def test_invalid_number_of_participants():
+    with pytest.raises(ValueError):
+        bracket_math.get_num_placing_last(0)
+    with pytest.raises(ValueError):
+        bracket_math.get_bucket_sizes_array([4, 0])
+    assert bracket_math.get_bucket_sizes(0) == ()
+
+
+@pytest.mark.parametrize('double_elimination', [True, False])
+def test_vectorized_matches_scalar(double_elimination):
+    num_participants = np.arange(1, 600)
+
+    first_round = bracket_math.get_num_in_first_round_array(num_participants)
+    placing_last = bracket_math.get_num_placing_last_array(
+        num_participants, double_elimination)
+
+    for i, n in enumerate(num_participants.tolist()):
+        assert first_round[i] == bracket_math.get_num_in_first_round(n)
+        assert placing_last[i] == bracket_math.get_num_placing_last(
+            n, double_elimination)
+
+
+def test_vectorized_bucket_sizes_match_scalar():
+    num_participants = np.arange(1, 600)
+
+    bucket_sizes = bracket_math.get_bucket_sizes_array(num_participants)
+    num_amateurs = bracket_math.get_num_amateurs_array(num_participants, 2)
+
+    for i, n in enumerate(num_participants.tolist()):
+        expected = bracket_math.get_bucket_sizes(n)
+        assert tuple(bucket_sizes[i, :len(expected)]) == expected
+        assert not bucket_sizes[i, len(expected):].any()
+        assert num_amateurs[i] == bracket_math.get_num_amateurs(n, 2)
@@ -0,0 +1,77 @@
+from os.path import dirname, abspath
+import numpy as np
+import pytest
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import bracket_math
+import bracket_simulator
+
+
+@pytest.mark.parametrize('num_participants', [1, 2, 3, 5, 9, 16, 24, 33])
+def test_eliminations_match_bracket_buckets(num_participants):
+    """People are knocked out in the groups bracket_math predicts."""
+    result = bracket_simulator.simulate(np.zeros(num_participants),
+                                        num_runs=100, seed=1, num_workers=1)
+
+    per_stage = result.stage_counts.sum(axis=0) // result.num_runs
+    assert tuple(x for x in per_stage if x) == \
+        bracket_math.get_bucket_sizes(num_participants)
+
+
+def test_placements_follow_ratings():
+    ratings = bracket_simulator.get_ratings_from_ranks(range(1, 17))
+    result = bracket_simulator.simulate(ratings, num_runs=20000, seed=1,
+                                        num_workers=1)
+
+    expected_placements = result.get_expected_placements()
+    assert expected_placements[0] < 2
+    assert expected_placements[0] < expected_placements[7] < \
+        expected_placements[15]
+    assert np.allclose(result.get_placement_distribution().sum(axis=1), 1)
+    assert 0 < result.get_upset_rate() < 0.5
+
+
+def test_grand_finals_reset_only_counts_when_played():
+    """The reset is only played when the loser's side wins the first set."""
+    even = bracket_simulator.simulate(np.zeros(4), num_runs=20000, seed=1,
+                                      num_workers=1)
+    dominant = bracket_simulator.simulate([2000.0, 0.0, 0.0, 0.0],
+                                          num_runs=20000, seed=1,
+                                          num_workers=1)
+
+    # 6 matches, plus a reset in about half the runs of an even bracket.
+    assert 6.4 < even.num_matches / even.num_runs < 6.6
+    assert dominant.num_matches / dominant.num_runs < 6.01
+
+
+@pytest.mark.parametrize('num_participants', [8, 12, 19])
+def test_amateur_rates(num_participants):
+    result = bracket_simulator.simulate(np.zeros(num_participants),
+                                        num_runs=1000, seed=1, num_workers=1)
+
+    assert result.get_amateur_rates(2).sum() == \
+        pytest.approx(bracket_math.get_num_amateurs(num_participants, 2))
+
+
+def test_results_do_not_depend_on_number_of_workers():
+    ratings = bracket_simulator.get_ratings_from_ranks([1, 2, 3, None, None])
+    one = bracket_simulator.simulate(ratings, num_runs=3000, shuffle=True,
+                                     seed=7, num_workers=1, chunk_size=1000)
+    many = bracket_simulator.simulate(ratings, num_runs=3000, shuffle=True,
+                                      seed=7, num_workers=2, chunk_size=1000)
+
+    assert np.array_equal(one.placement_counts, many.placement_counts)
+    assert one.num_rematches == many.num_rematches
+
+
+def test_drop_order_avoids_rematches():
+    ratings = bracket_simulator.get_ratings_from_ranks(range(1, 33))
+    result = bracket_simulator.simulate(ratings, num_runs=2000, seed=1,
+                                        num_workers=1)
+
+    # Without crossing losers over, about 9 pairs replay each bracket.
+    assert result.get_expected_rematches() < 5
@@ -0,0 +1,74 @@
+from os.path import dirname, abspath
+import json
+import os
+import pytest
+import subprocess
+import sys
+import time
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import challonge_tools
+
+
+# Modules that take long enough to import that quick commands shouldn't.
+HEAVY_MODULES = ['numpy', 'requests', 'util_challonge', 'garpr_seeds']
+
+# Runs challonge_tools and reports which heavy modules it imported.
+CHECK_IMPORTS = '''
+import json, sys
+import challonge_tools
+try:
+    challonge_tools.main(sys.argv[1:])
+except SystemExit:
+    pass
+sys.stderr.write(json.dumps([x for x in {0} if x in sys.modules]))
+'''.format(HEAVY_MODULES)
+
+
+def run_python(args):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=dirname(CWD),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    assert result.returncode == 0, result.stderr
+    return result, time.perf_counter() - start
+
+
+def test_get_module_name():
+    assert challonge_tools.get_module_name('seed', ['mtvmelee72']) == \
+        'garpr_seeds_challonge'
+    assert challonge_tools.get_module_name('shuffle', ['64']) == \
+        'shuffle_seeds'
+    assert challonge_tools.get_module_name(
+        'shuffle', ['--seed', '3', 'gaR, Bryan']) == 'shuffle_seeds'
+    assert challonge_tools.get_module_name('shuffle', ['--help']) == \
+        'shuffle_seeds'
+    assert challonge_tools.get_module_name('shuffle', ['mtvmelee72']) == \
+        'shuffle_seeds_challonge'
+    assert challonge_tools.get_module_name('reshuffle', ['--help']) == \
+        'shuffle_seeds_challonge'
+
+
+def test_quick_commands_skip_heavy_imports():
+    for args in (['--help'], ['shuffle', '64'], ['shuffle', '--help']):
+        result, _ = run_python(['-c', CHECK_IMPORTS] + args)
+        assert json.loads(result.stderr) == []
+
+    result, _ = run_python(['-c', CHECK_IMPORTS, 'shuffle', '8'])
+    assert sorted(json.loads(result.stdout)) == list(range(1, 9))
+
+
+# Wall-clock timings are too noisy to check on every run, e.g. on loaded CI
+# machines.
+@pytest.mark.skipif(not os.getenv('CHALLONGE_TOOLS_TIME_STARTUP'),
+                    reason='set CHALLONGE_TOOLS_TIME_STARTUP=1 to time startup')
+def test_startup_time():
+    # Compare against starting Python itself, which varies between machines.
+    interpreter = min(run_python(['-c', 'pass'])[1] for _ in range(3))
+    for args in (['--help'], ['shuffle', '64']):
+        tool = min(run_python(['challonge_tools.py'] + args)[1]
+                   for _ in range(3))
+        assert tool - interpreter < 0.1, (args, tool, interpreter)
@@ -0,0 +1,87 @@
+from os.path import dirname, abspath
+import pytest
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import create_amateur_bracket
+import fake_challonge
+
+
+@pytest.fixture
+def server():
+    with fake_challonge.FakeChallongeServer() as server:
+        yield server
+
+
+def create_tourney(challonge, tourney_name, names):
+    challonge.create_tournament(tourney_name, tourney_name)
+    for name in names:
+        challonge.add_participant(tourney_name, name)
+
+
+def test_amateur_participants_take_one_request(server):
+    """Amateurs are looked up from a single participants.index call."""
+    create_tourney(server.challonge, 'melee72', ['a', 'b', 'c', 'd', 'e', 'f'])
+    client = server.get_client()
+    participants = client.participants.index('melee72')
+    matches = [
+        {'state': 'complete', 'loser_id': participants[3]['id']},
+        {'state': 'open', 'player1_id': participants[4]['id'],
+         'player2_id': participants[5]['id']},
+    ]
+    server.reset_counts()
+
+    amateurs = create_amateur_bracket.get_amateur_participants(
+        'melee72', matches, client=client)
+
+    assert server.request_counts == {
+        ('GET', 'tournaments/:tournament/participants'): 1}
+    assert [(x['display_name'], x['seed']) for x in amateurs] == \
+        [('d', 4), ('e / f', 5)]
+
+
+def get_participant_params(names):
+    return [{'name': name, 'seed': seed} for seed, name in enumerate(names, 1)]
+
+
+def test_participants_are_bulk_added_in_seed_order(server, monkeypatch):
+    """Participants are registered in chunks, and keep their seeds."""
+    monkeypatch.setattr(create_amateur_bracket, '_BULK_ADD_CHUNK_SIZE', 2)
+    create_tourney(server.challonge, 'melee72_amateur', [])
+    client = server.get_client()
+    names = ['a', 'b', 'c', 'd', 'e']
+    server.reset_counts()
+
+    create_amateur_bracket._register_participants(
+        'melee72_amateur', get_participant_params(names), client=client)
+
+    # ceil(5 / 2) bulk adds.
+    assert server.request_counts == {
+        ('POST', 'tournaments/:tournament/participants/bulk_add'): 3}
+    participants = client.participants.index('melee72_amateur')
+    assert [(x['name'], x['seed']) for x in participants] == \
+        [(x, i) for i, x in enumerate(names, 1)]
+
+
+def test_invited_participants_keep_their_seeds(server, monkeypatch):
+    """Participants invited on their own don't disturb the seeds around them."""
+    monkeypatch.setattr(create_amateur_bracket, '_BULK_ADD_CHUNK_SIZE', 2)
+    create_tourney(server.challonge, 'melee72_amateur', [])
+    client = server.get_client()
+    names = ['a', 'b', 'c', 'd', 'e']
+    all_params = get_participant_params(names)
+    all_params[2]['challonge_username'] = 'c_on_challonge'
+    server.reset_counts()
+
+    create_amateur_bracket._register_participants(
+        'melee72_amateur', all_params, client=client)
+
+    assert server.request_counts == {
+        ('POST', 'tournaments/:tournament/participants/bulk_add'): 2,
+        ('POST', 'tournaments/:tournament/participants'): 1}
+    participants = client.participants.index('melee72_amateur')
+    assert [(x['name'], x['seed']) for x in participants] == \
+        [(x, i) for i, x in enumerate(names, 1)]
@@ -0,0 +1,35 @@
+from os.path import dirname, abspath
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import create_next_tournament
+import fake_challonge
+
+
+def test_get_next_tournament_params():
+    tourney_id, name, url, params = \
+        create_next_tournament.get_next_tournament_params('mtv-melee72', {
+            'name': 'Melee 72', 'url': 'melee72', 'subdomain': 'mtv',
+            'tournament_type': 'double elimination', 'id': 1234,
+            'state': 'complete'})
+    assert (tourney_id, name, url) == ('mtv-melee73', 'Melee 73', 'melee73')
+    assert params == {'subdomain': 'mtv',
+                      'tournament_type': 'double elimination'}
+
+
+def test_create_next_tournament():
+    with fake_challonge.FakeChallongeServer() as server:
+        server.challonge.create_tournament('Melee 72', 'melee72',
+                                           'double elimination')
+        client = server.get_client()
+
+        url = create_next_tournament.create_next_tournament(
+            'https://challonge.com/melee72', client=client)
+
+        assert url == 'https://challonge.com/melee73'
+        tournament = client.tournaments.show('melee73')
+        assert tournament['name'] == 'Melee 73'
+        assert tournament['tournament_type'] == 'double elimination'
@@ -0,0 +1,120 @@
+from os.path import dirname, abspath
+import pytest
+import requests
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import create_amateur_bracket
+import fake_challonge
+import garpr_seeds_challonge
+
+
+TOURNEY_URL = 'https://challonge.com/melee72'
+
+
+@pytest.fixture
+def server():
+    with fake_challonge.FakeChallongeServer(seed=1) as server:
+        yield server
+
+
+def create_tourney(challonge, names, tournament_type='double elimination'):
+    challonge.create_tournament('Melee 72', 'melee72', tournament_type)
+    for name in names:
+        challonge.add_participant('melee72', name)
+
+
+def get_names(client):
+    return [x['name'] for x in client.participants.index('melee72')]
+
+
+def test_seeds_shift_like_challonge(server):
+    create_tourney(server.challonge, ['a', 'b', 'c', 'd'])
+    client = server.get_client()
+
+    participants = client.participants.index('melee72')
+    client.participants.update('melee72', participants[3]['id'], seed=1)
+    assert get_names(client) == ['d', 'a', 'b', 'c']
+
+    client.participants.create('melee72', 'e', seed=2)
+    assert get_names(client) == ['d', 'e', 'a', 'b', 'c']
+    assert [x['seed'] for x in client.participants.index('melee72')] == \
+        [1, 2, 3, 4, 5]
+
+
+def test_update_seeds_round_trips(server):
+    create_tourney(server.challonge, ['a', 'b', 'c', 'd', 'e'])
+    client = server.get_client()
+    participants = client.participants.index('melee72')
+    new_order = [participants[x] for x in (1, 0, 2, 4, 3)]
+    server.reset_counts()
+
+    garpr_seeds_challonge.update_seeds(TOURNEY_URL, new_order, client=client)
+
+    # Only one of each swapped pair has to move.
+    assert server.request_counts == {
+        ('PUT', 'tournaments/:tournament/participants/:id'): 2}
+    assert get_names(client) == ['b', 'a', 'c', 'e', 'd']
+
+
+def test_missing_tournaments_are_404s(server):
+    with pytest.raises(requests.exceptions.HTTPError) as err:
+        server.get_client().tournaments.show('nope')
+    assert err.value.response.status_code == 404
+
+
+def test_injected_failures_are_retried(server):
+    create_tourney(server.challonge, ['a', 'b'])
+    client = server.get_client(backoff=0.01)
+    server.fail_next(429, 2)
+    server.fail_next(502)
+
+    assert get_names(client) == ['a', 'b']
+    assert client.num_throttled == 2
+    assert server.num_requests == 4
+
+
+def test_amateur_bracket_offline(server):
+    names = ['p{0}'.format(x) for x in range(1, 13)]
+    create_tourney(server.challonge, names)
+    server.challonge.start_tournament('melee72')
+
+    # Top seeds win until loser's round 2 is done.
+    while True:
+        matches = [x for x in server.challonge.get_matches('melee72', 'open')
+                   if x['round'] >= -2]
+        if not matches:
+            break
+        for match in matches:
+            server.challonge.report_match('melee72', match['id'],
+                                          min(match['player1_id'],
+                                              match['player2_id']))
+
+    client = server.get_client()
+    create_amateur_bracket.create_amateur_bracket(
+        TOURNEY_URL, False, 2, False, client=client)
+
+    amateurs = [x['name']
+                for x in client.participants.index('melee72_amateur')]
+    assert sorted(amateurs, key=lambda x: int(x[1:])) == \
+        ['p7', 'p8', 'p9', 'p10', 'p11', 'p12']
+
+
+def test_record_and_replay(server, tmpdir):
+    create_tourney(server.challonge, ['a', 'b'])
+    path = str(tmpdir.join('recording.json'))
+    recorder = fake_challonge.FakeChallongeServer(
+        mode=fake_challonge.RECORD, recording_path=path,
+        upstream_url=server.base_url)
+    with recorder:
+        assert get_names(recorder.get_client()) == ['a', 'b']
+
+    with fake_challonge.FakeChallongeServer(
+            mode=fake_challonge.REPLAY, recording_path=path) as replayer:
+        client = replayer.get_client(max_retries=0)
+        assert get_names(client) == ['a', 'b']
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.tournaments.show('melee72')
@@ -6,11 +6,14 @@ from random import choice
 import sys
 from unittest.mock import Mock
 
+import requests
+
 # Add the parent directory to the path
 CWD = dirname(abspath(__file__))
 sys.path.append(dirname(CWD))
 
 import garpr_seeds
+import ranking_cache
 
 
 def rankings(region):
@@ -91,3 +94,169 @@ def test_multiple_tags_parens(players):
     seeds = seed_players(players)
 
     assert seeds == [2, 3, 1, 3, 5]
+
+
+def test_ignore_sponsor_prefix():
+    """Players can be looked up without their sponsor, and vice versa."""
+    index = garpr_seeds.RankingIndex(rankings('norcal'))
+    players = ['Ralph', 'SAB | Ralph', 'C9 | Umarth', '  trock ']
+
+    assert index.get_ranks(players) == [6, 6, 9, 25]
+
+
+def test_ranking_index_first_ranking_wins():
+    """If two rankings share a tag, the better-ranked one is used."""
+    index = garpr_seeds.RankingIndex([
+        {'name': 'Mango', 'rank': 1},
+        {'name': 'Lucky (Mango)', 'rank': 2},
+    ])
+
+    assert len(index) == 2
+    assert index.get_ranks(['mango', 'lucky', 'nobody']) == \
+        [1, 2, garpr_seeds.UNKNOWN_RANK]
+
+
+def test_ranking_index_full_names_beat_aliases():
+    """A player's own tag isn't shadowed by a sponsored tag ranked above it."""
+    index = garpr_seeds.RankingIndex([
+        {'name': 'SPN | Foo', 'rank': 1},
+        {'name': 'Foo', 'rank': 2},
+        {'name': 'Bar (Foo)', 'rank': 3},
+    ])
+
+    assert index.get_ranks(['Foo', 'SPN | Foo', 'C9 | Foo', 'bar']) == \
+        [2, 1, 2, 3]
+
+
+def test_ranks_to_seeds_batch_matches_ranks_to_seeds():
+    """The batch version squashes every row the same way as ranks_to_seeds."""
+    U = garpr_seeds.UNKNOWN_RANK
+    ranks = [
+        [4, 6, U, 2, U],
+        [3, 3, U, 1, 7],
+        [U, U, U, U, U],
+        [10, 9, 8, 7, 6],
+    ]
+    seeds = garpr_seeds.ranks_to_seeds_batch(ranks)
+
+    assert seeds.tolist() == [garpr_seeds.ranks_to_seeds(x) for x in ranks]
+
+
+class FakeBraacketCache(object):
+    """Serves pages of a Braacket CSV export instead of downloading them."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested_pages = []
+
+    def open_lines(self, source, url):
+        page = int(url.split('page=')[1].split('&')[0])
+        self.requested_pages.append(page)
+        yield from self.pages.get(page, ['"Rank","Player","Points"'])
+
+    def iter_snapshot_lines(self, source, region, download, buffer=False):
+        return download()
+
+
+class BraacketRankingCache(ranking_cache.RankingCache):
+    """Caches pages of a Braacket CSV export instead of downloading them."""
+
+    def __init__(self, pages, **kwargs):
+        super().__init__(**kwargs)
+        self.pages = pages
+        self.requested_pages = []
+
+    def open_lines(self, source, url):
+        page = int(url.split('page=')[1].split('&')[0])
+        self.requested_pages.append(page)
+        lines = self.pages.get(page, ['"Rank","Player","Points"'])
+        if lines is None:
+            raise requests.exceptions.ConnectionError('Braacket is down.')
+        yield from lines
+
+
+def test_braacket_rankings_follow_pagination(monkeypatch):
+    """Every page of a Braacket ranking is read, and quoted tags are parsed."""
+    monkeypatch.setattr(garpr_seeds, '_BRAACKET_PAGE_SIZE', 2)
+    cache = FakeBraacketCache({
+        1: ['"Rank","Player","Points"', '1,"Mango",100', '2,"Armada, Jr.",90'],
+        2: ['"Rank","Player","Points"', '3,"Hbox",80', '4,"M2K",70'],
+        3: ['"Rank","Player","Points"', '5,"Leffen",60'],
+    })
+    ranks = garpr_seeds.get_braacket_ranks(
+        ['Leffen', 'armada, jr.', 'mango'], cache=cache)
+
+    assert ranks == [5, 2, 1]
+    assert cache.requested_pages == [1, 2, 3]
+
+
+def test_braacket_rankings_stop_on_repeated_page(monkeypatch):
+    """Pagination stops if Braacket sends the first page again."""
+    monkeypatch.setattr(garpr_seeds, '_BRAACKET_PAGE_SIZE', 1)
+    page = ['"Rank","Player","Points"', '1,"Mango",100']
+    cache = FakeBraacketCache({1: page, 2: page, 3: page})
+    rankings = list(garpr_seeds._iter_braacket_rankings(cache=cache))
+
+    assert rankings == [{'rank': 1, 'name': 'Mango'}]
+    assert cache.requested_pages == [1, 2]
+
+
+def test_braacket_pages_are_cached_as_one_snapshot(tmpdir, monkeypatch):
+    """A run never mixes pages of the ranking from different downloads."""
+    monkeypatch.setattr(garpr_seeds, '_BRAACKET_PAGE_SIZE', 1)
+    header = '"Rank","Player","Points"'
+    cache = BraacketRankingCache({
+        1: [header, '1,"Mango",100'],
+        2: [header, '2,"Armada",90'],
+    }, cache_dir=str(tmpdir), ttl=60)
+    old_rankings = list(garpr_seeds._iter_braacket_rankings(cache=cache))
+    assert list(garpr_seeds._iter_braacket_rankings(cache=cache)) == \
+        old_rankings
+    assert cache.requested_pages == [1, 2, 3]
+
+    # Armada passed Mango, and Braacket went down halfway through the pages,
+    # so the whole stale snapshot is used.
+    cache.ttl = 0
+    cache.pages = {1: [header, '1,"Armada",100'], 2: None}
+    assert list(garpr_seeds._iter_braacket_rankings(cache=cache)) == \
+        old_rankings
+
+    cache.offline = True
+    assert list(garpr_seeds._iter_braacket_rankings(cache=cache)) == \
+        old_rankings
+
+
+def test_braacket_quoted_tags_can_span_lines(tmpdir, monkeypatch):
+    """Quoted fields keep their line breaks, downloaded or cached."""
+    monkeypatch.setattr(garpr_seeds, '_BRAACKET_PAGE_SIZE', 3)
+    cache = BraacketRankingCache({
+        1: ['"Rank","Player","Points"', '1,"Mango', 'Jr.",100',
+            '2,"Armada",90'],
+    }, cache_dir=str(tmpdir), ttl=60)
+    expected = [{'rank': 1, 'name': 'Mango\nJr.'},
+                {'rank': 2, 'name': 'Armada'}]
+
+    assert list(garpr_seeds._iter_braacket_rankings(cache=cache)) == expected
+    assert list(garpr_seeds._iter_braacket_rankings(cache=cache)) == expected
+    assert cache.requested_pages == [1]
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('Umarth1', 'Umarth'),
+    ('TR0CK', 'trock'),
+    ('  Rugrät ', 'ORR | Rugrat'),
+])
+def test_suggest_close_matches(name, expected):
+    """Names that are slightly off get confident suggestions."""
+    index = garpr_seeds.RankingIndex(rankings('norcal'))
+    match = index.suggest(name)
+
+    assert match.value['name'] == expected
+    assert match.is_confident
+
+
+def test_no_suggestion_for_strangers():
+    """Names that aren't close to anybody don't get a suggestion."""
+    index = garpr_seeds.RankingIndex(rankings('norcal'))
+
+    assert index.suggest('BLAHBLAHBLAHBLAH') is None
@@ -0,0 +1,102 @@
+from os.path import dirname, abspath
+import pytest
+import random
+import sys
+import threading
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import garpr_seeds_challonge
+import write_executor
+
+
+class FakeParticipants(object):
+    """Reorders participants the way Challonge does when a seed changes."""
+
+    def __init__(self, order):
+        self.order = list(order)
+        self.num_updates = 0
+        self.lock = threading.Lock()
+
+    def update(self, tourney_name, participant_id, seed):
+        with self.lock:
+            self.num_updates += 1
+            self.order.remove(participant_id)
+            self.order.insert(seed - 1, participant_id)
+
+
+class FakeClient(object):
+    def __init__(self, order):
+        self.participants = FakeParticipants(order)
+
+
+def reseed(current_order, new_order):
+    """Reseeds a fake tourney concurrently and returns the fake client."""
+    client = FakeClient(current_order)
+    participants = {x: {'id': x, 'seed': i}
+                    for i, x in enumerate(current_order, 1)}
+    sorted_participants = [participants[x] for x in new_order]
+    writes = garpr_seeds_challonge._get_seed_writes('tourney',
+                                                    sorted_participants,
+                                                    client)
+    results = write_executor.WriteExecutor().run(writes)
+    write_executor.raise_for_failures(results)
+    return client
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_concurrent_seed_updates_reach_new_order(seed):
+    """Seed updates made concurrently still end up in the requested order."""
+    rng = random.Random(seed)
+    current_order = list(range(rng.randint(1, 40)))
+    rng.shuffle(current_order)
+    new_order = list(current_order)
+    rng.shuffle(new_order)
+
+    client = reseed(current_order, new_order)
+
+    assert client.participants.order == new_order
+
+
+def test_unchanged_seeds_are_not_updated():
+    """Participants already in the right spot aren't written."""
+    client = reseed(['a', 'b', 'c', 'd'], ['a', 'b', 'd', 'c'])
+
+    assert client.participants.order == ['a', 'b', 'd', 'c']
+    assert client.participants.num_updates == 1
+
+
+def test_light_reshuffle_only_moves_a_few_participants():
+    """Moving one participant costs one update, not one per participant."""
+    current_order = list(range(100))
+    new_order = list(current_order)
+    new_order.insert(10, new_order.pop(90))
+
+    client = reseed(current_order, new_order)
+
+    assert client.participants.order == new_order
+    assert client.participants.num_updates == 1
+
+
+def test_concurrent_requests_use_their_own_clients():
+    """Two TOs seeding at once each only write through their own client."""
+    orders = {'alice': ['a', 'b', 'c'], 'bob': ['x', 'y', 'z']}
+    clients = {name: FakeClient(order) for name, order in orders.items()}
+
+    def seed(name):
+        participants = [{'id': x, 'seed': i}
+                        for i, x in enumerate(orders[name], 1)]
+        garpr_seeds_challonge.update_seeds(
+            'https://challonge.com/' + name, participants[::-1],
+            client=clients[name])
+
+    threads = [threading.Thread(target=seed, args=(x,)) for x in orders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert clients['alice'].participants.order == ['c', 'b', 'a']
+    assert clients['bob'].participants.order == ['z', 'y', 'x']
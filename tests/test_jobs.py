@@ -0,0 +1,175 @@
+from os.path import dirname, abspath
+import pytest
+import sqlite3
+import sys
+import threading
+import time
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import jobs
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), num_workers=2)
+
+
+def test_job_reports_progress_and_result(job_queue):
+    def fn(progress):
+        progress('Updating seeds', 3, 10)
+        return ['Seeded!', 'success']
+
+    job_id = job_queue.submit('seed', 'tourney', fn, owner='alice')
+    job_queue.join()
+
+    job = job_queue.get(job_id)
+    assert job.state == jobs.SUCCEEDED
+    assert (job.status, job.num_done, job.num_total) == ('Updating seeds', 3, 10)
+    assert job.result == ['Seeded!', 'success']
+    assert job.owner == 'alice'
+
+
+def test_failed_job_records_error(job_queue):
+    def fn(progress):
+        raise ValueError('Invalid Challonge URL')
+
+    job_id = job_queue.submit('seed', 'tourney', fn)
+    job_queue.join()
+
+    job = job_queue.get(job_id)
+    assert job.state == jobs.FAILED
+    assert job.error == 'Invalid Challonge URL'
+
+
+def test_duplicate_submissions_are_coalesced(job_queue):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn(progress):
+        calls.append(True)
+        started.set()
+        release.wait(5)
+
+    first_id = job_queue.submit('seed', 'tourney', fn)
+    started.wait(5)
+    second_id = job_queue.submit('seed', 'tourney', fn)
+    other_id = job_queue.submit('amateur', 'tourney', lambda progress: None)
+    release.set()
+    job_queue.join()
+
+    assert first_id == second_id
+    assert other_id != first_id
+    assert len(calls) == 1
+
+    # Once the job's finished, submitting again starts a new job.
+    assert job_queue.submit('seed', 'tourney', fn) != first_id
+
+
+def test_submissions_with_other_settings_are_rejected(job_queue):
+    release = threading.Event()
+
+    first_id = job_queue.submit('seed', 'tourney',
+                                lambda progress: release.wait(5),
+                                settings={'shuffle': 'on'})
+    assert job_queue.submit('seed', 'tourney', lambda progress: None,
+                            settings={'shuffle': 'on'}) == first_id
+    with pytest.raises(jobs.JobConflictError) as err:
+        job_queue.submit('seed', 'tourney', lambda progress: None,
+                         settings={'shuffle': 'off'})
+    assert err.value.job_id == first_id
+    release.set()
+    job_queue.join()
+
+    # Once the job's finished, the other settings can be submitted.
+    assert job_queue.submit('seed', 'tourney', lambda progress: None,
+                            settings={'shuffle': 'off'}) != first_id
+
+
+def test_submissions_are_coalesced_across_processes(tmp_path):
+    """Web workers sharing a database never run the same job twice."""
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    first_queue = jobs.JobQueue(db_path, num_workers=1)
+    second_queue = jobs.JobQueue(db_path, num_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn(progress):
+        calls.append(True)
+        started.set()
+        release.wait(5)
+
+    first_id = first_queue.submit('seed', 'tourney', fn,
+                                  settings={'shuffle': 'on'})
+    started.wait(5)
+    assert second_queue.submit('seed', 'tourney', fn,
+                               settings={'shuffle': 'on'}) == first_id
+    with pytest.raises(jobs.JobConflictError):
+        second_queue.submit('seed', 'tourney', fn, settings={'shuffle': 'off'})
+    assert second_queue.get(first_id).state == jobs.RUNNING
+
+    release.set()
+    first_queue.join()
+    second_queue.join()
+    assert len(calls) == 1
+    assert second_queue.get(first_id).state == jobs.SUCCEEDED
+
+
+def test_lost_jobs_give_up_their_slot(tmp_path):
+    """A job left unfinished by a restart stops blocking once it's stale."""
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    release = threading.Event()
+    lost_queue = jobs.JobQueue(db_path, num_workers=1)
+    lost_id = lost_queue.submit('seed', 'tourney',
+                                lambda progress: release.wait(5))
+
+    job_queue = jobs.JobQueue(db_path, num_workers=1, stale_after=-1)
+    job_id = job_queue.submit('seed', 'tourney', lambda progress: 'Seeded!')
+    job_queue.join()
+
+    assert job_id != lost_id
+    assert job_queue.get(job_id).result == 'Seeded!'
+    release.set()
+
+
+def test_older_databases_are_migrated(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            'CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, '
+            'key TEXT NOT NULL, owner TEXT, state TEXT NOT NULL, status TEXT, '
+            'num_done INTEGER NOT NULL DEFAULT 0, '
+            'num_total INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, '
+            'created_at REAL NOT NULL, updated_at REAL NOT NULL)')
+        conn.execute(
+            "INSERT INTO jobs (id, kind, key, state, created_at, updated_at) "
+            "VALUES ('old', 'seed', 'tourney', 'running', ?, ?)",
+            (time.time(), time.time()))
+    conn.close()
+
+    job_queue = jobs.JobQueue(db_path, num_workers=1)
+    job_id = job_queue.submit('seed', 'tourney', lambda progress: None)
+    job_queue.join()
+
+    assert job_queue.get('old').state == jobs.FAILED
+    assert job_queue.get(job_id).state == jobs.SUCCEEDED
+
+
+def test_stuck_jobs_are_reported_as_failed(tmp_path):
+    release = threading.Event()
+    job_queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), num_workers=1,
+                              stale_after=-1)
+
+    job_id = job_queue.submit('seed', 'tourney',
+                              lambda progress: release.wait(5))
+
+    assert job_queue.get(job_id).state == jobs.FAILED
+    release.set()
+
+
+def test_unknown_job(job_queue):
+    assert job_queue.get('nope') is None
@@ -0,0 +1,103 @@
+from os.path import dirname, abspath
+import io
+import pytest
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import fake_challonge
+import garpr_seeds
+import metrics
+import util_challonge
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+def test_counter(registry):
+    counter = registry.counter('requests_total', 'Requests.', ('status',))
+    counter.inc(status=200)
+    counter.inc(2, status=200)
+    counter.inc(status=404)
+
+    assert counter.get(status=200) == 3
+    assert counter.get(status=500) == 0
+    assert registry.counter('requests_total', 'Requests.', ('status',)) \
+        is counter
+    with pytest.raises(ValueError):
+        counter.inc(method='GET')
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = registry.histogram('latency_seconds', 'Latency.',
+                                   ('endpoint',), buckets=(0.1, 1))
+    histogram.observe(0.05, endpoint='a"b')
+    histogram.observe(0.5, endpoint='a"b')
+    histogram.observe(5, endpoint='a"b')
+
+    assert histogram.get(endpoint='a"b') == (3, 5.55)
+    assert registry.render().splitlines() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{endpoint="a\\"b",le="0.1"} 1',
+        'latency_seconds_bucket{endpoint="a\\"b",le="1"} 2',
+        'latency_seconds_bucket{endpoint="a\\"b",le="+Inf"} 3',
+        'latency_seconds_sum{endpoint="a\\"b"} 5.55',
+        'latency_seconds_count{endpoint="a\\"b"} 3',
+    ]
+
+
+def test_timed_operation_records_errors():
+    @metrics.timed_operation('test_fail')
+    def fail():
+        raise KeyError()
+
+    with pytest.raises(KeyError):
+        fail()
+    assert metrics.OPERATION_SECONDS.get(
+        operation='test_fail', result='KeyError')[0] == 1
+
+
+def test_ranking_lookups_are_counted():
+    found = garpr_seeds.LOOKUPS.get(result='found')
+    unknown = garpr_seeds.LOOKUPS.get(result='unknown')
+
+    index = garpr_seeds.RankingIndex([{'name': 'gaR', 'rank': 1}])
+    index.get_ranks(['gaR', 'Nobody', 'Someone'])
+
+    assert garpr_seeds.LOOKUPS.get(result='found') == found + 1
+    assert garpr_seeds.LOOKUPS.get(result='unknown') == unknown + 2
+
+
+def test_challonge_requests_and_retries_are_counted():
+    endpoint = 'tournaments/:tournament/participants'
+    labels = {'method': 'GET', 'endpoint': endpoint}
+    num_ok = util_challonge.REQUESTS.get(status=200, **labels)
+    num_throttled = util_challonge.REQUESTS.get(status=429, **labels)
+    num_retries = util_challonge.RETRIES.get(reason=429, **labels)
+    num_timed = util_challonge.REQUEST_SECONDS.get(**labels)[0]
+
+    with fake_challonge.FakeChallongeServer() as server:
+        server.challonge.create_tournament('Melee 72', 'melee72')
+        server.fail_next(429)
+        server.get_client(backoff=0.01).participants.index('melee72')
+
+    assert util_challonge.REQUESTS.get(status=200, **labels) == num_ok + 1
+    assert util_challonge.REQUESTS.get(status=429, **labels) == \
+        num_throttled + 1
+    assert util_challonge.RETRIES.get(reason=429, **labels) == num_retries + 1
+    assert util_challonge.REQUEST_SECONDS.get(**labels)[0] == num_timed + 2
+
+    rendered = metrics.render()
+    assert ('challonge_requests_total{method="GET",endpoint="%s",'
+            'status="200"}' % endpoint) in rendered
+
+
+def test_print_summary():
+    output = io.StringIO()
+    metrics.print_summary(output)
+    assert output.getvalue().startswith('Request stats:\n')
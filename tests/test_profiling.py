@@ -0,0 +1,65 @@
+from os.path import dirname, abspath
+import pstats
+import pytest
+import sys
+import threading
+import time
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import profiling
+
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_cprofile_hot_spots(tmpdir):
+    path = str(tmpdir.join('run.prof'))
+    profiled = profiling.profiled(busy_work, path, log=lambda x: None)
+    profiled(0.05)
+
+    stats = pstats.Stats(path)
+    assert any(func[2] == 'busy_work' for func in stats.stats)
+
+    profiler = profiling.Profiler()
+    with profiler:
+        busy_work(0.05)
+    name, seconds = profiler.get_hot_spots(1)[0]
+    assert name.startswith('busy_work (test_profiling.py:')
+    assert seconds >= 0.04
+    assert 'busy_work' in profiler.format_summary()
+
+
+def test_sampling_sees_other_threads(tmpdir):
+    path = str(tmpdir.join('run.folded'))
+    profiler = profiling.Profiler(profiling.SAMPLE, interval=0.002)
+    with profiler:
+        thread = threading.Thread(target=busy_work, args=(0.1,),
+                                  name='worker')
+        thread.start()
+        thread.join()
+    profiler.save(path)
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert any(x.startswith('worker;') and 'busy_work' in x for x in lines)
+    assert any('busy_work' in name for name, _ in profiler.get_hot_spots(1000))
+
+
+def test_get_profile_path():
+    path = profiling.get_profile_path('profiles', 'main', profiling.SAMPLE)
+    assert path.startswith('profiles/main-')
+    assert path.endswith('.folded')
+    assert profiling.get_profile_path('.', 'main').endswith('.prof')
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        profiling.Profiler('perf')
@@ -0,0 +1,131 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from os.path import dirname, abspath
+import pytest
+import sys
+import threading
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import ranking_cache
+
+
+class RankingsHandler(BaseHTTPRequestHandler):
+    """Serves a rankings body with an ETag, counting full downloads."""
+
+    body = b'{"ranking": []}'
+    etag = '"v1"'
+    # Whether to hang up after sending the body, before the promised length.
+    truncate = False
+    downloads = 0
+    not_modified = 0
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.etag:
+            RankingsHandler.not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        RankingsHandler.downloads += 1
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        length = len(self.body) * (2 if self.truncate else 1)
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    RankingsHandler.body = b'{"ranking": []}'
+    RankingsHandler.etag = '"v1"'
+    RankingsHandler.truncate = False
+    RankingsHandler.downloads = 0
+    RankingsHandler.not_modified = 0
+    httpd = HTTPServer(('127.0.0.1', 0), RankingsHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}/rankings'.format(httpd.server_port)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fresh_entry_is_served_from_disk(tmpdir, server):
+    """Rankings within the TTL aren't downloaded again."""
+    cache = ranking_cache.RankingCache(cache_dir=str(tmpdir), ttl=60)
+
+    assert cache.fetch('garpr', 'norcal', server) == '{"ranking": []}'
+    assert cache.fetch('garpr', 'norcal', server) == '{"ranking": []}'
+    assert RankingsHandler.downloads == 1
+
+
+def test_stale_entry_is_revalidated(tmpdir, server):
+    """Expired rankings are revalidated with their ETag."""
+    cache = ranking_cache.RankingCache(cache_dir=str(tmpdir), ttl=0)
+
+    cache.fetch('garpr', 'norcal', server)
+    assert cache.fetch('garpr', 'norcal', server) == '{"ranking": []}'
+    assert RankingsHandler.downloads == 1
+    assert RankingsHandler.not_modified == 1
+
+
+def test_stale_entry_is_used_when_site_is_down(tmpdir, server):
+    """The cached copy is used if the ranking site can't be reached."""
+    cache = ranking_cache.RankingCache(cache_dir=str(tmpdir), ttl=0, timeout=1)
+    cache.fetch('garpr', 'norcal', server)
+
+    down_url = 'http://127.0.0.1:9/rankings'
+    assert cache.fetch('garpr', 'norcal', down_url) == '{"ranking": []}'
+
+
+def test_offline_without_cached_copy(tmpdir, server):
+    """Running offline with nothing cached is an error."""
+    cache = ranking_cache.RankingCache(cache_dir=str(tmpdir), offline=True)
+
+    with pytest.raises(ranking_cache.RankingsUnavailableError):
+        cache.fetch('garpr', 'norcal', server)
+    assert RankingsHandler.downloads == 0
+
+
+def test_partial_download_is_never_mixed_with_cached_copy(tmpdir, server):
+    """A download that fails partway isn't spliced onto the cached copy."""
+    cache = ranking_cache.RankingCache(cache_dir=str(tmpdir), ttl=0)
+    RankingsHandler.body = ''.join(
+        'old {}\n'.format(i) for i in range(200)).encode()
+    old_body = cache.fetch('braacket', 'norcal', server)
+
+    RankingsHandler.body = ''.join(
+        'new {}\n'.format(i) for i in range(200)).encode()
+    RankingsHandler.etag = '"v2"'
+    RankingsHandler.truncate = True
+    lines = []
+    with pytest.raises(ranking_cache.RankingsUnavailableError):
+        for line in cache.iter_lines('braacket', 'norcal', server):
+            lines.append(line)
+    assert lines
+    assert all(x.startswith('new ') for x in lines)
+
+    # Buffered reads fall back to the whole cached copy instead.
+    assert cache.fetch('braacket', 'norcal', server) == old_body
+
+
+def test_snapshot_is_cached_whole(tmpdir):
+    """Rankings downloaded in several parts are cached and served as one."""
+    cache = ranking_cache.RankingCache(cache_dir=str(tmpdir), ttl=60)
+    downloads = []
+
+    def download():
+        downloads.append(1)
+        yield 'page 1'
+        yield 'page 2'
+
+    for _ in range(2):
+        lines = cache.iter_snapshot_lines('braacket', 'norcal', download)
+        assert list(lines) == ['page 1', 'page 2']
+    assert len(downloads) == 1
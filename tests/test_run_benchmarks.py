@@ -0,0 +1,35 @@
+from os.path import dirname, abspath, join
+import sys
+
+# Add the benchmarks directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(join(dirname(CWD), 'benchmarks'))
+
+import run_benchmarks
+
+
+def baseline(**medians):
+    return {'results': {k: {'min': v, 'median': v, 'peak_bytes': 0}
+                        for k, v in medians.items()}}
+
+
+def test_compare():
+    old = baseline(a=1.0, b=1.0, c=1.0, gone=1.0)
+    new = baseline(a=2.0, b=0.5, c=1.1, added=1.0)
+
+    assert run_benchmarks.compare(old, new, threshold=0.25) == [
+        ('a', 1.0, 2.0, 2.0, 'regression'),
+        ('b', 1.0, 0.5, 0.5, 'improvement'),
+        ('c', 1.0, 1.1, 1.1, 'same'),
+    ]
+
+
+def test_quick_run_records_every_size():
+    current = run_benchmarks.run_benchmarks(name_filter='ranks_to_seeds',
+                                            quick=True, repeat=1)
+
+    assert list(current['results']) == ['ranks_to_seeds[8]',
+                                         'ranks_to_seeds[64]']
+    for result in current['results'].values():
+        assert 0 <= result['min'] <= result['median']
+        assert result['peak_bytes'] > 0
@@ -0,0 +1,42 @@
+from os.path import dirname, abspath
+import pytest
+import random
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import seed_moves
+
+
+@pytest.mark.parametrize('current, new, num_moves', [
+    ([], [], 0),
+    ([1, 2, 3], [1, 2, 3], 0),
+    ([1, 2, 3, 4], [4, 1, 2, 3], 1),
+    ([1, 2, 3, 4], [2, 1, 4, 3], 2),
+    ([1, 2, 3, 4], [4, 3, 2, 1], 3),
+])
+def test_plan_uses_fewest_moves(current, new, num_moves):
+    """Everyone in the longest increasing subsequence stays put."""
+    moves = seed_moves.plan_seed_moves(current, new)
+
+    assert len(moves) == num_moves
+    assert seed_moves.apply_seed_moves(current, moves) == new
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_plan_reaches_new_order(seed):
+    """Making the planned moves gives everyone their new seed."""
+    rng = random.Random(seed)
+    current = list(range(rng.randint(1, 50)))
+    new = rng.sample(current, len(current))
+
+    moves = seed_moves.plan_seed_moves(current, new)
+
+    assert seed_moves.apply_seed_moves(current, moves) == new
+
+
+def test_plan_rejects_different_participants():
+    with pytest.raises(ValueError):
+        seed_moves.plan_seed_moves([1, 2], [1, 3])
@@ -0,0 +1,70 @@
+from os.path import dirname, abspath
+import requests
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import seed_penalties
+
+
+class FakeResource(object):
+    def __init__(self, by_tourney):
+        self.by_tourney = by_tourney
+
+    def index(self, tourney_name):
+        if tourney_name not in self.by_tourney:
+            response = requests.models.Response()
+            response.status_code = 404
+            raise requests.exceptions.HTTPError(response=response)
+        return self.by_tourney[tourney_name]
+
+
+class FakeClient(object):
+    def __init__(self, participants, matches):
+        self.participants = FakeResource(participants)
+        self.matches = FakeResource(matches)
+
+
+def test_read_avoid_file(tmpdir):
+    path = tmpdir.join('avoid.txt')
+    path.write('# Crews\nNeal, Bryan,Paragon\n\ngaR, Eden  # carpool\n')
+
+    assert seed_penalties.read_avoid_file(str(path)) == \
+        [['Neal', 'Bryan', 'Paragon'], ['gaR', 'Eden']]
+
+
+def test_get_previous_tourney_names():
+    assert seed_penalties.get_previous_tourney_names('mtvmelee72', 2) == \
+        ['mtvmelee71', 'mtvmelee70']
+    assert seed_penalties.get_previous_tourney_names('mtvmelee1', 3) == \
+        ['mtvmelee0']
+    assert seed_penalties.get_previous_tourney_names('mtvmelee', 3) == []
+
+
+def test_get_head_to_heads_skips_missing_tourneys():
+    participants = {'melee71': [{'id': 1, 'display_name': 'Neal'},
+                                {'id': 2, 'display_name': 'Bryan'},
+                                {'id': 3, 'display_name': 'Eden'}]}
+    matches = {'melee71': [{'player1_id': 1, 'player2_id': 2},
+                           {'player1_id': 3, 'player2_id': None}]}
+    client = FakeClient(participants, matches)
+
+    assert seed_penalties.get_head_to_heads(['melee71', 'melee70'],
+                                            client) == [('Neal', 'Bryan')]
+
+
+def test_get_penalties():
+    names = ['Neal', 'Bryan', 'Paragon', 'gaR']
+    penalties = seed_penalties.get_penalties(
+        names,
+        groups=[['neal', 'Paragon '], ['Nobody', 'gaR']],
+        head_to_heads=[('Neal', 'Paragon'), ('gaR', 'Bryan'),
+                       ('Bryan', 'gaR')],
+        recent_penalty=2)
+
+    assert penalties == [[0, 0, 3, 0],
+                         [0, 0, 0, 4],
+                         [3, 0, 0, 0],
+                         [0, 4, 0, 0]]
@@ -0,0 +1,84 @@
+from os.path import dirname, abspath
+import numpy as np
+import pytest
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import shuffle_seeds
+
+
+@pytest.mark.parametrize('num_participants', [0, 1, 5, 9, 24, 100])
+def test_batch_seedings_stay_in_their_buckets(num_participants):
+    seedings = shuffle_seeds.get_shuffled_seeds_batch(num_participants, 50,
+                                                      rng=1)
+
+    assert seedings.shape == (50, num_participants)
+    buckets = reversed(list(shuffle_seeds._get_buckets(num_participants)))
+    start = 0
+    for bucket in buckets:
+        end = start + len(bucket)
+        for seeding in seedings:
+            assert sorted(seeding[start:end]) == bucket
+        start = end
+
+
+def test_batch_seedings_are_reproducible():
+    first = shuffle_seeds.get_shuffled_seeds_batch(64, 10, rng=1500)
+    second = shuffle_seeds.get_shuffled_seeds_batch(64, 10, rng=1500)
+
+    assert np.array_equal(first, second)
+
+
+def test_parallel_streams_are_independent_and_reproducible():
+    rngs = shuffle_seeds.get_rngs(1500, 2)
+    first, second = [shuffle_seeds.get_shuffled_seeds_batch(64, 10, rng=x)
+                     for x in rngs]
+    again = shuffle_seeds.get_shuffled_seeds_batch(
+        64, 10, rng=shuffle_seeds.get_rngs(1500, 2)[0])
+
+    assert not np.array_equal(first, second)
+    assert np.array_equal(first, again)
+
+
+def get_first_round_penalty(seeds, penalties):
+    """Adds up the penalties of the first round's matches of a seeding."""
+    order = [0] * len(seeds)
+    for i, seed in enumerate(seeds):
+        order[seed - 1] = i
+    opponents = shuffle_seeds._get_first_round_opponents(len(seeds))
+    return sum(penalties[order[x]][order[y]] for x, y in enumerate(opponents)
+               if y is not None) / 2
+
+
+@pytest.mark.parametrize('num_participants', [1, 2, 5, 9, 24, 100])
+def test_optimized_seeds_stay_in_their_buckets(num_participants):
+    penalties = np.ones((num_participants, num_participants))
+    seeds = shuffle_seeds.get_optimized_seeds(penalties, time_budget=0.05,
+                                              rng=1)
+
+    for bucket in shuffle_seeds._get_buckets(num_participants):
+        assert sorted(seeds[x - 1] for x in bucket) == bucket
+
+
+def test_optimized_seeds_avoid_penalized_matchups():
+    num_participants = 512
+    rng = np.random.default_rng(1)
+    penalties = np.triu(rng.random((num_participants, num_participants)) < 0.1,
+                        1).astype(float)
+    penalties += penalties.T
+
+    shuffled = shuffle_seeds.get_shuffled_seeds(num_participants)
+    optimized = shuffle_seeds.get_optimized_seeds(penalties, time_budget=1,
+                                                  rng=1)
+
+    assert get_first_round_penalty(shuffled, penalties) > 0
+    assert get_first_round_penalty(optimized, penalties) == 0
+
+
+def test_optimized_seeds_are_reproducible():
+    penalties = np.ones((40, 40))
+    assert shuffle_seeds.get_optimized_seeds(penalties, 0.01, rng=3) == \
+        shuffle_seeds.get_optimized_seeds(penalties, 0.01, rng=3)
@@ -0,0 +1,94 @@
+from os.path import dirname, abspath
+import pytest
+import sys
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import async_challonge
+import fake_challonge
+import garpr_seeds_challonge
+import tracing
+
+
+@pytest.fixture
+def trace_path(tmpdir):
+    path = str(tmpdir.join('trace.jsonl'))
+    tracing.configure(path)
+    yield path
+    tracing.configure(None)
+
+
+def get_spans(path):
+    traces = tracing.read_spans(path)
+    assert len(traces) == 1
+    return {x['name']: x for x in next(iter(traces.values()))}
+
+
+def test_spans_nest(trace_path):
+    with tracing.span('run', tourney='melee72') as span:
+        with tracing.span('fetch'):
+            pass
+        with pytest.raises(KeyError):
+            with tracing.span('compute'):
+                raise KeyError()
+        span.set(num_participants=4)
+
+    spans = get_spans(trace_path)
+    assert spans['run']['parent_id'] is None
+    assert spans['run']['attributes'] == {'tourney': 'melee72',
+                                          'num_participants': 4}
+    assert spans['fetch']['parent_id'] == spans['run']['span_id']
+    assert spans['compute']['parent_id'] == spans['run']['span_id']
+    assert spans['compute']['error'] == 'KeyError'
+    assert spans['run']['duration'] >= spans['fetch']['duration']
+
+
+def test_spans_follow_async_and_threads(trace_path):
+    def work():
+        with tracing.span('blocking'):
+            pass
+
+    @tracing.traced('root')
+    async def run():
+        await async_challonge.run_blocking(work)
+
+    async_challonge.run(run())
+
+    spans = get_spans(trace_path)
+    assert spans['blocking']['parent_id'] == spans['root']['span_id']
+    assert spans['blocking']['thread'] != spans['root']['thread']
+
+
+def test_nothing_is_recorded_when_off():
+    with tracing.span('run') as span:
+        span.set(num_participants=4)
+    assert span is tracing._NOOP_SPAN
+
+
+def test_update_seeds_phases(trace_path):
+    with fake_challonge.FakeChallongeServer() as server:
+        server.challonge.create_tournament('Melee 72', 'melee72')
+        for name in ['a', 'b', 'c', 'd']:
+            server.challonge.add_participant('melee72', name)
+        client = server.get_client()
+        participants = client.participants.index('melee72')
+
+        garpr_seeds_challonge.update_seeds(
+            'https://challonge.com/melee72', participants[::-1], client=client)
+
+    # The last run is the update, after reading the participants.
+    spans = list(tracing.read_spans(trace_path).values())[-1]
+    by_id = {x['span_id']: x for x in spans}
+    writes = [x for x in spans if x['name'] == 'challonge_request']
+    assert len(writes) == 3
+    for write in writes:
+        assert by_id[write['parent_id']]['name'] == 'write_seeds'
+    write_seeds = [x for x in spans if x['name'] == 'write_seeds'][0]
+    assert write_seeds['attributes'] == {'num_writes': 3, 'num_failed': 0}
+
+    timeline = tracing.format_timeline(spans)
+    assert timeline[0].startswith('update_seeds ')
+    assert timeline[1].startswith('  plan_seed_moves ')
+    assert tracing.get_slowest_spans(spans, 1)[0]['name'] == 'update_seeds'
@@ -1,11 +1,15 @@
+import email.message
+import json
 from os.path import dirname, abspath
 import pytest
+import requests
 import sys
 
 # Add the parent directory to the path
 CWD = dirname(abspath(__file__))
 sys.path.append(dirname(CWD))
 
+import challonge_cache
 import util_challonge
 
 
@@ -26,3 +30,162 @@ def test_extract_tourney_name(url, expected):
     except ValueError as e:
         if expected != ValueError:
             raise e
+
+
+class FakeSession(object):
+    """Replays canned responses instead of talking to Challonge."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        status_code, body, headers = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode()
+        response.headers.update(headers)
+        response.url = url
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(util_challonge.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_client_retries_transient_errors(sleeps):
+    """5xxs and 429s are retried, honoring Retry-After."""
+    session = FakeSession([
+        (503, {}, {}),
+        (429, {}, {'Retry-After': '7'}),
+        (200, [{'participant': {'id': 1}}], {}),
+    ])
+    client = util_challonge.ChallongeClient('user', 'key', session=session)
+
+    assert client.participants.index('mtvmelee82') == [{'id': 1}]
+    assert len(session.requests) == 3
+    assert sleeps[1] == 7
+
+
+def test_client_does_not_retry_failed_creates(sleeps):
+    """Non-idempotent requests aren't retried after a server error."""
+    session = FakeSession([(500, {}, {}), (200, {}, {})])
+    client = util_challonge.ChallongeClient('user', 'key', session=session)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.participants.create('mtvmelee82', 'Mango', seed=1)
+    assert len(session.requests) == 1
+
+
+def test_client_nests_params():
+    """Params are nested under the resource they describe."""
+    session = FakeSession([(200, [], {})])
+    client = util_challonge.ChallongeClient('user', 'key', session=session)
+    client.participants.bulk_add('mtvmelee82', ['Mango', 'Armada'])
+
+    method, url, kwargs = session.requests[0]
+    assert method == 'POST'
+    assert url.endswith('/tournaments/mtvmelee82/participants/bulk_add.json')
+    assert kwargs['data'] == [('participants[][name]', 'Mango'),
+                              ('participants[][name]', 'Armada')]
+
+
+def test_shared_session_keeps_no_cookies():
+    """Cookies from one user's responses are never sent for another user."""
+    session = util_challonge.create_session()
+    headers = email.message.Message()
+    headers['Set-Cookie'] = 'user=alice; Path=/'
+    request = requests.Request(
+        'GET', 'https://api.challonge.com/v1/tournaments.json').prepare()
+    session.cookies.extract_cookies(requests.cookies.MockResponse(headers),
+                                    requests.cookies.MockRequest(request))
+
+    assert not session.cookies
+
+
+def test_cached_reads_are_not_sent_again():
+    session = FakeSession([(200, {'tournament': {'id': 1}}, {})])
+    cache = challonge_cache.ChallongeCache()
+    client = util_challonge.ChallongeClient('user', 'key', session=session,
+                                            cache=cache)
+
+    assert client.tournaments.show('mtvmelee82') == {'id': 1}
+    assert client.tournaments.show('mtvmelee82') == {'id': 1}
+    assert len(session.requests) == 1
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_missing_tournaments_are_cached():
+    session = FakeSession([(404, {}, {})])
+    cache = challonge_cache.ChallongeCache()
+    client = util_challonge.ChallongeClient('user', 'key', session=session,
+                                            cache=cache)
+
+    assert util_challonge.get_tourney_info('mtvmelee82_amateur', client) is None
+    assert util_challonge.get_tourney_info('mtvmelee82_amateur', client) is None
+    assert len(session.requests) == 1
+
+
+def test_writes_invalidate_cached_reads():
+    session = FakeSession([
+        (404, {}, {}),
+        (200, [{'participant': {'id': 1}}], {}),
+        (200, {'tournament': {'id': 2}}, {}),
+        (200, {'tournament': {'id': 2}}, {}),
+        (200, {'participant': {'id': 1, 'seed': 2}}, {}),
+        (200, [{'participant': {'id': 1, 'seed': 2}}], {}),
+    ])
+    cache = challonge_cache.ChallongeCache()
+    client = util_challonge.ChallongeClient('user', 'key', session=session,
+                                            cache=cache)
+
+    # Creating a tournament forgets that it didn't exist.
+    assert util_challonge.get_tourney_info('mtv-melee82', client) is None
+    client.participants.index('mtvmelee82')
+    client.tournaments.create('Melee 82', 'melee82', subdomain='mtv')
+    assert util_challonge.get_tourney_info('mtv-melee82', client) == {'id': 2}
+
+    # Updating a participant forgets the participants list, but nothing
+    # about other tournaments.
+    client.participants.update('mtvmelee82', 1, seed=2)
+    client.tournaments.show('mtv-melee82')
+    assert client.participants.index('mtvmelee82') == [{'id': 1, 'seed': 2}]
+    assert len(session.requests) == 6
+
+
+def test_cached_reads_are_scoped_by_credentials():
+    cache = challonge_cache.ChallongeCache()
+    alice_session = FakeSession([(200, {'tournament': {'id': 1}}, {})])
+    bob_session = FakeSession([(401, {}, {})])
+    alice = util_challonge.ChallongeClient('alice', 'key', session=alice_session,
+                                           cache=cache)
+    bob = util_challonge.ChallongeClient('bob', 'key', session=bob_session,
+                                         cache=cache)
+
+    alice.tournaments.show('mtvmelee82')
+    with pytest.raises(requests.exceptions.HTTPError):
+        bob.tournaments.show('mtvmelee82')
+
+
+def test_writes_invalidate_other_clients_reads():
+    cache = challonge_cache.ChallongeCache()
+    alice_session = FakeSession([
+        (200, [{'participant': {'id': 1, 'seed': 1}}], {}),
+        (200, [{'participant': {'id': 1, 'seed': 2}}], {}),
+    ])
+    bob_session = FakeSession([(200, {'participant': {'id': 1, 'seed': 2}}, {})])
+    alice = util_challonge.ChallongeClient('alice', 'key', session=alice_session,
+                                           cache=cache)
+    bob = util_challonge.ChallongeClient('bob', 'key', session=bob_session,
+                                         cache=cache)
+
+    assert alice.participants.index('mtvmelee82') == [{'id': 1, 'seed': 1}]
+    bob.participants.update('mtvmelee82', 1, seed=2)
+
+    # Alice sees Bob's reseed instead of her stale read.
+    assert alice.participants.index('mtvmelee82') == [{'id': 1, 'seed': 2}]
+    assert len(alice_session.requests) == 2
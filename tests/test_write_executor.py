@@ -0,0 +1,67 @@
+from os.path import dirname, abspath
+import pytest
+import requests
+import sys
+import threading
+
+# Add the parent directory to the path
+CWD = dirname(abspath(__file__))
+sys.path.append(dirname(CWD))
+
+import write_executor
+from write_executor import Write
+
+
+def test_writes_wait_for_their_dependencies():
+    """A write never starts before the writes it depends on finish."""
+    finished = []
+    lock = threading.Lock()
+
+    def record(i):
+        with lock:
+            finished.append(i)
+
+    writes = [
+        Write(record, (0,), {}, ()),
+        Write(record, (1,), {}, ()),
+        Write(record, (2,), {}, (0, 1)),
+        Write(record, (3,), {}, (2,)),
+    ]
+    results = write_executor.WriteExecutor(max_workers=4).run(writes)
+
+    assert all(x.error is None for x in results)
+    assert finished.index(2) > max(finished.index(0), finished.index(1))
+    assert finished[-1] == 3
+
+
+def test_failures_only_skip_dependent_writes():
+    """A failed write skips its dependents, but the rest of the batch runs."""
+    def fail():
+        raise ValueError('nope')
+
+    writes = [
+        Write(fail, (), {}, ()),
+        Write(lambda: 'ok', (), {}, ()),
+        Write(lambda: 'skipped', (), {}, (0,)),
+    ]
+    results = write_executor.WriteExecutor().run(writes)
+
+    assert isinstance(results[0].error, ValueError)
+    assert results[1].value == 'ok'
+    assert isinstance(results[2].error, write_executor.DependencyFailedError)
+    with pytest.raises(write_executor.BatchWriteError) as err:
+        write_executor.raise_for_failures(results)
+    assert len(err.value.failures) == 2
+
+
+def test_concurrency_backs_off_when_throttled():
+    """Being throttled halves the number of writes in flight."""
+    def throttled():
+        response = requests.Response()
+        response.status_code = 429
+        raise requests.exceptions.HTTPError(response=response)
+
+    executor = write_executor.WriteExecutor(max_workers=8)
+    executor.run([Write(throttled, (), {}, ())])
+
+    assert executor.concurrency == 4
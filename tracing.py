@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+
+"""Records how long each phase of a run takes.
+
+Phases are wrapped in spans, e.g. fetching the rankings or writing the new
+seeds, and spans started inside another span are its children. When tracing
+is on, each span is appended to a JSON-lines trace file as it finishes. The
+span started while no other span is open is a run's root, and every span under
+it shares its trace ID.
+
+Tracing is off unless a trace file is set with --trace, configure, or the
+CHALLONGE_TOOLS_TRACE_FILE environment variable.
+
+Render the most recent run in a trace file, as a timeline followed by its
+slowest spans, with:
+
+  python tracing.py trace.jsonl
+
+Pass --list to see every run in the file, and --trace_id to pick one.
+"""
+
+
+import argparse
+import atexit
+import collections
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+
+# Where spans are written if configure isn't called.
+TRACE_FILE_ENV_VAR = "CHALLONGE_TOOLS_TRACE_FILE"
+
+# The span that new spans are children of.
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Where finished spans are written, or None if tracing is off.
+_exporter = None
+
+
+class _JsonLinesExporter(object):
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Span(object):
+    """A timed phase of a run. Use it as a context manager."""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = None
+        self._token = None
+        self._start = None
+        self._start_counter = None
+
+    def set(self, **attributes):
+        """Adds attributes to the span, e.g. counts that are known later."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is None:
+            self.trace_id = uuid.uuid4().hex
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        self._token = _current_span.set(self)
+        self._start = time.time()
+        self._start_counter = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._start_counter
+        _current_span.reset(self._token)
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export({
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "start": self._start,
+                "duration": duration,
+                "thread": threading.current_thread().name,
+                "attributes": self.attributes,
+                "error": None if exc_type is None else exc_type.__name__,
+            })
+        return False
+
+
+class _NoopSpan(object):
+    """Stands in for a Span when tracing is off."""
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attributes):
+    """Starts a span, as a child of the current span if there is one.
+
+    e.g.
+
+      with tracing.span("fetch_rankings", league=league) as span:
+          rankings = ...
+          span.set(ranking_size=len(rankings))
+
+    Args:
+      name: The name of the phase.
+      attributes: JSON-serializable details about the phase, e.g. how many
+                  participants it handled.
+
+    Returns:
+      A context manager that times the span and yields it.
+    """
+    if _exporter is None:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name):
+    """Decorates a function or coroutine function to run inside a span.
+
+    Args:
+      name: The name of the span.
+    """
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def wrap_context(fn):
+    """Wraps a function to run in the current context, e.g. in another thread.
+
+    Spans started by the function are then children of the current span.
+
+    Args:
+      fn: The function to wrap.
+
+    Returns:
+      A function that calls fn with the same arguments.
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def configure(path):
+    """Turns tracing on or off.
+
+    Args:
+      path: The JSON-lines file to append spans to, or None to turn tracing
+            off.
+    """
+    global _exporter
+    if _exporter is not None:
+        _exporter.close()
+    _exporter = _JsonLinesExporter(path) if path else None
+
+
+@atexit.register
+def _close():
+    configure(None)
+
+
+configure(os.environ.get(TRACE_FILE_ENV_VAR))
+
+
+def add_arguments(argparser):
+    """Adds the --trace flag to a CLI.
+
+    Args:
+      argparser: The argparse.ArgumentParser to add the flag to.
+    """
+    argparser.add_argument(
+        "--trace",
+        default=os.environ.get(TRACE_FILE_ENV_VAR),
+        help="a JSON-lines file to record how long each phase took in. "
+        "Render it with tracing.py",
+    )
+
+
+def from_args(args):
+    """Sets up what the flags added by add_arguments ask for.
+
+    If tracing is on, the rest of the run is traced under a root span named
+    after the script, so everything the CLI does shares one trace.
+
+    Args:
+      args: The parsed argparse arguments.
+    """
+    configure(args.trace)
+    if _exporter is not None:
+        name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        root = span(name, argv=sys.argv[1:]).__enter__()
+        atexit.register(root.__exit__, None, None, None)
+
+
+def read_spans(path):
+    """Reads the spans from a trace file.
+
+    Args:
+      path: The path of the JSON-lines trace file.
+
+    Returns:
+      An OrderedDict from each trace ID to its spans, in the order their runs
+      finished.
+    """
+    traces = collections.OrderedDict()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                traces.setdefault(record["trace_id"], []).append(record)
+    return traces
+
+
+def _format_attributes(attributes):
+    return " ".join("{0}={1}".format(k, v) for k, v in sorted(attributes.items()))
+
+
+def format_timeline(spans, width=40):
+    """Renders a run's spans as an indented timeline.
+
+    Args:
+      spans: The spans of one trace, from read_spans.
+      width: How many characters wide the bars are.
+
+    Returns:
+      A list of lines, with children under their parents in start order.
+    """
+    if not spans:
+        return []
+
+    start = min(x["start"] for x in spans)
+    end = max(x["start"] + x["duration"] for x in spans)
+    scale = width / max(end - start, 1e-9)
+
+    span_ids = set(x["span_id"] for x in spans)
+    children = collections.defaultdict(list)
+    for x in spans:
+        parent_id = x["parent_id"] if x["parent_id"] in span_ids else None
+        children[parent_id].append(x)
+
+    lines = []
+
+    def add_lines(parent_id, depth):
+        for x in sorted(children[parent_id], key=lambda x: x["start"]):
+            offset = int((x["start"] - start) * scale)
+            length = max(1, int(x["duration"] * scale))
+            bar = " " * offset + "#" * length
+            label = "  " * depth + x["name"]
+            if x["error"]:
+                label += " !" + x["error"]
+            lines.append("{0:<{1}} {2:>9.1f}ms {3:>7.1f}ms  {4:<{5}}  {6}".format(
+                label, 36, 1000 * (x["start"] - start), 1000 * x["duration"],
+                bar, width, _format_attributes(x["attributes"])).rstrip())
+            add_lines(x["span_id"], depth + 1)
+
+    add_lines(None, 0)
+    return lines
+
+
+def get_slowest_spans(spans, num_spans=10):
+    """Gets the spans of a run that took the longest.
+
+    Args:
+      spans: The spans of one trace, from read_spans.
+      num_spans: How many spans to get.
+
+    Returns:
+      A list of spans, slowest first.
+    """
+    return sorted(spans, key=lambda x: x["duration"], reverse=True)[:num_spans]
+
+
+def _get_root(spans):
+    span_ids = set(x["span_id"] for x in spans)
+    roots = [x for x in spans if x["parent_id"] not in span_ids]
+    return max(roots, key=lambda x: x["duration"])
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="Renders the timeline of a run from a trace file.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    argparser.add_argument("trace_file", help="the JSON-lines trace file")
+    argparser.add_argument(
+        "--trace_id",
+        default=None,
+        help="the run to render. Defaults to the most recent run",
+    )
+    argparser.add_argument(
+        "--list", action="store_true", help="list the runs in the file instead"
+    )
+    argparser.add_argument(
+        "--top", type=int, default=10, help="how many of the slowest spans to show"
+    )
+    args = argparser.parse_args()
+
+    traces = read_spans(args.trace_file)
+    if args.list:
+        for trace_id, spans in traces.items():
+            root = _get_root(spans)
+            print("{0}  {1}  {2:<24} {3:>9.1f}ms  {4} spans".format(
+                trace_id, time.ctime(root["start"]), root["name"],
+                1000 * root["duration"], len(spans)))
+    else:
+        if args.trace_id:
+            spans = traces[args.trace_id]
+        elif traces:
+            spans = next(reversed(traces.values()))
+        else:
+            spans = []
+
+        for line in format_timeline(spans):
+            print(line)
+        print()
+        print("Slowest spans:")
+        for x in get_slowest_spans(spans, args.top):
+            print("  {0:>9.1f}ms  {1:<28} {2}".format(
+                1000 * x["duration"], x["name"],
+                _format_attributes(x["attributes"])).rstrip())
@@ -4,13 +4,479 @@
 """Various common utility functions that interact with Challonge."""
 
 
-import challonge
+import email.utils
+import hashlib
+import http.cookiejar
+import os
+import random
 import re
+import requests
+import requests.adapters
 import requests.exceptions
+import threading
+import time
 
+import metrics
+import tracing
 from parse_challonge_credentials import safe_parse_challonge_credentials_from_config
 
 
+# Can be pointed somewhere else, e.g. at fake_challonge.py, for testing.
+CHALLONGE_API_URL = os.environ.get("CHALLONGE_API_URL", "https://api.challonge.com/v1")
+
+# Requests that can safely be sent again if they fail partway through.
+_IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"])
+# Responses that mean the request may succeed if it's retried later. Only
+# 429s are retried for non-idempotent requests, since Challonge didn't act on
+# them.
+_RETRYABLE_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+_TOO_MANY_REQUESTS = 429
+
+# The client that's used when no other client is given.
+_default_client = None
+
+REQUESTS = metrics.counter(
+    "challonge_requests_total",
+    "Attempts at Challonge API requests, by the status they got back.",
+    ("method", "endpoint", "status"),
+)
+REQUEST_SECONDS = metrics.histogram(
+    "challonge_request_seconds",
+    "How long attempts at Challonge API requests took.",
+    ("method", "endpoint"),
+)
+RETRIES = metrics.counter(
+    "challonge_retries_total",
+    "Challonge API requests that were retried, by why.",
+    ("method", "endpoint", "reason"),
+)
+CACHE_LOOKUPS = metrics.counter(
+    "challonge_cache_lookups_total",
+    "Challonge API reads looked up in a client's cache.",
+    ("endpoint", "result"),
+)
+
+
+class ChallongeError(Exception):
+    """Challonge rejected a request, e.g. because of invalid params."""
+
+
+def _format_param(value):
+    """Formats a param value the way the Challonge API expects."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _prepare_params(params, prefix):
+    """Nests params under a prefix, e.g. seed=1 => participant[seed]=1.
+
+    Args:
+      params: A dictionary of params. List values are sent once per item.
+      prefix: The name to nest the params under, or None.
+
+    Returns:
+      A list of (key, value) tuples to send with the request.
+    """
+    prepared = []
+    for key, value in params.items():
+        if prefix:
+            key = "{0}[{1}]".format(prefix, key)
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for v in values:
+            prepared.append((key, _format_param(v)))
+    return prepared
+
+
+def _unwrap(doc):
+    """Unwraps Challonge's {"participant": {...}} style responses."""
+    if isinstance(doc, list):
+        return [_unwrap(x) for x in doc]
+    if isinstance(doc, dict) and len(doc) == 1:
+        value = next(iter(doc.values()))
+        if isinstance(value, dict):
+            return value
+    return doc
+
+
+def _get_retry_after(response):
+    """Gets how many seconds a response asked us to wait, or None."""
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class _NotFound(object):
+    """A cached 404, e.g. from checking whether a tournament exists."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def __deepcopy__(self, memo):
+        # The error's response doesn't need copying, since it's never changed.
+        return self
+
+
+def get_endpoint(path):
+    """Replaces names and IDs in a path with placeholders.
+
+    e.g. "tournaments/melee72/participants/123" =>
+    "tournaments/:tournament/participants/:id"
+
+    Args:
+      path: The path of an endpoint.
+
+    Returns:
+      The path, with the same placeholders for every tournament and
+      participant.
+    """
+    parts = path.split("/")
+    if len(parts) > 1:
+        parts[1] = ":tournament"
+    if len(parts) > 3 and parts[3] != "bulk_add":
+        parts[3] = ":id"
+    return "/".join(parts)
+
+
+def _get_request_tourney_name(path, params):
+    """Gets the name of the tournament a request is about.
+
+    Args:
+      path: The path of the endpoint.
+      params: The params of the request.
+
+    Returns:
+      The tournament name, in the same form as extract_tourney_name's.
+    """
+    parts = path.split("/")
+    if len(parts) > 1:
+        return parts[1]
+
+    # Creating a tournament.
+    if params.get("subdomain"):
+        return "{0}-{1}".format(params["subdomain"], params.get("url"))
+    return params.get("url")
+
+
+class _Tournaments(object):
+    def __init__(self, client):
+        self._client = client
+
+    def show(self, tournament, **params):
+        return self._client.fetch("GET", "tournaments/{0}".format(tournament), **params)
+
+    def create(self, name, url, tournament_type="single elimination", **params):
+        params.update({"name": name, "url": url, "tournament_type": tournament_type})
+        return self._client.fetch("POST", "tournaments", "tournament", **params)
+
+
+class _Participants(object):
+    def __init__(self, client):
+        self._client = client
+
+    def index(self, tournament):
+        return self._client.fetch(
+            "GET", "tournaments/{0}/participants".format(tournament)
+        )
+
+    def show(self, tournament, participant_id):
+        return self._client.fetch(
+            "GET", "tournaments/{0}/participants/{1}".format(tournament, participant_id)
+        )
+
+    def create(self, tournament, name, **params):
+        params["name"] = name
+        return self._client.fetch(
+            "POST",
+            "tournaments/{0}/participants".format(tournament),
+            "participant",
+            **params
+        )
+
+    def bulk_add(self, tournament, names, **params):
+        params["name"] = list(names)
+        return self._client.fetch(
+            "POST",
+            "tournaments/{0}/participants/bulk_add".format(tournament),
+            "participants[]",
+            **params
+        )
+
+    def update(self, tournament, participant_id, **params):
+        return self._client.fetch(
+            "PUT",
+            "tournaments/{0}/participants/{1}".format(tournament, participant_id),
+            "participant",
+            **params
+        )
+
+
+class _Matches(object):
+    def __init__(self, client):
+        self._client = client
+
+    def index(self, tournament, **params):
+        return self._client.fetch(
+            "GET", "tournaments/{0}/matches".format(tournament), **params
+        )
+
+
+def create_session():
+    """Creates a pooled requests.Session for talking to Challonge.
+
+    The session is safe to share between clients with different credentials,
+    e.g. one client per webapp request, since credentials are sent with each
+    request and no cookies are kept between them.
+
+    Returns:
+      A requests.Session.
+    """
+    session = requests.Session()
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class ChallongeClient(object):
+    """Talks to the Challonge API over a pool of kept-alive connections.
+
+    Requests that fail with a transient error (a 429, a 5xx, or a dropped
+    connection for idempotent requests) are retried with jittered exponential
+    backoff, honoring Retry-After.
+
+    The API is grouped the same way as pychal's, e.g.
+    client.participants.index(tournament).
+    """
+
+    def __init__(
+        self,
+        user,
+        api_key,
+        base_url=CHALLONGE_API_URL,
+        session=None,
+        max_retries=4,
+        backoff=0.5,
+        max_backoff=30.0,
+        timeout=(5, 30),
+        cache=None,
+    ):
+        """Creates a client.
+
+        Args:
+          user: Your Challonge username.
+          api_key: Your Challonge API key.
+          base_url: The URL of the Challonge API.
+          session: The requests.Session to send requests with. By default, the
+                   client creates its own pooled session.
+          max_retries: How many times a failed request is retried.
+          backoff: The base number of seconds to wait before retrying.
+          max_backoff: The most seconds to wait before a single retry.
+          timeout: The requests timeout for each attempt.
+          cache: An optional challonge_cache.ChallongeCache to remember reads
+                 in. It can be shared by clients with different credentials.
+        """
+        self.user = user
+        self.api_key = api_key
+        self.cache = cache
+        # Identifies our credentials in the cache without keeping the API key
+        # in it.
+        self._cache_scope = hashlib.sha256(
+            "{0}:{1}".format(user, api_key).encode()
+        ).hexdigest()
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        # How many times Challonge has throttled us, so that callers sending
+        # lots of requests can slow down.
+        self.num_throttled = 0
+        self._lock = threading.Lock()
+
+        if session is None:
+            session = create_session()
+        self.session = session
+
+        self.tournaments = _Tournaments(self)
+        self.participants = _Participants(self)
+        self.matches = _Matches(self)
+
+    def _get_backoff(self, attempt, response):
+        retry_after = _get_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, path, params_prefix=None, **params):
+        """Sends a request to the Challonge API, retrying transient failures.
+
+        Args:
+          method: The HTTP method.
+          path: The path of the endpoint, without the ".json" extension.
+          params_prefix: The name the params are nested under, e.g.
+                         "participant".
+          params: The params for the endpoint.
+
+        Raises:
+          ChallongeError: If Challonge rejected the request's params.
+          requests.exceptions.RequestException: If the request failed.
+
+        Returns:
+          The requests.Response.
+        """
+        with tracing.span(
+            "challonge_request", method=method, endpoint=get_endpoint(path)
+        ) as span:
+            response = self._request(method, path, params_prefix, **params)
+            span.set(status=response.status_code)
+            return response
+
+    def _request(self, method, path, params_prefix=None, **params):
+        url = "{0}/{1}.json".format(self.base_url, path)
+        prepared = _prepare_params(params, params_prefix)
+        if method in ("POST", "PUT"):
+            data = {"data": prepared}
+        else:
+            data = {"params": prepared}
+        idempotent = method in _IDEMPOTENT_METHODS
+        endpoint = get_endpoint(path)
+
+        attempt = 0
+        while True:
+            response = None
+            start = time.perf_counter()
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    auth=(self.user, self.api_key),
+                    timeout=self.timeout,
+                    **data
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as err:
+                REQUEST_SECONDS.observe(
+                    time.perf_counter() - start, method=method, endpoint=endpoint
+                )
+                REQUESTS.inc(method=method, endpoint=endpoint, status="error")
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                reason = type(err).__name__
+            else:
+                REQUEST_SECONDS.observe(
+                    time.perf_counter() - start, method=method, endpoint=endpoint
+                )
+                status = response.status_code
+                REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+                if status == _TOO_MANY_REQUESTS:
+                    with self._lock:
+                        self.num_throttled += 1
+                retryable = status in _RETRYABLE_STATUS_CODES and (
+                    idempotent or status == _TOO_MANY_REQUESTS
+                )
+                if not retryable or attempt >= self.max_retries:
+                    break
+                reason = status
+
+            RETRIES.inc(method=method, endpoint=endpoint, reason=reason)
+            time.sleep(self._get_backoff(attempt, response))
+            attempt += 1
+
+        if response.status_code == 422:
+            # Application-level errors, like invalid params.
+            errors = response.json().get("errors", [])
+            raise ChallongeError(*errors)
+        response.raise_for_status()
+        return response
+
+    def _fetch(self, method, path, params_prefix=None, **params):
+        response = self.request(method, path, params_prefix, **params)
+        return _unwrap(response.json())
+
+    def fetch(self, method, path, params_prefix=None, **params):
+        """Sends a request and parses the response.
+
+        If the client has a cache, reads are answered from it when possible,
+        including reads of tournaments that don't exist. Writes forget
+        everything cached about the tournament they write to, including what
+        other clients sharing the cache read.
+
+        Args:
+          See request().
+
+        Returns:
+          The parsed response, with Challonge's wrapping objects removed.
+        """
+        if self.cache is None:
+            return self._fetch(method, path, params_prefix, **params)
+
+        tournament = _get_request_tourney_name(path, params)
+        if method != "GET":
+            try:
+                return self._fetch(method, path, params_prefix, **params)
+            finally:
+                self.cache.invalidate(tournament)
+
+        found, value = self.cache.get(self._cache_scope, tournament, path, params)
+        CACHE_LOOKUPS.inc(endpoint=get_endpoint(path), result="hit" if found else "miss")
+        if found:
+            if isinstance(value, _NotFound):
+                raise requests.exceptions.HTTPError(
+                    *value.error.args, response=value.error.response
+                )
+            return value
+
+        try:
+            value = self._fetch(method, path, params_prefix, **params)
+        except requests.exceptions.HTTPError as err:
+            if err.response is not None and err.response.status_code == 404:
+                self.cache.put(
+                    self._cache_scope, tournament, path, params, _NotFound(err)
+                )
+            raise
+        self.cache.put(self._cache_scope, tournament, path, params, value)
+        return value
+
+
+def set_credentials(user, api_key):
+    """Sets the credentials of the default Challonge client.
+
+    Args:
+      user: Your Challonge username.
+      api_key: Your Challonge API key.
+    """
+    global _default_client
+    _default_client = ChallongeClient(user, api_key)
+
+
+def get_client():
+    """Gets the default Challonge client.
+
+    Raises:
+      RuntimeError: If the credentials haven't been set yet.
+
+    Returns:
+      The ChallongeClient set up by set_credentials.
+    """
+    if _default_client is None:
+        raise RuntimeError("Challonge credentials haven't been set.")
+    return _default_client
+
+
 def set_challonge_credentials_from_config(config_filename):
     """Sets up your Challonge API credentials from info in a config file.
 
@@ -24,7 +490,7 @@ def set_challonge_credentials_from_config(config_filename):
     if not credentials:
         return False
 
-    challonge.set_credentials(credentials["user"], credentials["api_key"])
+    set_credentials(credentials["user"], credentials["api_key"])
     return True
 
 
@@ -90,11 +556,12 @@ def tourney_name_to_url(name):
         return 'https://challonge.com/{}'.format(tourney)
 
 
-def get_tourney_info(name):
+def get_tourney_info(name, client=None):
     """Gets info about the tournament with the given name.
 
     Args:
       name: The name of the tournament.
+      client: The ChallongeClient to use, or None for the default client.
 
     Returns:
       The Challonge response about the tournament info if it exists, None
@@ -104,7 +571,7 @@ def get_tourney_info(name):
     # a 404, it exists.
     tourney_info = None
     try:
-        tourney_info = challonge.tournaments.show(name)
+        tourney_info = (client or get_client()).tournaments.show(name)
     except requests.exceptions.HTTPError as err:
         # If we got a 404, we queried fine and no amateur bracket exists,
         # but otherwise we've got an unexpected error, so we escalate it.
@@ -4,21 +4,29 @@ This is a webapp written in Flask to access the Challonge tools backend,
 and make it easier for the average user to use.
 
 """
-import challonge
 from datetime import timedelta
 from dotenv import load_dotenv
 from flask import Flask, render_template, redirect, request, flash, session,\
-                  url_for
+                  url_for, abort, jsonify, Response, g
 from flask_sslify import SSLify
+import functools
+from markupsafe import escape
 import os
 from os.path import dirname, abspath
 import re
 from requests.exceptions import HTTPError
 
+from challonge_cache import ChallongeCache
 from create_amateur_bracket import AmateurBracketAlreadyExistsError
 from create_amateur_bracket import AmateurBracketRequiredMatchesIncompleteError
 from create_amateur_bracket import create_amateur_bracket
 import garpr_seeds_challonge
+import jobs
+import metrics
+import profiling
+import util_challonge
+from write_executor import BatchWriteError
+from ranking_cache import RankingsUnavailableError
 
 
 app = Flask(__name__)
@@ -30,6 +38,21 @@ parent_dir = dirname(dirname(abspath(__file__)))
 load_dotenv(os.path.join(parent_dir, '.env'))
 app.secret_key = os.getenv('SECRET_KEY')
 
+# Connections to Challonge are pooled across requests, but every request gets
+# its own client with the credentials of whoever made it. Reads are briefly
+# cached so repeated submissions for a tournament don't hit the API again.
+challonge_session = util_challonge.create_session()
+challonge_cache = ChallongeCache()
+
+# Seeding and creating amateur brackets run in the background, so that web
+# workers aren't stuck waiting on Challonge.
+job_queue = jobs.JobQueue()
+
+# If PROFILE_DIR is set, e.g. in .env, requests can opt in to being profiled
+# with ?profile=1, or ?profile=sample to sample every thread's stacks. Their
+# profiles are saved there and summarized in the log.
+profile_dir = os.getenv('PROFILE_DIR')
+
 
 @app.before_request
 def make_session_persistent():
@@ -37,6 +60,62 @@ def make_session_persistent():
     session.permanent = True
 
 
+def get_profile_mode():
+    """
+    Get how the current request opted in to being profiled.
+
+    @returns: a profiling mode, or None if it shouldn't be profiled.
+    """
+    profile = request.values.get('profile')
+    if not profile_dir or not profile:
+        return None
+    if profile == profiling.SAMPLE:
+        return profiling.SAMPLE
+    return profiling.CPROFILE
+
+
+@app.before_request
+def start_profile():
+    mode = get_profile_mode()
+    if mode:
+        g.profiler = profiling.Profiler(mode)
+        g.profiler.start()
+
+
+@app.after_request
+def save_profile(response):
+    """Save the profile of a request that opted in to being profiled."""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        path = profiling.get_profile_path(profile_dir,
+                                          request.endpoint or 'request',
+                                          profiler.mode)
+        profiling.save_profile(profiler, path, app.logger.info)
+        response.headers['X-Profile'] = os.path.basename(path)
+    return response
+
+
+def profile_job(kind, fn):
+    """
+    Profile a job if the request starting it opted in to being profiled.
+
+    Jobs run in the background, so they're profiled separately from the
+    request.
+
+    @param kind: the kind of job, e.g. 'seed'.
+    @param fn: the job's function.
+
+    @returns: the function to run the job with.
+    """
+    mode = get_profile_mode()
+    if not mode:
+        return fn
+
+    path = profiling.get_profile_path(profile_dir, kind + '_job', mode)
+    return profiling.profiled(fn, path, mode, log=app.logger.info)
+
+
 def link(text, src=None):
     """
     Create links for alerts.
@@ -67,7 +146,16 @@ def create_unknown_players_html(unknown_players):
 
     unknown_text = "GAR PR info not found for the following players:<ul>"
     for player in unknown_players:
-        unknown_text += ("<li>{name}, seeding {seed}</li>".format(**player))
+        # Names come from Challonge and the ranking sites, so escape them.
+        unknown_text += "<li>{0}, seeding {1}".format(escape(player['name']),
+                                                     player['seed'])
+        suggestion = player.get('suggestion')
+        if suggestion:
+            unknown_text += (" &mdash; did you mean <b>{0}</b> (rank {1}, "
+                             "{2:.0%} match)?".format(escape(suggestion['name']),
+                                                      suggestion['rank'],
+                                                      suggestion['score']))
+        unknown_text += "</li>"
     unknown_text += "</ul><hr>"
 
     return unknown_text
@@ -78,6 +166,19 @@ def needs_credentials():
     return not all(session.get(key) for key in ['username', 'api_key'])
 
 
+def get_challonge_client():
+    """
+    Create a Challonge client for the current request.
+
+    @returns: util_challonge.ChallongeClient using the credentials saved in
+        the user's session.
+    """
+    return util_challonge.ChallongeClient(session['username'],
+                                          session['api_key'],
+                                          session=challonge_session,
+                                          cache=challonge_cache)
+
+
 # Make this function accessible from templates
 app.jinja_env.globals.update(needs_credentials=needs_credentials)
 
@@ -91,6 +192,115 @@ def valid_tourney_url(name):
     return True, None
 
 
+def job_key(tourney_url):
+    """
+    Get what a job is for, so duplicate submissions can be coalesced.
+
+    @param tourney_url: URL of the tournament the job is for.
+
+    @returns: string identifying the user and tournament.
+    """
+    try:
+        tourney_name = util_challonge.extract_tourney_name(tourney_url)
+    except ValueError:
+        tourney_name = tourney_url
+
+    return '{}:{}'.format(session['username'], tourney_name)
+
+
+def submit_job(kind, fn, params, next_url):
+    """
+    Run a job for a tournament in the background.
+
+    If the user already has an unfinished job of the same kind for the
+    tournament, they're sent to it instead. If it was submitted with other
+    settings, they're told the new settings weren't used.
+
+    @param kind: what sort of job it is, e.g. 'seed'.
+    @param fn: function to run, which is passed a progress function.
+    @param params: the submitted form params.
+    @param next_url: where to send the user once the job is done.
+
+    @returns: redirect to the job's progress page.
+    """
+    settings = {k: v for k, v in params.items() if k != 'tourney_url'}
+    try:
+        job_id = job_queue.submit(kind, job_key(params['tourney_url']),
+                                  profile_job(kind, fn),
+                                  owner=session['username'],
+                                  settings=settings)
+    except jobs.JobConflictError as e:
+        flash('{} Wait for it to finish, then submit again.'.format(e),
+              'warning')
+        job_id = e.job_id
+
+    return redirect_to_job(job_id, next_url)
+
+
+def redirect_to_job(job_id, next_url):
+    """Send the user to the progress page of a job."""
+    return redirect(url_for('job_progress', job_id=job_id, next=next_url))
+
+
+def seed_job(client, params, progress):
+    """
+    Seed a tournament. Runs in the background.
+
+    @param client: util_challonge.ChallongeClient to use.
+    @param params: the submitted form params.
+    @param progress: function to report the job's progress with.
+
+    @returns: the message to show the user and its category.
+    """
+    progress('Fetching the tournament and rankings')
+    try:
+        sorted_players, unknown_players = garpr_seeds_challonge.\
+            seed_tournament(params['tourney_url'],
+                            shuffle=params['shuffle'],
+                            client=client)
+
+    except ValueError as e:
+        return str(e), 'warning'
+    except garpr_seeds_challonge.NoSuchTournamentError as e:
+        return str(e), 'warning'
+    except RankingsUnavailableError as e:
+        app.logger.info(e)
+        return "Couldn't download the rankings. Try again in a bit.", 'danger'
+    except HTTPError as e:
+        app.logger.info(e)
+        return ('Error accessing Challonge API. Make sure your API key is '
+                'correct.', 'danger')
+
+    def seeds_progress(num_done, num_total):
+        progress('Updating seeds', num_done, num_total)
+
+    try:
+        garpr_seeds_challonge.update_seeds(params['tourney_url'],
+                                           sorted_players,
+                                           client=client,
+                                           progress=seeds_progress)
+    except HTTPError as e:
+        app.logger.info(e)
+        return ("Couldn't access {} with the API, are you sure you have "
+                "access to this bracket?".format(params['tourney_url']),
+                'danger')
+
+    except util_challonge.ChallongeError as e:
+        return str(e), 'danger'
+    except BatchWriteError as e:
+        app.logger.info(e)
+        return ("{} seeds couldn't be updated. Try seeding again."
+                .format(len(e.failures)), 'danger')
+
+    unknown_html = create_unknown_players_html(unknown_players)
+
+    return (unknown_html + 'Your tournament has been seeded! Check it out '
+            '{} to make adjustments. Feel free to run '
+            'this again if you add more players.'
+            .format(link('here', params['tourney_url'] + '/participants')),
+            'success')
+
+
 @app.route('/', methods=['GET', 'POST'])
 def main():
     if request.method == 'GET':
@@ -116,46 +326,60 @@ def main():
             flash(err, 'danger')
             return redirect(url_for('main', **params))
 
-        challonge.set_credentials(session['username'], session['api_key'])
-        try:
-            sorted_players, unknown_players = garpr_seeds_challonge.\
-                seed_tournament(params['tourney_url'],
-                                shuffle=params['shuffle'])
-
-        except ValueError as e:
-            flash(str(e), 'warning')
-            return redirect(url_for('main', **params))
-        except garpr_seeds_challonge.NoSuchTournamentError as e:
-            flash(str(e), 'warning')
-            return redirect(url_for('main', **params))
-        except HTTPError as e:
-            app.logger.info(e)
-            flash('Error accessing Challonge API. Make sure your API key is '
-                  'correct.', 'danger')
-            return redirect(url_for('main', **params))
+        client = get_challonge_client()
+        return submit_job('seed', functools.partial(seed_job, client, params),
+                          params, url_for('main', **params))
 
-        try:
-            garpr_seeds_challonge.update_seeds(params['tourney_url'],
-                                               sorted_players)
-        except HTTPError as e:
-            app.logger.info(e)
-            flash("Couldn't access {} with the API, are you sure you have "
-                  "access to this bracket?".format(params['tourney_url']),
-                  'danger')
-            return redirect(url_for('main', **params))
 
-        except challonge.api.ChallongeException as e:
-            flash(str(e), 'danger')
-            return redirect(url_for('main', **params))
+def amateur_job(client, params, progress):
+    """
+    Create an amateur bracket. Runs in the background.
 
-        unknown_html = create_unknown_players_html(unknown_players)
+    @param client: util_challonge.ChallongeClient to use.
+    @param params: the submitted form params.
+    @param progress: function to report the job's progress with.
 
-        flash(unknown_html + 'Your tournament has been seeded! Check it out '
-              '{} to make adjustments. Feel free to run '
-              'this again if you add more players.'
-              .format(link('here', params['tourney_url'] + '/participants')),
-                      'success')
-        return redirect(url_for('main', **params))
+    @returns: the message to show the user and its category.
+    """
+    def participants_progress(num_done, num_total):
+        progress('Adding players', num_done, num_total)
+
+    progress('Fetching the tournament')
+    try:
+        amateur_tourney_url = create_amateur_bracket(
+            params['tourney_url'],
+            single_elimination=params['elimination'] == 1,
+            losers_round_cutoff=int(params['losers_round']),
+            randomize_seeds=params['randomize'],
+            incomplete=params['incomplete'],
+            client=client,
+            progress=participants_progress)
+
+    except AmateurBracketAlreadyExistsError:
+        return 'Amateur bracket for this tournament already exists.', 'danger'
+
+    except AmateurBracketRequiredMatchesIncompleteError as e:
+        return ("The main tournament is not far enough along in the loser's "
+                "bracket to create amateur bracket yet. "
+                "There are <b>{}</b> matches remaining."
+                .format(e.matches_remaining), 'warning')
+
+    except HTTPError as e:
+        app.logger.info(e)
+        status_code = e.response.status_code
+
+        if status_code == 404:
+            return ("Couldn't find tournament: {}"
+                    .format(params['tourney_url']), 'danger')
+        elif status_code == 401:
+            return ('Error accessing Challonge API. Make sure your API key '
+                    'is correct.', 'danger')
+        else:
+            return ('Something went wrong: {} error.'.format(status_code),
+                    'danger')
+
+    return ('Your tournament amateur bracket has been created! '
+            '{}'.format(link(amateur_tourney_url)), 'success')
 
 
 @app.route('/amateur', methods=['GET', 'POST'])
@@ -190,46 +414,60 @@ def amateur():
             flash(err, 'danger')
             return redirect(url_for('amateur', **params))
 
-        challonge.set_credentials(session['username'], session['api_key'])
+        client = get_challonge_client()
+        return submit_job('amateur',
+                          functools.partial(amateur_job, client, params),
+                          params, url_for('amateur', **params))
 
-        try:
-            amateur_tourney_url = create_amateur_bracket(
-                params['tourney_url'],
-                single_elimination=params['elimination'] == 1,
-                losers_round_cutoff=int(params['losers_round']),
-                randomize_seeds=params['randomize'],
-                incomplete=params['incomplete'])
 
-        except AmateurBracketAlreadyExistsError:
-            flash('Amateur bracket for this tournament already exists.',
-                  'danger')
-            return redirect(url_for('amateur', **params))
+def get_job_or_404(job_id):
+    """Get a job, as long as it belongs to the current user."""
+    job = job_queue.get(job_id)
+    if job is None or job.owner != session.get('username'):
+        abort(404)
 
-        except AmateurBracketRequiredMatchesIncompleteError as e:
-            flash("The main tournament is not far enough along in the loser's "
-                  "bracket to create amateur bracket yet. "
-                  "There are <b>{}</b> matches remaining."
-                  .format(e.matches_remaining), 'warning')
-            return redirect(url_for('amateur', **params))
+    return job
+
+
+@app.route('/jobs/<job_id>')
+def job_progress(job_id):
+    job = get_job_or_404(job_id)
+
+    # Only ever send the user back to a page on this site.
+    next_url = request.args.get('next', '')
+    if not next_url.startswith('/') or next_url.startswith('//'):
+        next_url = url_for('main')
+
+    if job.state == jobs.SUCCEEDED:
+        message, category = job.result
+        flash(message, category)
+        return redirect(next_url)
+    elif job.state == jobs.FAILED:
+        app.logger.info(job.error)
+        flash('Something went wrong: {}'.format(job.error), 'danger')
+        return redirect(next_url)
+
+    return render_template('job.html', job=job)
+
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    job = get_job_or_404(job_id)
+
+    return jsonify(state=job.state, status=job.status,
+                   num_done=job.num_done, num_total=job.num_total)
+
+
+@app.route('/stats')
+def stats():
+    """Show how well the Challonge cache is doing."""
+    return jsonify(challonge_cache=challonge_cache.get_stats())
 
-        except HTTPError as e:
-            app.logger.info(e)
-            status_code = e.response.status_code
-
-            if status_code == 404:
-                flash("Couldn't find tournament: {}"
-                      .format(params['tourney_url']), 'danger')
-            elif status_code == 401:
-                flash('Error accessing Challonge API. Make sure your API key '
-                      'is correct.', 'danger')
-            else:
-                flask('Something went wrong: {} error.'.format(status_code),
-                      'danger')
-            return redirect(url_for('amateur', **params))
 
-        flash('Your tournament amateur bracket has been created! '
-              '{}'.format(link(amateur_tourney_url)), 'success')
-        return redirect(url_for('amateur', **params))
+@app.route('/metrics')
+def metrics_route():
+    """Serve request counts and latencies in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/settings', methods=['GET', 'POST'])
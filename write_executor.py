@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+
+"""Runs batches of Challonge writes concurrently.
+
+Writes are sent from a thread pool, while still respecting ordering
+constraints: a write only starts once every write it depends on has finished.
+The number of writes in flight backs off whenever Challonge starts throttling
+us with 429s and slowly grows again while it doesn't. A failed write doesn't
+stop the rest of the batch, only the writes depending on it.
+"""
+
+
+import collections
+import concurrent.futures
+
+import requests.exceptions
+
+import tracing
+
+
+DEFAULT_MAX_WORKERS = 8
+
+
+Write = collections.namedtuple("Write", ["fn", "args", "kwargs", "depends_on"])
+Write.__doc__ = """A single call to make as part of a batch.
+
+fn: The function to call, e.g. client.participants.update.
+args: The positional arguments to call fn with.
+kwargs: The keyword arguments to call fn with.
+depends_on: The indices of earlier writes in the batch that have to finish
+            before this one starts.
+"""
+
+WriteResult = collections.namedtuple("WriteResult", ["write", "value", "error"])
+WriteResult.__doc__ = """The outcome of a write.
+
+write: The Write that was made.
+value: What the write returned, or None if it failed.
+error: The exception the write failed with, or None if it succeeded.
+"""
+
+
+class DependencyFailedError(Exception):
+    """A write was skipped because a write it depends on failed."""
+
+
+class BatchWriteError(Exception):
+    """Some writes in a batch failed."""
+
+    def __init__(self, message, failures):
+        self.failures = failures
+        super().__init__(message)
+
+
+def _is_throttled(error):
+    return (
+        isinstance(error, requests.exceptions.HTTPError)
+        and error.response is not None
+        and error.response.status_code == 429
+    )
+
+
+class WriteExecutor(object):
+    """Runs batches of writes with adaptive, bounded concurrency."""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, client=None):
+        """Creates an executor.
+
+        Args:
+          max_workers: The most writes that are ever in flight at once.
+          client: The util_challonge.ChallongeClient the writes go through, if
+                  any. Its count of throttled responses is watched to back off
+                  even when the client's retries hide the 429s.
+        """
+        self.max_workers = max_workers
+        self.client = client
+        self.concurrency = max_workers
+        self._num_successes = 0
+        self._num_throttled_seen = self._get_num_throttled()
+
+    def _get_num_throttled(self):
+        return getattr(self.client, "num_throttled", 0)
+
+    def _adapt(self, result):
+        """Adjusts the concurrency after a write finishes.
+
+        The concurrency is halved whenever we've been throttled, and grows by
+        one after a full round of writes goes by without being throttled.
+        """
+        num_throttled = self._get_num_throttled()
+        throttled = num_throttled > self._num_throttled_seen or _is_throttled(
+            result.error
+        )
+        self._num_throttled_seen = num_throttled
+
+        if throttled:
+            self.concurrency = max(1, self.concurrency // 2)
+            self._num_successes = 0
+        elif result.error is None:
+            self._num_successes += 1
+            if self._num_successes >= self.concurrency:
+                self.concurrency = min(self.max_workers, self.concurrency + 1)
+                self._num_successes = 0
+
+    @staticmethod
+    def _call(write):
+        try:
+            return WriteResult(write, write.fn(*write.args, **write.kwargs), None)
+        except Exception as err:
+            return WriteResult(write, None, err)
+
+    def run(self, writes, progress=None):
+        """Runs a batch of writes.
+
+        Args:
+          writes: A list of Writes. Writes can only depend on earlier writes.
+          progress: An optional function called with (number of writes
+                    finished, total number of writes) as writes finish.
+
+        Raises:
+          ValueError: If a write depends on itself or on a later write.
+
+        Returns:
+          A list with a WriteResult for each write, in the same order.
+        """
+        writes = list(writes)
+        num_writes = len(writes)
+        results = [None] * num_writes
+        num_unfinished_deps = [0] * num_writes
+        dependents = collections.defaultdict(list)
+        for i, write in enumerate(writes):
+            for dep in set(write.depends_on):
+                if not 0 <= dep < i:
+                    raise ValueError(
+                        "Write {0} can only depend on earlier writes.".format(i)
+                    )
+                num_unfinished_deps[i] += 1
+                dependents[dep].append(i)
+
+        ready = collections.deque(
+            i for i in range(num_writes) if not num_unfinished_deps[i]
+        )
+        num_finished = [0]
+
+        def finish(i, result):
+            results[i] = result
+            num_finished[0] += 1
+            if progress:
+                progress(num_finished[0], num_writes)
+
+            for j in dependents[i]:
+                if results[j] is not None:
+                    continue
+                if result.error is not None:
+                    finish(
+                        j,
+                        WriteResult(
+                            writes[j],
+                            None,
+                            DependencyFailedError(
+                                "Skipped because write {0} failed.".format(i)
+                            ),
+                        ),
+                    )
+                    continue
+                num_unfinished_deps[j] -= 1
+                if not num_unfinished_deps[j]:
+                    ready.append(j)
+
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as pool:
+            while ready or running:
+                while ready and len(running) < self.concurrency:
+                    i = ready.popleft()
+                    call = tracing.wrap_context(self._call)
+                    running[pool.submit(call, writes[i])] = i
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    i = running.pop(future)
+                    result = future.result()
+                    self._adapt(result)
+                    finish(i, result)
+
+        return results
+
+
+def raise_for_failures(results):
+    """Raises an error if any writes in a batch failed.
+
+    Args:
+      results: The WriteResults returned by WriteExecutor.run.
+
+    Raises:
+      BatchWriteError: If any of the writes failed.
+    """
+    failures = [x for x in results if x.error is not None]
+    if failures:
+        raise BatchWriteError(
+            "{0} of {1} Challonge updates failed: {2}".format(
+                len(failures), len(results), failures[0].error
+            ),
+            failures,
+        )